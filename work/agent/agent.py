@@ -2,24 +2,33 @@
 # Use LangGraph for orchestration and HuggingFace Inference API with MODEL_ID = "Qwen/Qwen2.5-Coder-7B-Instruct" for LLM calls.
 
 # 1. manage imports
+# Heavy dependencies (LangGraph, LangChain, DuckDB, pyarrow, numpy) are imported
+# where they are first needed, so importing this module stays cheap.
+import asyncio
 import os
+import threading
+from functools import lru_cache
 from pathlib import Path
-from typing import TypedDict, Annotated, Literal
+from typing import TYPE_CHECKING, TypedDict, Annotated, Literal
 
-import yaml
-import duckdb
 from dotenv import load_dotenv
 
-from langchain_huggingface import ChatHuggingFace, HuggingFaceEndpoint
-from langgraph.graph import StateGraph, START, END
-from langgraph.graph.message import add_messages
+from answer_cache import AnswerCache
+from llm_budget import request_budget
+from result_store import ResultStore
 
-from nodes import (
-    create_generate_sql_node,
-    validate_sql,
-    create_execute_sql_node,
-    create_generate_streamlit_views_node,
-)
+if TYPE_CHECKING:
+    import duckdb
+    from llm_gateway import ChatGateway
+    from intent_router import IntentRouter
+    from query_governor import QueryGovernor
+    from question_index import QuestionIndex
+
+
+def add_messages(left, right):
+    """LangGraph add_messages reducer (langgraph imported on first use)"""
+    from langgraph.graph.message import add_messages as reducer
+    return reducer(left, right)
 
 
 # State definition
@@ -31,9 +40,17 @@ class AgentState(TypedDict):
     validation_error: str
     retry_count: int
     execution_error: bool
-    query_results: list
+    result_handle: str  # ResultStore handle of the results (first page), see get_query_results
+    result_summary: dict  # schema and column stats of the stored results
     result_columns: list
+    result_row_count: int
+    query_error: dict  # structured execution failure (kind "timeout", "out_of_memory", ...), see QueryGovernor
     streamlit_code: str
+    planned_streamlit_code: str  # visualization code generated from the query schema (parallel mode)
+    matched_question: str
+    match_score: float
+    routed_intent: str
+    prompt_tokens: int
     messages: Annotated[list, add_messages]
 
 
@@ -47,24 +64,110 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 MODEL_ID = "Qwen/Qwen2.5-Coder-7B-Instruct"
 TIMEOUT_SECONDS = 60  # LLM API call timeout (configurable)
 
-if not HF_TOKEN:
-    raise ValueError("HF_TOKEN not found in environment variables")
+# LLM gateway: OpenAI-compatible endpoint (HuggingFace router by default) on keep-alive connections
+LLM_BASE_URL = os.getenv("LLM_BASE_URL", "https://router.huggingface.co/v1")
+LLM_POOL_SIZE = 16
+# Transient failures (connection errors, timeouts, 429, 5xx) retried with jittered exponential backoff
+LLM_MAX_ATTEMPTS = 3
+# Time budget for all LLM calls of one question (SQL retries + visualization), caps each call's timeout
+LLM_REQUEST_BUDGET_SECONDS = 150
+# Circuit breaker: after this many consecutive failures, LLM calls fail fast (fallbacks) for the reset period
+LLM_BREAKER_FAILURES = 5
+LLM_BREAKER_RESET_SECONDS = 30
 
 # Paths
 WORK_DIR = Path(__file__).parent.parent
-AGENT_SPECS_PATH = Path(__file__).parent / "agent-specifications.md"
+AGENT_SPECS_PATH = Path(__file__).parent / "agent-specifications" / "agent-specifications.md"
+SQL_SKILL_PATH = Path(__file__).parent / "agent-specifications" / "skills" / "sql-generation.md"
 SEMANTIC_LAYER_PATH = WORK_DIR / "data" / "semantic_layer.yaml"
+STAR_SCHEMA_DIR = WORK_DIR / "data" / "b-silver-star-schema"
+STAR_SCHEMA_TABLES = ["dim_product", "dim_specie", "dim_site", "fact_batch_production"]
+# Pre-aggregated tables built by the ETL (optional, used by the rollup query rewriter)
+ROLLUP_TABLES = ["agg_batch_monthly", "agg_batch_species"]
+# Hive-partitioned tables (<table>/<key>=<value>/.../*.parquet) and their
+# partition keys that are not table columns (hidden from the views)
+PARTITIONED_TABLES = {"fact_batch_production": ["year", "month"]}
+# Native DuckDB tables built by the ETL, used instead of the parquet views when present
+STAR_SCHEMA_DATABASE = STAR_SCHEMA_DIR / "star_schema.duckdb"
+
+# Answer cache (repeated questions skip the LLM entirely)
+ANSWER_CACHE_PATH = WORK_DIR / ".cache" / "answer_cache.sqlite"
+ANSWER_CACHE_MAX_ENTRIES = 500
+ANSWER_CACHE_TTL_SECONDS = 24 * 3600
+# Contract of the render_visualization(viz_type, columns, rows) code kept in cached
+# answers; bumping it drops them. v2: rows is a pandas DataFrame (was row tuples).
+RENDER_CONTRACT_VERSION = "render-v2"
+
+# DuckDB cursors available to concurrent requests
+DUCKDB_POOL_SIZE = 8
+
+# Cost guard: queries whose EXPLAIN estimates exceed these budgets are rejected before execution
+QUERY_MAX_ROWS = 50_000_000
+QUERY_MAX_SCAN_BYTES = 4 * 1024**3
+
+# Query governor: per-query deadline (watchdog interrupt), DuckDB memory and thread caps for the process
+QUERY_TIMEOUT_SECONDS = 30
+DUCKDB_MEMORY_LIMIT = "2GB"
+DUCKDB_THREADS = 4
+
+# Query results stay out of the agent state: in memory up to this budget, then spilled to disk
+RESULT_STORE_MAX_BYTES = 256 * 1024 * 1024
+RESULT_STORE = ResultStore(RESULT_STORE_MAX_BYTES)
+
+# Near-duplicate question matching (cosine similarity threshold to reuse SQL)
+QUESTION_MATCH_THRESHOLD = 0.9
+
+# SQL candidates requested in parallel per generation (1 = serial retry loop only)
+SQL_CANDIDATES = 1
+
+# Rule-based charts for common result shapes (the visualization LLM only handles the others)
+CHART_RULES = True
+
+# Visualization LLM call started from the query's output schema, in parallel with execute_sql
+PARALLEL_VIZ = False
+
+# State keys written by execute_sql (returned alone when it runs in parallel with plan_visualization)
+EXECUTE_SQL_KEYS = (
+    "result_handle", "result_summary", "result_columns", "result_row_count",
+    "query_error", "execution_error", "validation_error",
+)
+
+
+def __getattr__(name: str):
+    """Result page helpers re-exported from nodes, imported on first access (nodes pull in DuckDB and pyarrow)"""
+    if name in ("fetch_result_page", "RESULT_PAGE_SIZE"):
+        import nodes
+        return getattr(nodes, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 # Helper functions
+@lru_cache(maxsize=1)
+def load_agent_specification_sections() -> tuple[str, str]:
+    """Agent specifications and their visualization guidelines section (file read once)"""
+    with open(AGENT_SPECS_PATH, "r") as f:
+        content = f.read()
+
+    # Visualization guidelines: from "## Plotly Visualization Guidelines" to end of file
+    start_marker = "## Plotly Visualization Guidelines"
+    _, found, viz_section = content.partition(start_marker)
+    return content, (start_marker + viz_section) if found else ""
+
+
 def load_agent_specifications() -> str:
     """Load agent specifications as raw text"""
-    with open(AGENT_SPECS_PATH, "r") as f:
+    return load_agent_specification_sections()[0]
+
+
+def load_sql_skill() -> str:
+    """Load SQL generation skill (rules used by the compact SQL prompt)"""
+    with open(SQL_SKILL_PATH, "r") as f:
         return f.read()
 
 
+@lru_cache(maxsize=1)
 def load_semantic_layer() -> str:
-    """Load semantic layer YAML and resolve dynamic paths"""
+    """Load semantic layer YAML and resolve dynamic paths (read once)"""
     with open(SEMANTIC_LAYER_PATH, "r") as f:
         content = f.read()
 
@@ -80,47 +183,215 @@ def load_semantic_layer() -> str:
 
 def load_visualization_guidelines() -> str:
     """Load visualization guidelines from agent-specifications.md"""
-    with open(AGENT_SPECS_PATH, "r") as f:
-        content = f.read()
+    return load_agent_specification_sections()[1]
+
+
+def available_rollup_tables() -> list[str]:
+    """Rollup tables whose parquet file exists"""
+    return [table for table in ROLLUP_TABLES if (STAR_SCHEMA_DIR / f"{table}.parquet").exists()]
 
-    # Extract from "## Plotly Visualization Guidelines" to end of file
-    start_marker = "## Plotly Visualization Guidelines"
-    if start_marker in content:
-        viz_section = content.split(start_marker)[1]
-        # Include the marker in the returned content
-        return start_marker + viz_section
-    else:
-        return ""  # Fallback if section not found
 
+def initialize_duckdb_connection() -> "duckdb.DuckDBPyConnection":
+    """Initialize persistent DuckDB connection
+
+    Opens the ETL's database file read-only when it exists (native tables,
+    shareable by several app processes), otherwise creates in-memory views
+    over the parquet files.
+    """
+    import duckdb
+
+    if STAR_SCHEMA_DATABASE.exists():
+        print(f"📊 Opening DuckDB database {STAR_SCHEMA_DATABASE.name} (read-only)...")
+        conn = duckdb.connect(str(STAR_SCHEMA_DATABASE), read_only=True)
+        print("✅ DuckDB database opened\n")
+        return conn
 
-def initialize_duckdb_connection() -> duckdb.DuckDBPyConnection:
-    """Initialize persistent DuckDB connection with views for parquet files"""
     print("📊 Initializing DuckDB connection with views...")
 
     # Create in-memory connection (reusable)
     conn = duckdb.connect(":memory:")
 
     # Resolve data path
-    data_path = WORK_DIR / "data" / "b-silver-star-schema"
-    resolved_path = str(data_path.resolve())
-
-    # Create views for each parquet file
-    views = {
-        "dim_product": f"{resolved_path}/dim_product.parquet",
-        "dim_specie": f"{resolved_path}/dim_specie.parquet",
-        "dim_site": f"{resolved_path}/dim_site.parquet",
-        "fact_batch_production": f"{resolved_path}/fact_batch_production.parquet",
-    }
-
-    for view_name, parquet_path in views.items():
-        conn.execute(f"CREATE VIEW {view_name} AS SELECT * FROM read_parquet('{parquet_path}')")
+    resolved_path = str(STAR_SCHEMA_DIR.resolve())
+
+    # Create views for each parquet file (rollups only when built), including
+    # the parts appended by incremental ETL runs (<table>-<part>.parquet).
+    # Partitioned tables are read with hive_partitioning so filters on the
+    # partition keys skip whole files.
+    for view_name in STAR_SCHEMA_TABLES + available_rollup_tables():
+        if view_name in PARTITIONED_TABLES:
+            hidden_keys = ", ".join(PARTITIONED_TABLES[view_name])
+            conn.execute(
+                f"CREATE VIEW {view_name} AS SELECT * EXCLUDE ({hidden_keys}) "
+                f"FROM read_parquet('{resolved_path}/{view_name}/**/*.parquet', hive_partitioning=true)"
+            )
+        else:
+            conn.execute(f"CREATE VIEW {view_name} AS SELECT * FROM read_parquet('{resolved_path}/{view_name}*.parquet')")
         print(f"  ✓ Created view: {view_name}")
 
     print("✅ DuckDB views created\n")
     return conn
 
 
+def create_query_governor(conn: "duckdb.DuckDBPyConnection") -> "QueryGovernor":
+    """Query governor with the agent's deadline and DuckDB caps, applied to conn's database"""
+    from query_governor import QueryGovernor
+
+    governor = QueryGovernor(QUERY_TIMEOUT_SECONDS, DUCKDB_MEMORY_LIMIT, DUCKDB_THREADS)
+    governor.apply(conn)
+    return governor
+
+
+def create_llm() -> "ChatGateway":
+    """Create the chat model used by the LLM nodes (LLM gateway on the HuggingFace router)"""
+    from llm_gateway import ChatGateway
+
+    if not HF_TOKEN:
+        raise ValueError("HF_TOKEN not found in environment variables")
+
+    return ChatGateway(
+        base_url=LLM_BASE_URL,
+        model=MODEL_ID,
+        api_key=HF_TOKEN,
+        temperature=0.1,
+        max_tokens=2048,
+        timeout_seconds=TIMEOUT_SECONDS,
+        max_attempts=LLM_MAX_ATTEMPTS,
+        pool_size=LLM_POOL_SIZE,
+        failure_threshold=LLM_BREAKER_FAILURES,
+        reset_seconds=LLM_BREAKER_RESET_SECONDS,
+    )
+
+
+class LazyLLM:
+    """Chat model created by `factory` on first use (first question), then shared
+
+    Building the agent neither imports the LLM gateway nor needs
+    HF_TOKEN; a missing token surfaces as an LLM error on the first call.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._llm = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        with self._lock:
+            if self._llm is None:
+                self._llm = self._factory()
+            return self._llm
+
+    def invoke(self, *args, **kwargs):
+        return self._get().invoke(*args, **kwargs)
+
+    async def ainvoke(self, *args, **kwargs):
+        return await self._get().ainvoke(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def create_answer_cache() -> AnswerCache:
+    """Create the persistent answer cache bound to the star schema files
+
+    The whole directory is fingerprinted so incremental ETL parts invalidate it too,
+    and answers with code written for an older render contract are dropped.
+    """
+    return AnswerCache(
+        ANSWER_CACHE_PATH,
+        [STAR_SCHEMA_DIR],
+        max_entries=ANSWER_CACHE_MAX_ENTRIES,
+        ttl_seconds=ANSWER_CACHE_TTL_SECONDS,
+        version=RENDER_CONTRACT_VERSION,
+    )
+
+
+def create_intent_router() -> "IntentRouter":
+    """Build the intent router with slot values read from the star schema"""
+    from intent_router import IntentRouter
+
+    conn = initialize_duckdb_connection()
+    try:
+        router = IntentRouter.from_connection(conn)
+    finally:
+        conn.close()
+
+    print(f"🧭 Intent router ready: {len(router.templates)} intents\n")
+    return router
+
+
+def create_question_index(
+    answer_cache: AnswerCache | None = None,
+    intent_router: "IntentRouter | None" = None,
+) -> "QuestionIndex":
+    """Build the question index from semantic layer examples and cached answers
+
+    BU, site and species values (the intent router's vocabularies, built when
+    not given) must match too before a known question's SQL is reused.
+    """
+    from question_index import QuestionIndex, load_question_examples, with_limit
+
+    if intent_router is None:
+        intent_router = create_intent_router()
+    index = QuestionIndex(filter_vocabulary=intent_router.filter_vocabulary())
+
+    for example in load_question_examples(load_semantic_layer()):
+        index.add(example["question"], with_limit(example["sql"]), source="example")
+
+    if answer_cache is not None:
+        for question, sql in answer_cache.entries():
+            index.add(question, sql, source="answered")
+
+    print(f"🔎 Question index ready: {len(index)} questions\n")
+    return index
+
+
+def as_node(node_func):
+    """Wrap a node so the graph supports invoke and ainvoke
+
+    Nodes exposing an async variant as `.afunc` get it used under ainvoke;
+    plain nodes run in a worker thread under ainvoke.
+    """
+    from langchain_core.runnables import RunnableLambda
+
+    afunc = getattr(node_func, "afunc", None)
+    if afunc is None:
+        return node_func
+    return RunnableLambda(node_func, afunc=afunc, name=node_func.__name__)
+
+
+def as_branch_node(node_func, keys: tuple[str, ...]):
+    """Wrap a node run in parallel with another one: only its own state keys are returned
+
+    Parallel branches can't both write the same key (e.g. the question), so the
+    node works on a copy of the state and the update is reduced to `keys`.
+    """
+    def branch(state: AgentState) -> dict:
+        result = node_func(dict(state))
+        return {key: result[key] for key in keys if key in result}
+
+    afunc = getattr(node_func, "afunc", None)
+    if afunc is not None:
+        async def abranch(state: AgentState) -> dict:
+            result = await afunc(dict(state))
+            return {key: result[key] for key in keys if key in result}
+        branch.afunc = abranch
+
+    branch.__name__ = node_func.__name__
+    return as_node(branch)
+
+
 # 3. Conditional edge functions
+def check_intent_route(state: AgentState) -> Literal["routed", "not_routed"]:
+    """Route to validation when a known intent's SQL template was filled"""
+    return "routed" if state.get("routed_intent") else "not_routed"
+
+
+def check_question_match(state: AgentState) -> Literal["matched", "no_match"]:
+    """Route to validation when a known question's SQL is reused"""
+    return "matched" if state.get("matched_question") else "no_match"
+
+
 def check_sql_validity(state: AgentState) -> Literal["valid", "invalid", "max_retries"]:
     """Route based on SQL validation result and retry count"""
     if state.get("sql_valid", False):
@@ -134,6 +405,15 @@ def check_sql_validity(state: AgentState) -> Literal["valid", "invalid", "max_re
     return "invalid"
 
 
+def check_sql_validity_fan_out(state: AgentState) -> list[str]:
+    """check_sql_validity for parallel visualization planning: valid SQL runs
+    execute_sql and plan_visualization side by side"""
+    route = check_sql_validity(state)
+    if route == "valid":
+        return ["execute_sql", "plan_visualization"]
+    return ["generate_sql" if route == "invalid" else "max_retries_exceeded"]
+
+
 def max_retries_exceeded(state: AgentState) -> AgentState:
     """Handle max retries exceeded - return error message"""
     error_msg = (
@@ -161,15 +441,56 @@ def handle_execution_error(state: AgentState) -> AgentState:
 
     # Error already stored in validation_error by execute_sql node
     # Just ensure empty results
-    state["query_results"] = []
+    state["result_handle"] = ""
+    state["result_summary"] = {}
     state["result_columns"] = []
+    state["result_row_count"] = 0
 
     return state
 
 
 # 4. Build and run functions
-def build_agent():
-    """Build and compile the LangGraph agent (called once)"""
+def build_agent(
+    question_index: "QuestionIndex | None" = None,
+    llm=None,
+    sql_candidates: int = SQL_CANDIDATES,
+    intent_router: "IntentRouter | None" = None,
+    chart_rules: bool = CHART_RULES,
+    parallel_viz: bool = PARALLEL_VIZ,
+):
+    """Build and compile the LangGraph agent (called once)
+
+    Args:
+        llm: Chat model to use (optional, defaults to the LLM gateway on the HuggingFace
+            endpoint, created on the first LLM call)
+        question_index: Known questions index (optional). When given, near-duplicate
+            questions reuse stored SQL and skip LLM SQL generation.
+        sql_candidates: SQL candidates generated in parallel (speculative mode when > 1).
+            The first one passing validation and an EXPLAIN dry-run is executed.
+        intent_router: Known intents router (optional). When given, questions matching
+            a semantic layer intent get template SQL without any LLM call.
+        chart_rules: Prebuilt charts for common result shapes (KPI, time series, bar,
+            pie, scatter, table) instead of the visualization LLM call.
+        parallel_viz: Fan out after validate_sql: the visualization LLM call starts from
+            the query's output schema (DESCRIBE) while DuckDB executes, both branches
+            join in generate_streamlit_views.
+    """
+    from langgraph.graph import StateGraph, START, END
+
+    from chart_selector import ChartSelector
+    from cursor_pool import CursorPool
+    from nodes import (
+        create_generate_sql_node,
+        create_validate_sql_node,
+        create_execute_sql_node,
+        create_generate_streamlit_views_node,
+        create_plan_visualization_node,
+        create_match_question_node,
+        create_route_intent_node,
+    )
+    from prompt_builder import SQLPromptBuilder
+    from rollup_rewriter import RollupRewriter
+
     # Load specifications and semantic layer
     print("📖 Loading agent specifications and semantic layer...")
     agent_specs = load_agent_specifications()
@@ -177,51 +498,100 @@ def build_agent():
     viz_guidelines = load_visualization_guidelines()
     print("✅ Loaded successfully\n")
 
-    # Initialize DuckDB connection with views
+    # Initialize DuckDB connection with views (+ one cursor per concurrent request)
     conn = initialize_duckdb_connection()
+    query_governor = create_query_governor(conn)
+    cursor_pool = CursorPool(conn, size=DUCKDB_POOL_SIZE)
 
-    # Initialize the LLM endpoint
-    llm_endpoint = HuggingFaceEndpoint(
-        repo_id=MODEL_ID,
-        huggingfacehub_api_token=HF_TOKEN,
-        temperature=0.1,
-        max_new_tokens=2048,
-        timeout=TIMEOUT_SECONDS,
-    )
-
-    # Wrap with ChatHuggingFace for conversational interface
-    llm = ChatHuggingFace(llm=llm_endpoint)
+    # Initialize the LLM on first use (unless injected)
+    if llm is None:
+        llm = LazyLLM(create_llm)
 
     # Build the StateGraph
     workflow = StateGraph(AgentState)
 
     # Create nodes with dependencies
-    generate_sql_node = create_generate_sql_node(llm, agent_specs, semantic_layer)
-    execute_sql_node = create_execute_sql_node(conn)
-    generate_viz_node = create_generate_streamlit_views_node(llm, viz_guidelines)
+    prompt_builder = SQLPromptBuilder(load_sql_skill(), semantic_layer)
+    validate_sql_node = create_validate_sql_node(
+        STAR_SCHEMA_TABLES + ROLLUP_TABLES, cursor_pool,
+        max_rows=QUERY_MAX_ROWS, max_scan_bytes=QUERY_MAX_SCAN_BYTES,
+    )
+    generate_sql_node = create_generate_sql_node(
+        llm, agent_specs, semantic_layer, prompt_builder,
+        num_candidates=sql_candidates, validate_sql=validate_sql_node,
+    )
+    execute_sql_node = create_execute_sql_node(
+        conn, RESULT_STORE, cursor_pool, RollupRewriter(available_rollup_tables()), query_governor,
+    )
+    chart_selector = ChartSelector() if chart_rules else None
+    generate_viz_node = create_generate_streamlit_views_node(llm, viz_guidelines, RESULT_STORE, chart_selector)
 
     # Add nodes
-    workflow.add_node("generate_sql", generate_sql_node)
-    workflow.add_node("validate_sql", validate_sql)
-    workflow.add_node("execute_sql", execute_sql_node)
-    workflow.add_node("generate_streamlit_views", generate_viz_node)
+    workflow.add_node("generate_sql", as_node(generate_sql_node))
+    workflow.add_node("validate_sql", validate_sql_node)
+    if parallel_viz:
+        workflow.add_node("execute_sql", as_branch_node(execute_sql_node, EXECUTE_SQL_KEYS))
+        workflow.add_node("plan_visualization", as_node(create_plan_visualization_node(
+            llm, viz_guidelines, conn, cursor_pool, chart_selector,
+        )))
+    else:
+        workflow.add_node("execute_sql", as_node(execute_sql_node))
+    workflow.add_node("generate_streamlit_views", as_node(generate_viz_node))
     workflow.add_node("max_retries_exceeded", max_retries_exceeded)
     workflow.add_node("handle_execution_error", handle_execution_error)
 
     # Define the flow with conditional edges
-    workflow.add_edge(START, "generate_sql")
+    # Fast paths in front of generate_sql: intent templates, then known questions
+    first_node = "generate_sql"
+
+    if question_index is not None:
+        # Conditional edge: known question -> validate stored SQL, otherwise generate
+        workflow.add_node("match_question", create_match_question_node(question_index, QUESTION_MATCH_THRESHOLD))
+        workflow.add_conditional_edges(
+            "match_question",
+            check_question_match,
+            {
+                "matched": "validate_sql",
+                "no_match": "generate_sql",
+            }
+        )
+        first_node = "match_question"
+
+    if intent_router is not None:
+        # Conditional edge: known intent -> validate template SQL, otherwise next path
+        workflow.add_node("route_intent", create_route_intent_node(intent_router))
+        workflow.add_conditional_edges(
+            "route_intent",
+            check_intent_route,
+            {
+                "routed": "validate_sql",
+                "not_routed": first_node,
+            }
+        )
+        first_node = "route_intent"
+
+    workflow.add_edge(START, first_node)
     workflow.add_edge("generate_sql", "validate_sql")
 
     # Conditional edge: if valid -> execute, if invalid -> retry or fail
-    workflow.add_conditional_edges(
-        "validate_sql",
-        check_sql_validity,
-        {
-            "valid": "execute_sql",
-            "invalid": "generate_sql",  # Retry loop (if retry_count < 3)
-            "max_retries": "max_retries_exceeded",  # Exit on max retries
-        }
-    )
+    if parallel_viz:
+        # Valid SQL fans out to execute_sql and plan_visualization (same step: the next
+        # node, after execute_sql, runs once both are done)
+        workflow.add_conditional_edges(
+            "validate_sql",
+            check_sql_validity_fan_out,
+            ["execute_sql", "plan_visualization", "generate_sql", "max_retries_exceeded"],
+        )
+    else:
+        workflow.add_conditional_edges(
+            "validate_sql",
+            check_sql_validity,
+            {
+                "valid": "execute_sql",
+                "invalid": "generate_sql",  # Retry loop (if retry_count < 3)
+                "max_retries": "max_retries_exceeded",  # Exit on max retries
+            }
+        )
 
     # Conditional edge: if execution succeeds -> generate viz, if fails -> handle error
     workflow.add_conditional_edges(
@@ -241,39 +611,199 @@ def build_agent():
     return workflow.compile()
 
 
-def run_agent(question: str, compiled_app=None):
-    """Run the agent with a question and return results
+def is_successful_answer(state: dict) -> bool:
+    """True if the agent produced SQL, results and visualization code without errors"""
+    return (
+        bool(state.get("generated_sql"))
+        and not state.get("validation_error")
+        and not state.get("execution_error", False)
+        and bool(state.get("streamlit_code"))
+    )
 
-    Args:
-        question: Natural language question
-        compiled_app: Pre-compiled LangGraph app (optional, will build if None)
 
-    Returns:
-        AgentState dict with query_results, result_columns, generated_sql, streamlit_code
-    """
-    if compiled_app is None:
-        compiled_app = build_agent()
-
-    initial_state = {
+def create_initial_state(question: str) -> dict:
+    """Initial AgentState for a question"""
+    return {
         "question": question,
         "generated_sql": "",
         "sql_valid": False,
         "validation_error": "",
         "retry_count": 0,
         "execution_error": False,
-        "query_results": [],
+        "result_handle": "",
+        "result_summary": {},
         "result_columns": [],
+        "result_row_count": 0,
+        "query_error": {},
         "streamlit_code": "",
+        "planned_streamlit_code": "",
+        "matched_question": "",
+        "match_score": 0.0,
+        "routed_intent": "",
+        "prompt_tokens": 0,
         "messages": [],
     }
 
-    return compiled_app.invoke(initial_state)
+
+def get_query_results(state: dict):
+    """Result table (pyarrow.Table, first page) of an agent state, None if there is none
+
+    Resolved lazily from the result store: the state only carries its handle.
+    """
+    handle = state.get("result_handle")
+    return RESULT_STORE.get(handle) if handle else None
+
+
+def get_cached_answer(question: str, answer_cache: AnswerCache | None) -> dict | None:
+    """Full result state for a cached question, or None on miss"""
+    if answer_cache is None:
+        return None
+
+    cached = answer_cache.get(question)
+    if cached is None:
+        return None
+
+    # The cached result table goes back to the result store, the state gets a handle
+    import pyarrow as pa
+
+    table = cached.pop("query_results", None)
+    if not isinstance(table, pa.Table):
+        return None
+
+    print("⚡ Answer cache hit")
+    return {
+        **create_initial_state(question),
+        **cached,
+        "result_handle": RESULT_STORE.put(table),
+        "result_summary": RESULT_STORE.summarize(table),
+        "sql_valid": True,
+        "from_cache": True,
+    }
+
+
+def record_answer(
+    question: str,
+    result: dict,
+    answer_cache: AnswerCache | None,
+    question_index: "QuestionIndex | None",
+) -> None:
+    """Store a successful answer in the cache and the question index"""
+    if not is_successful_answer(result):
+        return
+
+    if answer_cache is not None:
+        answer_cache.put(question, {**result, "query_results": get_query_results(result)})
+    # Make the answered question available for near-duplicate matching
+    if question_index is not None and not result.get("matched_question") and not result.get("routed_intent"):
+        question_index.add(question, result["generated_sql"], source="answered")
+
+
+def run_agent(
+    question: str,
+    compiled_app=None,
+    answer_cache: AnswerCache | None = None,
+    question_index: "QuestionIndex | None" = None,
+):
+    """Run the agent with a question and return results
+
+    Args:
+        question: Natural language question
+        compiled_app: Pre-compiled LangGraph app (optional, will build if None)
+        answer_cache: Persistent answer cache (optional, repeated questions skip the graph)
+        question_index: Known questions index (optional, successful answers are added to it)
+
+    Returns:
+        AgentState dict with result_handle (see get_query_results), result_columns,
+        generated_sql, streamlit_code
+    """
+    # Serve repeated questions from the cache (no LLM call, no query)
+    cached = get_cached_answer(question, answer_cache)
+    if cached is not None:
+        return cached
+
+    if compiled_app is None:
+        compiled_app = build_agent(question_index)
+
+    with request_budget(LLM_REQUEST_BUDGET_SECONDS):
+        result = compiled_app.invoke(create_initial_state(question))
+    record_answer(question, result, answer_cache, question_index)
+
+    return result
+
+
+async def arun_agent(
+    question: str,
+    compiled_app=None,
+    answer_cache: AnswerCache | None = None,
+    question_index: "QuestionIndex | None" = None,
+):
+    """Async variant of run_agent (graph runs with ainvoke)
+
+    LLM calls are awaited and DuckDB queries run on pooled cursors in worker
+    threads, so concurrent requests don't serialize behind one blocking call.
+    """
+    cached = await asyncio.to_thread(get_cached_answer, question, answer_cache)
+    if cached is not None:
+        return cached
+
+    if compiled_app is None:
+        compiled_app = await asyncio.to_thread(build_agent, question_index)
+
+    with request_budget(LLM_REQUEST_BUDGET_SECONDS):
+        result = await compiled_app.ainvoke(create_initial_state(question))
+    await asyncio.to_thread(record_answer, question, result, answer_cache, question_index)
+
+    return result
+
+
+def stream_agent(
+    question: str,
+    compiled_app=None,
+    answer_cache: AnswerCache | None = None,
+    question_index: "QuestionIndex | None" = None,
+):
+    """Run the agent and yield progress events as they happen
+
+    Same arguments as run_agent. Yields dicts:
+        {"type": "token", "node": str, "text": str}    - LLM token from a node
+        {"type": "node", "node": str, "update": dict}   - node finished
+        {"type": "result", "state": dict}               - final AgentState (last event)
+    """
+    cached = get_cached_answer(question, answer_cache)
+    if cached is not None:
+        yield {"type": "result", "state": cached}
+        return
+
+    if compiled_app is None:
+        compiled_app = build_agent(question_index)
+
+    final_state = None
+    with request_budget(LLM_REQUEST_BUDGET_SECONDS):
+        stream = compiled_app.stream(
+            create_initial_state(question),
+            stream_mode=["messages", "updates", "values"],
+        )
+
+        for mode, chunk in stream:
+            if mode == "messages":
+                # Token chunks from chat model calls inside nodes
+                message, metadata = chunk
+                if message.content:
+                    yield {"type": "token", "node": metadata.get("langgraph_node", ""), "text": message.content}
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    yield {"type": "node", "node": node, "update": update or {}}
+            else:
+                final_state = chunk
+
+    record_answer(question, final_state, answer_cache, question_index)
+    yield {"type": "result", "state": final_state}
 
 
 def main():
     """CLI entry point for testing"""
     # Build agent once
-    app = build_agent()
+    app = build_agent(intent_router=create_intent_router())
 
     # Test with a simple question
     question = "How many batches were produced by each business unit?"
@@ -286,7 +816,7 @@ def main():
     print(f"\nGenerated SQL:\n{result.get('generated_sql', 'N/A')}")
     print(f"\nQuery Results:")
     print(f"Columns: {result.get('result_columns', [])}")
-    print(f"Rows: {result.get('query_results', [])}")
+    print(f"Rows: {get_query_results(result)}")
     print(f"\nStreamlit code generated: {len(result.get('streamlit_code', ''))} characters")
 
 
@@ -0,0 +1,71 @@
+"""Agent client - thin HTTP client of agent_server (no graph, LLM or DuckDB in the caller)"""
+
+import json
+import urllib.error
+import urllib.request
+
+import pyarrow as pa
+
+
+class AgentServerError(RuntimeError):
+    """The agent server rejected a request or failed while answering"""
+
+
+class AgentClient:
+    """Talks to an agent_server: same event stream as stream_agent, results as Arrow tables"""
+
+    def __init__(self, base_url: str, timeout: float = 300.0):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload: dict | None = None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        request = urllib.request.Request(
+            f"{self.base_url}{path}", data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            raise AgentServerError(f"{e.code}: {message}") from None
+
+    def health(self) -> dict:
+        with self._request("GET", "/health") as response:
+            return json.loads(response.read())
+
+    def stream(self, question: str):
+        """Yield the agent events of a question as they arrive (see agent.stream_agent)"""
+        with self._request("POST", "/ask", {"question": question}) as response:
+            for line in response:
+                event = json.loads(line)
+                if event["type"] == "error":
+                    raise AgentServerError(event["error"])
+                yield event
+
+    def ask(self, question: str) -> dict:
+        """Final agent state of a question"""
+        for event in self.stream(question):
+            if event["type"] == "result":
+                return event["state"]
+        raise AgentServerError("Agent stream ended without a result")
+
+    def get_query_results(self, state: dict) -> pa.Table | None:
+        """Result table (first page) of a state, None if there is none or it expired on the server"""
+        handle = state.get("result_handle")
+        if not handle:
+            return None
+        try:
+            with self._request("GET", f"/results/{handle}") as response:
+                return pa.ipc.open_stream(response.read()).read_all()
+        except AgentServerError as e:
+            if str(e).startswith("404"):
+                return None
+            raise
+
+    def fetch_result_page(self, sql: str, page: int) -> pa.Table:
+        """Page `page` (0-based) of a query result"""
+        with self._request("POST", "/page", {"sql": sql, "page": page}) as response:
+            return pa.ipc.open_stream(response.read()).read_all()
@@ -0,0 +1,245 @@
+"""Agent server - one warm agent shared by several Streamlit processes over local HTTP
+
+Endpoints:
+    GET  /health                 {"status": "ok", "workers": int}
+    POST /ask   {"question"}     NDJSON stream of stream_agent events (token, node, result)
+    GET  /results/<handle>       Arrow IPC stream of a stored result table (404 once expired)
+    POST /page  {"sql", "page"}  Arrow IPC stream of one result page (SQL re-validated first, 504 past the query deadline)
+
+Usage:
+    python agent_server.py [--host 127.0.0.1] [--port 8765] [--workers 8] [--stub-llm]
+"""
+
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pyarrow as pa
+
+from agent import (
+    QUERY_MAX_ROWS,
+    QUERY_MAX_SCAN_BYTES,
+    RESULT_STORE,
+    ROLLUP_TABLES,
+    STAR_SCHEMA_TABLES,
+    build_agent,
+    create_answer_cache,
+    create_intent_router,
+    create_query_governor,
+    create_question_index,
+    fetch_result_page,
+    initialize_duckdb_connection,
+    stream_agent,
+)
+from cursor_pool import CursorPool
+from nodes import create_validate_sql_node
+
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def to_json_state(state: dict) -> dict:
+    """Agent state without its LangGraph messages (the rest is JSON-serializable)"""
+    return {key: value for key, value in state.items() if key != "messages"}
+
+
+def to_json_event(event: dict) -> dict:
+    """stream_agent event with its state / update made JSON-serializable"""
+    if event["type"] == "result":
+        return {**event, "state": to_json_state(event["state"])}
+    if event["type"] == "node":
+        return {**event, "update": to_json_state(event["update"])}
+    return event
+
+
+def arrow_bytes(table: pa.Table) -> bytes:
+    """Arrow IPC stream of a table"""
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class AgentService:
+    """Compiled agent, caches and DuckDB connection shared by all server requests"""
+
+    def __init__(self, compiled_app, answer_cache=None, question_index=None, conn=None):
+        self.compiled_app = compiled_app
+        self.answer_cache = answer_cache
+        self.question_index = question_index
+        self.conn = conn if conn is not None else initialize_duckdb_connection()
+        self.governor = create_query_governor(self.conn)
+        self.validate_sql = create_validate_sql_node(
+            STAR_SCHEMA_TABLES + ROLLUP_TABLES, CursorPool(self.conn, size=2),
+            max_rows=QUERY_MAX_ROWS, max_scan_bytes=QUERY_MAX_SCAN_BYTES,
+        )
+
+    @classmethod
+    def create(cls, llm=None) -> "AgentService":
+        """Production service: answer cache, question index and intent router (llm injectable)"""
+        answer_cache = create_answer_cache()
+        intent_router = create_intent_router()
+        question_index = create_question_index(answer_cache, intent_router)
+        compiled_app = build_agent(question_index=question_index, intent_router=intent_router, llm=llm)
+        return cls(compiled_app, answer_cache, question_index)
+
+    def stream(self, question: str):
+        """stream_agent events for a question, JSON-serializable"""
+        for event in stream_agent(question, self.compiled_app, self.answer_cache, self.question_index):
+            yield to_json_event(event)
+
+    def results(self, handle: str) -> pa.Table | None:
+        """Stored result table of a handle, None if unknown or expired"""
+        return RESULT_STORE.get(handle)
+
+    def page(self, sql: str, page: int) -> pa.Table:
+        """One page of a query result (the SQL goes through validate_sql again, ValueError if rejected)"""
+        checked = self.validate_sql({"generated_sql": sql})
+        if not checked["sql_valid"]:
+            raise ValueError(checked["validation_error"])
+        return fetch_result_page(self.conn, checked["generated_sql"], page, governor=self.governor)
+
+
+class AgentRequestHandler(BaseHTTPRequestHandler):
+    """HTTP endpoints of an AgentService (server.service)"""
+
+    # HTTP/1.1 for chunked event streams, one request per connection so idle clients hold no worker
+    protocol_version = "HTTP/1.1"
+
+    def end_headers(self):
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass  # Requests are logged by the agent nodes
+
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, payload: dict) -> None:
+        self.send_body(status, json.dumps(payload, default=str).encode(), "application/json")
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        if self.path == "/health":
+            return self.send_json(200, {"status": "ok", "workers": self.server.workers})
+
+        match = re.fullmatch(r"/results/([0-9a-f]+)", self.path)
+        if match:
+            table = self.server.service.results(match.group(1))
+            if table is None:
+                return self.send_json(404, {"error": "Unknown or expired result handle"})
+            return self.send_body(200, arrow_bytes(table), ARROW_STREAM_TYPE)
+
+        self.send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        try:
+            payload = self.read_json()
+        except ValueError as e:
+            return self.send_json(400, {"error": f"Invalid JSON body: {e}"})
+
+        if self.path == "/ask":
+            if not payload.get("question"):
+                return self.send_json(400, {"error": "Missing question"})
+            return self.stream_events(payload["question"])
+
+        if self.path == "/page":
+            try:
+                table = self.server.service.page(payload.get("sql", ""), int(payload.get("page", 0)))
+            except ValueError as e:
+                return self.send_json(400, {"error": str(e)})
+            except TimeoutError as e:
+                return self.send_json(504, {"error": str(e)})
+            return self.send_body(200, arrow_bytes(table), ARROW_STREAM_TYPE)
+
+        self.send_json(404, {"error": f"Unknown path: {self.path}"})
+
+    def stream_events(self, question: str) -> None:
+        """Events as NDJSON lines, sent as they happen (chunked transfer encoding)"""
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_chunk(data: bytes) -> None:
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        try:
+            for event in self.server.service.stream(question):
+                send_chunk(json.dumps(event, default=str).encode() + b"\n")
+        except Exception as e:
+            send_chunk(json.dumps({"type": "error", "error": str(e)}).encode() + b"\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class AgentServer(HTTPServer):
+    """HTTP server handing each connection to a fixed pool of worker threads"""
+
+    def __init__(self, service: AgentService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, workers: int = DEFAULT_WORKERS):
+        super().__init__((host, port), AgentRequestHandler)
+        self.service = service
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="agent-worker")
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def process_request(self, request, client_address):
+        self._executor.submit(self.process_request_worker, request, client_address)
+
+    def process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Requests served concurrently")
+    parser.add_argument("--stub-llm", action="store_true", help="Answer with the stub LLM (no HuggingFace calls)")
+    args = parser.parse_args()
+
+    llm = None
+    if args.stub_llm:
+        from stub_llm import StubLLM
+        llm = StubLLM()
+
+    server = AgentServer(AgentService.create(llm), args.host, args.port, args.workers)
+    print(f"🛰️  Agent server listening on {server.url} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
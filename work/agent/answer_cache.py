@@ -0,0 +1,181 @@
+"""Answer cache - persistent store of agent answers keyed on question + data snapshot"""
+
+import hashlib
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+# Fields stored for a cached answer (enough to render the Streamlit view),
+# query_results being the result table itself rather than its store handle
+CACHED_FIELDS = ("generated_sql", "query_results", "result_columns", "result_row_count", "streamlit_code")
+
+
+def normalize_question(question: str) -> str:
+    """Normalize question text (lowercase, no punctuation, single spaces)"""
+    text = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(text.split())
+
+
+def compute_data_fingerprint(paths: list) -> str:
+    """Fingerprint data files from their size and modification time
+
+    Directories are walked recursively so partitioned datasets are covered too.
+    Any rewrite by the ETL changes the fingerprint.
+    """
+    digest = hashlib.sha256()
+
+    for path in sorted(Path(p) for p in paths):
+        files = sorted(f for f in path.rglob("*") if f.is_file()) if path.is_dir() else [path]
+        for file in files:
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                digest.update(f"{file}:missing;".encode())
+                continue
+            digest.update(f"{file}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+
+    return digest.hexdigest()[:16]
+
+
+class AnswerCache:
+    """SQLite-backed answer cache with LRU + TTL eviction
+
+    Entries are keyed on the normalized question plus the fingerprint of the
+    star schema files, so answers computed on an older snapshot never match.
+    A version (e.g. of the render_visualization contract the cached code was
+    written for) is part of the fingerprint too. Stale snapshots are purged as
+    soon as a new fingerprint is observed.
+    """
+
+    def __init__(
+        self,
+        db_path: Path,
+        data_paths: list,
+        max_entries: int = 500,
+        ttl_seconds: int = 86400,
+        version: str = "",
+    ):
+        self.db_path = Path(db_path)
+        self.data_paths = list(data_paths)
+        self.version = version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._lock = threading.Lock()
+        self._last_fingerprint = None
+
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS answers (
+                cache_key TEXT PRIMARY KEY,
+                question TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(question: str, fingerprint: str) -> str:
+        """Cache key = hash of normalized question + data fingerprint"""
+        raw = f"{normalize_question(question)}|{fingerprint}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _current_fingerprint(self) -> str:
+        """Compute data fingerprint (with the version) and purge entries from older snapshots"""
+        fingerprint = compute_data_fingerprint(self.data_paths)
+        if self.version:
+            fingerprint = f"{self.version}-{fingerprint}"
+
+        if fingerprint != self._last_fingerprint:
+            deleted = self._conn.execute(
+                "DELETE FROM answers WHERE fingerprint != ?", (fingerprint,)
+            ).rowcount
+            self._conn.commit()
+            if deleted:
+                print(f"♻️  Answer cache: data or version changed, dropped {deleted} stale entries")
+            self._last_fingerprint = fingerprint
+
+        return fingerprint
+
+    def get(self, question: str) -> dict | None:
+        """Return cached answer fields for a question, or None on miss"""
+        with self._lock:
+            key = self.make_key(question, self._current_fingerprint())
+            row = self._conn.execute(
+                "SELECT payload, created_at FROM answers WHERE cache_key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            payload, created_at = row
+            now = time.time()
+
+            # Expired entry (TTL)
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM answers WHERE cache_key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            # Refresh LRU position
+            self._conn.execute("UPDATE answers SET last_accessed = ? WHERE cache_key = ?", (now, key))
+            self._conn.commit()
+
+        return pickle.loads(payload)
+
+    def put(self, question: str, state: dict) -> None:
+        """Store the answer fields of a successful agent run"""
+        answer = {field: state.get(field) for field in CACHED_FIELDS}
+        payload = pickle.dumps(answer, protocol=pickle.HIGHEST_PROTOCOL)
+
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            key = self.make_key(question, fingerprint)
+            now = time.time()
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                (key, question, fingerprint, payload, now, now),
+            )
+
+            # Evict expired entries, then least recently used ones above max_entries
+            self._conn.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM answers WHERE cache_key NOT IN (
+                    SELECT cache_key FROM answers ORDER BY last_accessed DESC LIMIT ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def entries(self) -> list[tuple[str, str]]:
+        """Return (question, generated_sql) pairs for the current data snapshot"""
+        with self._lock:
+            fingerprint = self._current_fingerprint()
+            rows = self._conn.execute(
+                "SELECT question, payload FROM answers WHERE fingerprint = ?", (fingerprint,)
+            ).fetchall()
+
+        return [(question, pickle.loads(payload).get("generated_sql", "")) for question, payload in rows]
+
+    def clear(self) -> None:
+        """Remove all cached answers"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
@@ -0,0 +1,104 @@
+"""Cold start benchmark - `import agent` (-X importtime) and Streamlit first-page render
+
+Each measurement runs in a fresh interpreter. The lazy path is the current
+code (LLM, DuckDB, LangGraph, pyarrow loaded on the first question); the
+eager path imports those dependencies up front, as agent.py used to.
+
+Usage:
+    python benchmarks/cold_start_bench.py [--runs 5] [--top 8]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+AGENT_DIR = Path(__file__).parent.parent
+STREAMLIT_APP = AGENT_DIR.parent / "streamlit-app" / "streamlit_app.py"
+
+# Modules agent.py imported eagerly before they were deferred to the first question
+DEFERRED_MODULES = ["duckdb", "pyarrow", "numpy", "yaml", "langchain_core.runnables", "llm_gateway", "langgraph.graph", "nodes"]
+
+FIRST_RENDER_SCRIPT = """
+import sys, time
+sys.path.insert(0, {agent_dir!r})
+from streamlit.testing.v1 import AppTest
+start = time.perf_counter()
+for module in {preload!r}:
+    __import__(module)
+at = AppTest.from_file({app!r}, default_timeout=120).run()
+elapsed = time.perf_counter() - start
+assert not at.exception, at.exception
+print(elapsed)
+print(",".join(m for m in {deferred!r} if m in sys.modules))
+"""
+
+
+def run_python(args: list[str]) -> subprocess.CompletedProcess:
+    """Run a fresh interpreter in the agent directory (without an HF token: it is only needed by the LLM)"""
+    env = {key: value for key, value in os.environ.items() if key != "HF_TOKEN"}
+    return subprocess.run([sys.executable, *args], cwd=AGENT_DIR, env=env, capture_output=True, text=True, check=True)
+
+
+def import_profile(preload: list[str]) -> tuple[float, list[tuple[float, str]]]:
+    """Cumulative seconds of the imports, and the slowest of them (preloads and agent's direct imports)"""
+    code = "".join(f"import {module}\n" for module in preload) + "import agent"
+    stderr = run_python(["-X", "importtime", "-c", code]).stderr
+
+    # Children are reported before their parent, one more indentation level (2 spaces) deep
+    imports, children = [], []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        seconds = int(cumulative) / 1e6
+        if depth == 1:
+            children.append((seconds, f"agent > {name.strip()}"))
+        elif depth == 0:
+            if name.strip() == "agent":
+                imports += children
+            if name.strip() in preload + ["agent"]:
+                imports.append((seconds, name.strip()))
+            children = []
+
+    total = sum(seconds for seconds, name in imports if name in preload + ["agent"])
+    return total, sorted(imports, reverse=True)
+
+
+def first_render(preload: list[str]) -> tuple[float, list[str]]:
+    """Seconds to the first rendered page of the Streamlit app, and the deferred modules it loaded"""
+    script = FIRST_RENDER_SCRIPT.format(agent_dir=str(AGENT_DIR), preload=preload, app=str(STREAMLIT_APP), deferred=DEFERRED_MODULES)
+    elapsed, loaded = run_python(["-c", script]).stdout.strip().splitlines()[-2:]
+    return float(elapsed), [module for module in loaded.split(",") if module]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument("--top", type=int, default=8, help="Slowest imports listed")
+    args = parser.parse_args()
+
+    paths = {"Lazy (current)": [], "Eager (deferred modules imported up front)": DEFERRED_MODULES}
+
+    print("=" * 60)
+    print(f"Cold start: median of {args.runs} fresh interpreters")
+    print("=" * 60)
+
+    for name, preload in paths.items():
+        profiles = [import_profile(preload) for _ in range(args.runs)]
+        renders = [first_render(preload) for _ in range(args.runs)]
+
+        print(f"\n{name}")
+        print(f"  import agent (+ preloads): {statistics.median(total for total, _ in profiles) * 1000:.0f} ms")
+        print(f"  Streamlit 1st page:        {statistics.median(seconds for seconds, _ in renders) * 1000:.0f} ms")
+        print(f"  Deferred modules loaded by the 1st page: {', '.join(renders[0][1]) or 'none'}")
+        print("  Slowest imports (-X importtime, cumulative):")
+        for seconds, module in profiles[0][1][:args.top]:
+            print(f"    {seconds * 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Intent router benchmark - hit rate, accuracy and latency on a labeled question set
+
+Usage:
+    python benchmarks/intent_router_bench.py [--repeat 200]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import initialize_duckdb_connection
+from intent_router import IntentRouter
+
+
+# (question, expected intent or None when the LLM should answer)
+QUESTIONS = [
+    ("How many batches were produced by each business unit?", "production_volume_by_bu"),
+    ("How many batches per BU?", "production_volume_by_bu"),
+    ("Production volume by business unit in 2024", "production_volume_by_bu"),
+    ("Doses and units per BU for poultry", "production_volume_by_bu"),
+    ("Batches per BU in March 2024", "production_volume_by_bu"),
+    ("Which production sites are the most active?", "production_by_site"),
+    ("Batches per site", "production_by_site"),
+    ("Busiest plants in Europe", "production_by_site"),
+    ("Production by site for ruminants since June", "production_by_site"),
+    ("Show production volume by month", "production_timeline"),
+    ("Monthly production for poultry", "production_timeline"),
+    ("Production trend between January and June 2024", "production_timeline"),
+    ("Batches by month from 2024-03 to 2024-05", "production_timeline"),
+    ("Monthly batches in France", "production_timeline"),
+    ("Show me batch status distribution by business unit", "batch_status_by_bu"),
+    ("Batch status breakdown for companion", "batch_status_by_bu"),
+    ("Batch status in Q3", "batch_status_by_bu"),
+    ("Which animal species have the most production batches?", "production_by_species"),
+    ("Batches per species", "production_by_species"),
+    ("List all products for dogs", "products_by_species"),
+    ("Products for cattle", "products_by_species"),
+    ("Which products are used for chickens?", "products_by_species"),
+    ("What are the latest production batches?", "recent_production"),
+    ("Most recent batches at Libourne", "recent_production"),
+    ("Which products require cold storage?", "cold_storage_products"),
+    ("Refrigerated products for poultry", "cold_storage_products"),
+    ("How many batches have GMP deviations?", "quality_issues"),
+    ("GMP deviation rate for ruminants", "quality_issues"),
+    ("What is the distribution of batches by therapeutic class?", "therapeutic_class_distribution"),
+    ("Therapeutic class breakdown", "therapeutic_class_distribution"),
+    # Questions outside the templates (LLM fallback)
+    ("What is the average dose volume per product?", None),
+    ("Which products for dogs are stored cold?", None),
+    ("Compare rejected batches between Libourne and Lenexa", None),
+    ("Which products are light sensitive?", None),
+    ("How many distinct products does each site make?", None),
+    ("What is the expiry date of batch B-1234?", None),
+    ("Top 5 products by doses", None),
+    ("Which destination markets receive companion products?", None),
+    ("Average time between production and release", None),
+    ("What is the weather today?", None),
+]
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200, help="Timed routing passes over the question set")
+    args = parser.parse_args()
+
+    conn = initialize_duckdb_connection()
+    router = IntentRouter.from_connection(conn)
+
+    routed = correct = misrouted = 0
+    for question, expected in QUESTIONS:
+        route = router.route(question)
+        intent = route["intent"] if route else None
+        if route:
+            routed += 1
+            # Template SQL must run
+            conn.execute(route["sql"]).fetchall()
+        if intent == expected:
+            correct += 1
+        elif route is not None:
+            misrouted += 1
+            print(f"⚠️  Misrouted: {question!r} -> {intent} (expected {expected})")
+        else:
+            print(f"→ Missed: {question!r} (expected {expected})")
+
+    latencies = []
+    for _ in range(args.repeat):
+        for question, _ in QUESTIONS:
+            start = time.perf_counter()
+            router.route(question)
+            latencies.append((time.perf_counter() - start) * 1e6)
+
+    routable = sum(1 for _, expected in QUESTIONS if expected)
+    print("\n" + "=" * 60)
+    print(f"Intent router: {len(QUESTIONS)} questions ({routable} with a known intent)")
+    print("=" * 60)
+    print(f"Hit rate:        {routed}/{len(QUESTIONS)} routed ({routed / routable:.0%} of routable)")
+    print(f"Accuracy:        {correct}/{len(QUESTIONS)} ({misrouted} misrouted)")
+    print(f"Routing latency: p50 {statistics.median(latencies):.0f} µs, p95 {percentile(latencies, 95):.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
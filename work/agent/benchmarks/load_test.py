@@ -0,0 +1,78 @@
+"""Load test - concurrent arun_agent sessions against a stubbed LLM
+
+Reports throughput and latency percentiles at several concurrency levels.
+
+Usage:
+    python benchmarks/load_test.py [--requests 64] [--latency 0.3] [--concurrency 1 8 32]
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, arun_agent, get_query_results
+from stub_llm import StubLLM
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_level(app, concurrency: int, total_requests: int) -> dict:
+    """Run total_requests questions with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one_request(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await arun_agent(f"How many batches per business unit? (session {i})", app)
+            latencies.append(time.perf_counter() - start)
+            assert get_query_results(result).num_rows, "Stubbed request returned no rows"
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one_request(i) for i in range(total_requests)))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "throughput": total_requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p95": percentile(latencies, 95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=64, help="Requests per concurrency level")
+    parser.add_argument("--latency", type=float, default=0.3, help="Stub LLM latency per call (seconds)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    app = build_agent(llm=StubLLM(latency_seconds=args.latency))
+
+    results = []
+    for concurrency in args.concurrency:
+        print(f"\n🚦 {concurrency} concurrent sessions...")
+        results.append(asyncio.run(run_level(app, concurrency, args.requests)))
+
+    print("\n" + "=" * 60)
+    print(f"Load test: {args.requests} requests/level, stub LLM latency {args.latency}s/call")
+    print("=" * 60)
+    print(f"{'sessions':>8} | {'req/s':>8} | {'p50 (s)':>8} | {'p95 (s)':>8}")
+    for r in results:
+        print(f"{r['concurrency']:>8} | {r['throughput']:>8.2f} | {r['p50']:>8.3f} | {r['p95']:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Column profiling benchmark - analyze_data_context on wide results
+
+Compares the previous per-value Python profiling (row tuples, re.match per
+value, full scan for nulls) with the columnar profiling on pyarrow.compute
+and on DuckDB's SUMMARIZE.
+
+Usage:
+    python benchmarks/profiling_bench.py [--rows 10000] [--columns 50] [--repeat 20]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pyarrow as pa
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from nodes.generate_streamlit_views import analyze_data_context
+
+
+def legacy_infer_column_type(values: list) -> str:
+    """Type inference of the previous implementation (per value)"""
+    non_null_values = [v for v in values if v is not None]
+    if not non_null_values:
+        return "unknown"
+    if all(isinstance(v, (int, float, Decimal)) for v in non_null_values):
+        return "numeric"
+    if any(isinstance(v, date) for v in non_null_values):
+        return "datetime"
+    if all(isinstance(v, str) for v in non_null_values):
+        if any(re.match(r'\d{4}-\d{2}-\d{2}', str(v)) for v in non_null_values[:3]):
+            return "datetime"
+    return "string"
+
+
+def legacy_analyze(table: pa.Table) -> list[dict]:
+    """Previous profiling: rows converted to tuples, then one Python loop per column"""
+    rows = list(zip(*(column.to_pylist() for column in table.columns)))
+    column_metadata = []
+    for col_idx, col_name in enumerate(table.column_names):
+        col_values = [row[col_idx] if col_idx < len(row) else None for row in rows[:10]]
+        column_metadata.append({
+            "name": col_name,
+            "inferred_type": legacy_infer_column_type(col_values),
+            "sample_values": [v for v in col_values if v is not None][:5],
+            "has_nulls": any(row[col_idx] is None if col_idx < len(row) else True for row in rows),
+            "distinct_count": len(set(row[col_idx] for row in rows if col_idx < len(row))),
+        })
+    return column_metadata
+
+
+def make_table(num_rows: int, num_columns: int) -> pa.Table:
+    """Result-like table: categories, metrics with nulls, counts, dates and ISO date strings"""
+    start = datetime(2024, 1, 1)
+    columns = {}
+    for i in range(num_columns):
+        kind = i % 5
+        if kind == 0:
+            columns[f"category_{i}"] = [f"value_{j % 40}" for j in range(num_rows)]
+        elif kind == 1:
+            columns[f"metric_{i}"] = [j * 0.5 if j % 7 else None for j in range(num_rows)]
+        elif kind == 2:
+            columns[f"count_{i}"] = list(range(num_rows))
+        elif kind == 3:
+            columns[f"date_{i}"] = [start + timedelta(hours=j) for j in range(num_rows)]
+        else:
+            columns[f"month_{i}"] = [f"2024-{j % 12 + 1:02d}-01" for j in range(num_rows)]
+    return pa.table(columns)
+
+
+def median_ms(func, repeat: int) -> float:
+    func()  # Warm-up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000, help="Result rows")
+    parser.add_argument("--columns", type=int, default=50, help="Result columns")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed runs per implementation")
+    args = parser.parse_args()
+
+    table = make_table(args.rows, args.columns)
+
+    print("=" * 60)
+    print(f"Column profiling: {args.rows} rows x {args.columns} columns (median of {args.repeat})")
+    print("=" * 60)
+
+    results = {
+        "Python loop (previous)": median_ms(lambda: legacy_analyze(table), max(3, args.repeat // 5)),
+        "pyarrow.compute": median_ms(lambda: analyze_data_context(table, table.column_names, "", ""), args.repeat),
+        "DuckDB SUMMARIZE": median_ms(lambda: analyze_data_context(table, table.column_names, "", "", engine="duckdb"), args.repeat),
+    }
+    baseline = results["Python loop (previous)"]
+    for name, ms in results.items():
+        print(f"  {name:<24} {ms:9.1f} ms  ({baseline / ms:5.1f}x)")
+
+    # Same column types as before (previous inference only looked at the first 10 rows)
+    legacy_types = [column["inferred_type"] for column in legacy_analyze(table.slice(0, 10))]
+    arrow_types = [column["inferred_type"] for column in analyze_data_context(table, table.column_names, "", "")["column_metadata"]]
+    print(f"\nInferred types identical: {legacy_types == arrow_types}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""SQL validation benchmark - false rejections / acceptances of the regex and parser validators
+
+Legitimate queries (semantic layer examples, routed intent templates and
+hand-written queries an LLM typically produces) must pass; unsafe or broken
+ones must be rejected. Every false rejection costs one extra LLM retry, every
+query failing at execution ends the run with an error.
+
+Usage:
+    python benchmarks/sql_validation_bench.py [--repeat 20]
+"""
+
+import argparse
+import io
+import re
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import (
+    ROLLUP_TABLES,
+    STAR_SCHEMA_TABLES,
+    initialize_duckdb_connection,
+    load_semantic_layer,
+)
+from cursor_pool import CursorPool
+from intent_router import IntentRouter
+from nodes import create_validate_sql_node
+from question_index import load_question_examples, with_limit
+from intent_router_bench import QUESTIONS, percentile
+
+
+# Legitimate queries the regex validator stumbles on (keywords in literals, functions, aliases)
+HANDWRITTEN_VALID = [
+    "SELECT replace(product_name, 'Vax', 'Vaccine') AS product, COUNT(*) AS n FROM dim_product GROUP BY 1 LIMIT 50",
+    "SELECT batch_id, batch_status FROM fact_batch_production WHERE batch_status = 'rejected' OR destination_market = 'update pending' LIMIT 100",
+    "SELECT product_name FROM dim_product WHERE product_name ILIKE '%drop%' OR therapeutic_class = 'insert' LIMIT 20",
+    "SELECT bu_source, COUNT(*) AS created_batches, MAX(release_date) AS last_update FROM fact_batch_production GROUP BY bu_source LIMIT 10",
+    "SELECT * REPLACE (upper(country) AS country) FROM dim_site LIMIT 20",
+    "SELECT site_code, regexp_replace(site_code, '-.*', '') AS city FROM dim_site LIMIT 20",
+    "-- Batches per BU, don't DELETE this comment\nSELECT bu_source, COUNT(*) FROM fact_batch_production GROUP BY 1 LIMIT 10",
+    "SELECT bu_source, COUNT(*) AS n FROM fact_batch_production GROUP BY bu_source ORDER BY n DESC\nlimit\n10",
+    "SELECT s.specie_name, COUNT(*) AS n FROM fact_batch_production f, UNNEST(f.targeted_species) AS t(specie_fk) "
+    "JOIN dim_specie s ON s.specie_sk = t.specie_fk GROUP BY 1 ORDER BY 2 DESC LIMIT 10",
+    "WITH monthly AS (SELECT date_trunc('month', production_date) AS month, COUNT(*) AS n FROM fact_batch_production GROUP BY 1) "
+    "SELECT month, n, n - LAG(n) OVER (ORDER BY month) AS delta FROM monthly ORDER BY month LIMIT 100",
+    "SELECT bu_source FROM dim_product UNION SELECT bu_source FROM dim_site ORDER BY 1 LIMIT 10",
+    "SELECT product_code, 'alter ego' AS label FROM dim_product LIMIT 5",
+    # No top-level LIMIT: validate_sql adds one instead of asking for a regeneration
+    "SELECT batch_id FROM fact_batch_production",
+    "SELECT batch_id FROM (SELECT batch_id FROM fact_batch_production LIMIT 10) JOIN dim_site ON true",
+]
+
+# Queries that must not reach execution: (query, reason)
+INVALID = [
+    ("DROP TABLE fact_batch_production", "DDL"),
+    ("DELETE FROM fact_batch_production WHERE true", "DML"),
+    ("INSERT INTO dim_site VALUES (99, 'X', 'Y', 'Z', 'poultry')", "DML"),
+    ("COPY fact_batch_production TO '/tmp/dump.csv'", "file write"),
+    ("ATTACH '/tmp/other.db' AS other", "attach"),
+    ("SELECT 1 LIMIT 1; DROP TABLE dim_site", "stacked statement"),
+    ("SELECT * FROM read_csv('/etc/passwd') LIMIT 10", "file read"),
+    ("SELECT * FROM '/etc/passwd' LIMIT 10", "file read (replacement scan)"),
+    ("SELECT * FROM dim_site, read_text('/root/.env') LIMIT 10", "file read"),
+    ("SELECT * FROM duckdb_settings() LIMIT 100", "system catalog"),
+    ("SELECT * FROM information_schema.tables LIMIT 100", "system catalog"),
+    ("SELECT batch_id FROM fact_batch_production LIMIT 50000", "LIMIT too high"),
+    ("SELECT batch_id FROM fact_batch_production LIMIT 50 PERCENT", "LIMIT percent"),
+    # Valid syntax, but fails when executed (binder errors)
+    ("SELECT batch_number FROM fact_batch_production LIMIT 10", "unknown column"),
+    ("SELECT product_name, COUNT(*) FROM dim_product LIMIT 10", "missing GROUP BY"),
+    ("SELECT bu_source FROM fact_batch_production f JOIN dim_site s ON f.site_fk = s.site_sk LIMIT 10", "ambiguous column"),
+]
+
+
+# Forbidden SQL keywords of the regex validator
+FORBIDDEN_KEYWORDS = [
+    "INSERT", "UPDATE", "DELETE", "DROP", "CREATE", "ALTER",
+    "TRUNCATE", "REPLACE", "MERGE", "GRANT", "REVOKE"
+]
+
+
+def regex_check(sql: str) -> str:
+    """Previous validate_sql checks (uppercased query text + regexes)"""
+    sql_upper = " ".join(sql.strip().upper().split())
+    if not sql_upper.startswith("SELECT") and not sql_upper.startswith("WITH"):
+        return "Query must be a SELECT statement (or CTE starting with WITH)"
+    for keyword in FORBIDDEN_KEYWORDS:
+        if re.search(r'\b' + keyword + r'\b', sql_upper):
+            return f"Forbidden operation detected: {keyword}. Only SELECT queries allowed."
+    limit_match = re.search(r'\bLIMIT\s+(\d+)', sql_upper)
+    if not limit_match:
+        return "Query must include a LIMIT clause (max 10000)"
+    if int(limit_match.group(1)) > 10000:
+        return f"LIMIT value ({limit_match.group(1)}) exceeds maximum allowed (10000)"
+    return ""
+
+
+def node_check(validate_sql):
+    """validate_sql node as a sql -> error function"""
+    return lambda sql: validate_sql({"generated_sql": sql})["validation_error"]
+
+
+def valid_corpus(conn) -> list[str]:
+    """Legitimate queries, each checked to run on the star schema"""
+    router = IntentRouter.from_connection(conn)
+    queries = [with_limit(example["sql"]) for example in load_question_examples(load_semantic_layer())]
+    queries += [route["sql"] for route in map(router.route, (question for question, _ in QUESTIONS)) if route]
+    queries += HANDWRITTEN_VALID
+
+    for sql in queries:
+        conn.execute(sql).fetchall()
+    return list(dict.fromkeys(queries))
+
+
+def evaluate(check, valid: list[str], repeat: int) -> tuple[list, list, list]:
+    """False rejections, false acceptances and latencies (µs) of a validator (its logs silenced)"""
+    with redirect_stdout(io.StringIO()):
+        false_rejections = [(sql, error) for sql in valid if (error := check(sql))]
+        false_acceptances = [(sql, reason) for sql, reason in INVALID if not check(sql)]
+
+        latencies = []
+        for _ in range(repeat):
+            for sql in valid:
+                start = time.perf_counter()
+                check(sql)
+                latencies.append((time.perf_counter() - start) * 1e6)
+
+    return false_rejections, false_acceptances, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=20, help="Timed passes over the valid corpus")
+    args = parser.parse_args()
+
+    conn = initialize_duckdb_connection()
+    valid = valid_corpus(conn)
+    allowed_tables = STAR_SCHEMA_TABLES + ROLLUP_TABLES
+    validators = {
+        "Regex validator": regex_check,
+        "Parser validator, parse tree only": node_check(create_validate_sql_node(allowed_tables)),
+        "Parser validator, parse tree + EXPLAIN": node_check(create_validate_sql_node(allowed_tables, CursorPool(conn, size=1))),
+    }
+
+    print("=" * 60)
+    print(f"SQL validation: {len(valid)} valid queries, {len(INVALID)} invalid ones")
+    print("=" * 60)
+
+    for name, check in validators.items():
+        false_rejections, false_acceptances, latencies = evaluate(check, valid, args.repeat)
+
+        print(f"\n{name}")
+        print(f"  False rejections:  {len(false_rejections)}/{len(valid)} ({len(false_rejections) / len(valid):.0%}, one wasted LLM retry each)")
+        for sql, error in false_rejections:
+            print(f"    - {' '.join(sql.split())[:60]}... -> {error}")
+        print(f"  False acceptances: {len(false_acceptances)}/{len(INVALID)}")
+        for sql, reason in false_acceptances:
+            print(f"    - [{reason}] {sql[:70]}")
+        print(f"  Latency:           p50 {statistics.median(latencies):.0f} µs, p95 {percentile(latencies, 95):.0f} µs")
+
+
+if __name__ == "__main__":
+    main()
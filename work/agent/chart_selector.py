@@ -0,0 +1,237 @@
+"""Chart selector - deterministic visualization code for common result shapes (no LLM call)
+
+The rules of skills/visualization-selection.md are applied to the column
+profiles of analyze_data_context (type, distinct and null counts, min / max):
+a single KPI row, a time series, categories
+compared on a few metrics, a small part-to-whole split, two correlated
+metrics, or a table. Each chart is a prebuilt render_visualization template
+validated once when the selector is created; only column positions are filled
+in, so the code of a shape never changes (and stays cached by the app).
+Results the rules can't place are left to the visualization LLM.
+"""
+
+import re
+
+from nodes.generate_streamlit_views import generate_safe_table_fallback, validate_generated_code
+
+
+# Column name words marking a time axis (numeric columns only for whole periods, e.g. year)
+TIME_WORDS = {"date", "time", "day", "week", "month", "quarter", "year", "period"}
+NUMERIC_TIME_WORDS = {"week", "month", "quarter", "year"}
+
+# Question words asking for a part-to-whole view
+PART_WORDS = {"distribution", "share", "shares", "proportion", "proportions", "percentage", "breakdown", "split", "composition"}
+
+# Readability limits (see skills/visualization-selection.md)
+MAX_CHART_COLUMNS = 6
+MAX_KPI_COLUMNS = 4
+MAX_METRICS = 4
+MAX_CATEGORIES = 30
+MAX_PIE_SLICES = 7
+MAX_COLOR_GROUPS = 10
+
+# Shared preamble: numeric columns as floats (DuckDB SUM results arrive as Decimal)
+PREAMBLE = '''    import pandas as pd
+    import plotly.express as px
+    import streamlit as st
+
+    df = pd.DataFrame(rows, columns=columns)
+    metrics = [columns[i] for i in {metrics}]
+    for name in metrics:
+        df[name] = df[name].astype(float)
+    labels = dict(zip(columns, [name.replace("_", " ").title() for name in columns]))
+'''
+
+# render_visualization templates, filled with column positions only
+CHART_TEMPLATES = {
+    "kpi": '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - KPI (rule-based)"""
+''' + PREAMBLE + '''
+    for tile, name in zip(st.columns(len(columns)), columns):
+        value = df[name].tolist()[0]
+        if pd.isna(value):
+            tile.metric(labels[name], "-")
+        else:
+            tile.metric(labels[name], int(value) if value == int(value) else round(value, 2))
+''',
+    "line": '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - line chart (rule-based)"""
+''' + PREAMBLE + '''    x = columns[{x}]
+    color = {color}
+    df = df.sort_values(x)
+
+    fig = px.line(
+        df,
+        x=x,
+        y=metrics if len(metrics) > 1 else metrics[0],
+        color=color,
+        markers=True,
+        title=" / ".join([labels[name] for name in metrics]) + " over " + labels[x],
+        labels=labels,
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Time series data: {{df[x].nunique()}} periods")
+''',
+    "bar": '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - bar chart (rule-based)"""
+''' + PREAMBLE + '''    x = columns[{x}]
+    color = {color}
+
+    fig = px.bar(
+        df,
+        x=x,
+        y=metrics if len(metrics) > 1 else metrics[0],
+        color=color,
+        barmode="group" if color is None else "stack",
+        title=" / ".join([labels[name] for name in metrics]) + " by " + labels[x],
+        labels=labels,
+    )
+    fig.update_layout(xaxis_tickangle=-45, showlegend=color is not None or len(metrics) > 1)
+
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Comparing {{df[x].nunique()}} categories")
+''',
+    "pie": '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - pie chart (rule-based)"""
+''' + PREAMBLE + '''    names = columns[{x}]
+
+    fig = px.pie(
+        df,
+        names=names,
+        values=metrics[0],
+        title="Distribution of " + labels[metrics[0]] + " by " + labels[names],
+        hole=0.3,
+    )
+    fig.update_traces(textposition="inside", textinfo="percent+label")
+
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Distribution across {{len(df)}} categories")
+''',
+    "scatter": '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - scatter plot (rule-based)"""
+''' + PREAMBLE + '''
+    fig = px.scatter(
+        df,
+        x=metrics[0],
+        y=metrics[1],
+        title="Correlation: " + labels[metrics[0]] + " vs " + labels[metrics[1]],
+        labels=labels,
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Analyzing {{len(df)}} data points")
+''',
+}
+
+
+def column_expression(position: int | None) -> str:
+    """Python expression of a column name in the template (None when unused)"""
+    return "None" if position is None else f"columns[{int(position)}]"
+
+
+def fill_template(kind: str, metrics: list[int], x: int | None = None, color: int | None = None) -> str:
+    """Template code with column positions filled in"""
+    return CHART_TEMPLATES[kind].format(
+        metrics=[int(position) for position in metrics],
+        x=int(x or 0),
+        color=column_expression(color),
+    )
+
+
+def is_temporal(column: dict) -> bool:
+    """Datetime values, or a time word in the name (whole periods only for numeric columns)"""
+    if column["inferred_type"] == "datetime":
+        return True
+    words = set(column["name"].lower().split("_"))
+    if column["inferred_type"] == "numeric":
+        bounds = [value for value in (column.get("min"), column.get("max")) if value is not None]
+        return bool(words & NUMERIC_TIME_WORDS) and all(float(v).is_integer() for v in bounds or column["sample_values"])
+    return bool(words & TIME_WORDS)
+
+
+def is_non_negative(column: dict) -> bool:
+    """True unless the column's minimum is known to be negative"""
+    return column.get("min") is None or column["min"] >= 0
+
+
+class ChartSelector:
+    """Rule-based choice of a chart type and its prebuilt render_visualization code"""
+
+    def __init__(self):
+        # Pre-validate every template (only integer positions are substituted later)
+        for kind in CHART_TEMPLATES:
+            is_valid, error = validate_generated_code(fill_template(kind, [1, 2], x=0, color=3))
+            if not is_valid:
+                raise ValueError(f"Chart template '{kind}' rejected: {error}")
+
+    def choose(self, context: dict) -> tuple[str, dict] | None:
+        """Chart type and column positions for a data context, None when no rule applies"""
+        columns = context["column_metadata"]
+        num_rows = context["num_rows"]
+
+        if num_rows == 0 or len(columns) > MAX_CHART_COLUMNS:
+            return "table", {}
+        if any(column["inferred_type"] == "unknown" for column in columns):
+            return None
+
+        numeric = [i for i, column in enumerate(columns) if column["inferred_type"] == "numeric"]
+
+        # Single row: KPI tiles for a few metrics, a table otherwise
+        if num_rows == 1:
+            if len(numeric) == len(columns) <= MAX_KPI_COLUMNS:
+                return "kpi", {"metrics": numeric}
+            return "table", {}
+
+        temporal = [i for i, column in enumerate(columns) if is_temporal(column)]
+        metrics = [i for i in numeric if i not in temporal]
+        categories = [i for i in range(len(columns)) if i not in temporal and i not in metrics]
+
+        if not 1 <= len(metrics) <= MAX_METRICS:
+            return None
+
+        # Trend over time: one time axis, an optional group split of a single metric
+        if temporal:
+            if len(temporal) > 1 or len(categories) > 1 or (categories and len(metrics) > 1):
+                return None
+            if categories and (columns[categories[0]]["distinct_count"] or 0) > MAX_COLOR_GROUPS:
+                return None
+            return "line", {"metrics": metrics, "x": temporal[0], "color": categories[0] if categories else None}
+
+        # Correlation between two metrics
+        if not categories:
+            return ("scatter", {"metrics": metrics}) if len(metrics) == 2 else None
+
+        # Comparison across categories (stacked by a second category), or part-to-whole
+        distinct = {i: columns[i]["distinct_count"] or num_rows for i in categories}
+        if len(categories) == 1:
+            if distinct[categories[0]] > MAX_CATEGORIES:
+                return "table", {}  # Too many categories for a readable chart
+            words = set(re.findall(r"[a-z]+", context.get("question_context", "").lower()))
+            part_to_whole = words & PART_WORDS and is_non_negative(columns[metrics[0]])
+            if len(metrics) == 1 and part_to_whole and distinct[categories[0]] <= MAX_PIE_SLICES:
+                return "pie", {"metrics": metrics, "x": categories[0]}
+            return "bar", {"metrics": metrics, "x": categories[0]}
+        if len(categories) == 2 and len(metrics) == 1:
+            x, color = sorted(categories, key=lambda i: -distinct[i])
+            if distinct[x] <= MAX_CATEGORIES and distinct[color] <= MAX_COLOR_GROUPS:
+                return "bar", {"metrics": metrics, "x": x, "color": color}
+        return None
+
+    def may_select(self, column_metadata: list[dict]) -> bool:
+        """True if a rule may apply to results with these columns (output schema only, rows unknown)"""
+        context = {"column_metadata": column_metadata, "num_rows": 2}
+        if self.choose(context) is not None:
+            return True
+        single_row = self.choose({**context, "num_rows": 1})
+        return single_row is not None and single_row[0] == "kpi"
+
+    def select(self, context: dict) -> tuple[str, str] | None:
+        """(chart type, render_visualization code) for a data context, None to ask the LLM"""
+        choice = self.choose(context)
+        if choice is None:
+            return None
+        kind, positions = choice
+        if kind == "table":
+            return kind, generate_safe_table_fallback([column["name"] for column in context["column_metadata"]])
+        return kind, fill_template(kind, **positions)
@@ -0,0 +1,37 @@
+"""DuckDB cursor pool - one cursor per concurrent request on a shared database"""
+
+import queue
+from contextlib import contextmanager
+
+import duckdb
+
+
+class CursorPool:
+    """Fixed-size pool of cursors opened on one DuckDB connection
+
+    A DuckDB connection must not be used by several threads at once, but
+    cursors (duplicate connections to the same database) can run queries in
+    parallel. Requests borrow a cursor for the duration of one query.
+    """
+
+    def __init__(self, conn: duckdb.DuckDBPyConnection, size: int = 8):
+        self.size = size
+        self._cursors = queue.Queue(maxsize=size)
+        for _ in range(size):
+            self._cursors.put(conn.cursor())
+
+    @contextmanager
+    def acquire(self, timeout: float | None = None):
+        """Borrow a cursor (blocks until one is free, TimeoutError after `timeout` seconds)"""
+        try:
+            cursor = self._cursors.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No DuckDB cursor available after {timeout}s") from None
+        try:
+            yield cursor
+        finally:
+            self._cursors.put(cursor)
+
+    def available(self) -> int:
+        """Number of idle cursors"""
+        return self._cursors.qsize()
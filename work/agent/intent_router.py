@@ -0,0 +1,438 @@
+"""Intent router - deterministic SQL for known question intents (no LLM call)
+
+Questions are tokenized like the question index, slots (business unit, site,
+species, month range) are extracted with vocabularies read from the dimension
+tables, and the remaining words must all belong to one intent's vocabulary.
+The intent's parameterized SQL template is then filled with the slot filters.
+Anything the rules can't fully explain is left to generate_sql.
+"""
+
+import re
+from datetime import date
+
+from question_index import MONTHS, QUARTERS, tokenize
+
+
+# Words opening or closing a month range
+RANGE_FROM_WORDS = {"since", "after"}
+RANGE_TO_WORDS = {"until", "till", "before", "through"}
+
+# Words allowed in any routed question (connectors around slots)
+GENERIC_WORDS = {"between", "from", "during", "at", "across", "only", "year", "data"} | RANGE_FROM_WORDS | RANGE_TO_WORDS
+
+# Extra words for slot values (looked up after tokenization)
+BU_SYNONYMS = {"pet": "companion", "ruminant": "ruminants"}
+SPECIES_SYNONYMS = {
+    "cattle": "bovine", "cow": "bovine", "sheep": "ovine", "goat": "caprine",
+    "hen": "chicken", "broiler": "chicken", "canine": "dog", "feline": "cat",
+}
+COUNTRY_NAMES = {"FR": "france", "ES": "spain", "HU": "hungary", "CN": "china", "US": "usa"}
+
+# Words shared by the fact-table aggregation intents
+VOLUME_WORDS = {"batch", "production", "produce", "volume", "quantity", "dose", "unit", "made"}
+
+# Parameterized SQL per semantic layer intent. {where} receives the base
+# conditions plus slot filters; the fact table is always aliased f.
+INTENT_TEMPLATES = [
+    {
+        "intent": "batch_status_by_bu",
+        "required": [{"status"}],
+        "vocabulary": {"batch", "status", "distribution", "breakdown", "business", "unit"},
+        "slots": {"bu", "site", "species", "months"},
+        "sql": """SELECT
+    f.batch_status,
+    f.bu_source,
+    COUNT(*) AS batch_count
+FROM fact_batch_production f
+{where}
+GROUP BY f.batch_status, f.bu_source
+ORDER BY f.bu_source, batch_count DESC
+LIMIT 1000""",
+    },
+    {
+        "intent": "quality_issues",
+        "required": [{"gmp", "deviation"}],
+        "vocabulary": {"batch", "gmp", "deviation", "rate", "quality", "issue"},
+        "slots": {"bu", "site", "species", "months"},
+        "where": ["f.gmp_deviation IS NOT NULL"],
+        "sql": """SELECT
+    COUNT(*) AS total_batches,
+    SUM(CASE WHEN f.gmp_deviation = true THEN 1 ELSE 0 END) AS batches_with_deviation,
+    ROUND(100.0 * SUM(CASE WHEN f.gmp_deviation = true THEN 1 ELSE 0 END) / COUNT(*), 2) AS deviation_rate_pct
+FROM fact_batch_production f
+{where}
+LIMIT 1000""",
+    },
+    {
+        "intent": "therapeutic_class_distribution",
+        "required": [{"therapeutic"}],
+        "vocabulary": {"therapeutic", "class", "distribution", "breakdown", "batch"},
+        "slots": {"bu", "site", "species", "months"},
+        "where": ["p.therapeutic_class IS NOT NULL"],
+        "sql": """SELECT
+    p.therapeutic_class,
+    COUNT(DISTINCT f.batch_id) AS batch_count,
+    COUNT(DISTINCT p.product_code) AS product_count
+FROM fact_batch_production f
+JOIN dim_product p ON f.product_fk = p.product_sk
+{where}
+GROUP BY p.therapeutic_class
+ORDER BY batch_count DESC
+LIMIT 1000""",
+    },
+    {
+        "intent": "cold_storage_products",
+        "required": [{"cold", "refrigerated", "fridge"}],
+        "vocabulary": {"product", "cold", "storage", "require", "need", "refrigerated", "fridge", "kept"},
+        "slots": {"bu"},
+        "where": ["p.temp_max_c <= 8"],
+        "bu_column": "p.bu_source",
+        "sql": """SELECT
+    p.product_name,
+    p.temp_min_c,
+    p.temp_max_c,
+    p.light_sensitive,
+    p.bu_source
+FROM dim_product p
+{where}
+ORDER BY p.temp_min_c
+LIMIT 1000""",
+    },
+    {
+        "intent": "recent_production",
+        "required": [{"latest", "recent", "newest"}],
+        "vocabulary": {"latest", "recent", "newest", "most", "batch", "production"},
+        "slots": {"bu", "site", "species", "months"},
+        "sql": """SELECT
+    f.batch_id,
+    p.product_name,
+    f.production_date,
+    f.batch_status,
+    s.site_code,
+    f.bu_source
+FROM fact_batch_production f
+JOIN dim_product p ON f.product_fk = p.product_sk
+LEFT JOIN dim_site s ON f.site_fk = s.site_sk
+{where}
+ORDER BY f.production_date DESC
+LIMIT 20""",
+    },
+    {
+        "intent": "products_by_species",
+        "required": [{"product"}],
+        "required_slots": {"species"},
+        "vocabulary": {"product", "available", "used", "treat", "target"},
+        "slots": {"bu", "species"},
+        "sql": """SELECT DISTINCT
+    p.product_name,
+    p.category,
+    p.form,
+    p.therapeutic_class
+FROM dim_product p
+JOIN fact_batch_production f ON p.product_sk = f.product_fk
+{where}
+ORDER BY p.product_name
+LIMIT 1000""",
+    },
+    {
+        "intent": "production_by_species",
+        "required": [{"specie", "animal"}],
+        "vocabulary": {"specie", "animal", "most", "target", "targeted"} | VOLUME_WORDS,
+        "slots": {"bu", "site", "months"},
+        "sql": """SELECT
+    s.specie_name,
+    s.animal_type,
+    COUNT(DISTINCT f.batch_id) AS batch_count,
+    COUNT(DISTINCT p.product_code) AS product_count
+FROM fact_batch_production f
+JOIN dim_product p ON f.product_fk = p.product_sk
+CROSS JOIN UNNEST(f.targeted_species) AS t(specie_fk)
+JOIN dim_specie s ON t.specie_fk = s.specie_sk
+{where}
+GROUP BY s.specie_name, s.animal_type
+ORDER BY batch_count DESC
+LIMIT 1000""",
+    },
+    {
+        "intent": "production_timeline",
+        "required": [{"month", "timeline", "trend", "evolution"}],
+        "vocabulary": {"month", "timeline", "trend", "evolution", "over", "time"} | VOLUME_WORDS,
+        "slots": {"bu", "site", "species", "months"},
+        "sql": """SELECT
+    strftime(f.production_date, '%Y-%m') AS month,
+    f.bu_source,
+    COUNT(*) AS batch_count,
+    SUM(f.quantity_doses) AS total_doses,
+    SUM(f.quantity_units) AS total_units
+FROM fact_batch_production f
+{where}
+GROUP BY month, f.bu_source
+ORDER BY month, f.bu_source
+LIMIT 1000""",
+    },
+    {
+        "intent": "production_by_site",
+        "required": [{"site", "plant", "factory"}],
+        "vocabulary": {"site", "plant", "factory", "most", "active", "busiest", "top"} | VOLUME_WORDS,
+        "slots": {"bu", "site", "species", "months"},
+        "where": ["s.site_code IS NOT NULL"],
+        "sql": """SELECT
+    s.site_code,
+    s.country,
+    s.region,
+    COUNT(*) AS batch_count,
+    SUM(f.quantity_doses) AS total_doses,
+    SUM(f.quantity_units) AS total_units
+FROM fact_batch_production f
+LEFT JOIN dim_site s ON f.site_fk = s.site_sk
+{where}
+GROUP BY s.site_code, s.country, s.region
+ORDER BY batch_count DESC
+LIMIT 1000""",
+    },
+    {
+        "intent": "production_volume_by_bu",
+        "required": [{"business"}],
+        "vocabulary": {"business", "unit"} | VOLUME_WORDS,
+        "slots": {"bu", "site", "species", "months"},
+        "sql": """SELECT
+    f.bu_source,
+    COUNT(*) AS batch_count,
+    SUM(f.quantity_doses) AS total_doses,
+    SUM(f.quantity_units) AS total_units
+FROM fact_batch_production f
+{where}
+GROUP BY f.bu_source
+ORDER BY f.bu_source
+LIMIT 1000""",
+    },
+]
+
+
+def quote(value: str) -> str:
+    """SQL string literal"""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def month_start(year: int, month: int) -> date:
+    """First day of a month (month 13 rolls over to January next year)"""
+    return date(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def month_range(dates: list[tuple], range_words: set[str]) -> dict | None:
+    """Month range slot from a question's dates, None when ambiguous
+
+    dates are ("month", first, last, year position) and ("year", year) in
+    question order. A month takes the next year mentioned ("november 2023"),
+    or the previous one when no year follows ("2024 from march to june").
+    Without any year the range is on months of any year ({"year": None, ...});
+    otherwise it is {"start": first day, "end": first day after} (ISO dates,
+    None for an open end). Mentions must be in chronological order and a
+    range word applies to a single date ("before march 2024").
+    """
+    years = [position for position, date_ in enumerate(dates) if date_[0] == "year"]
+    spans = []
+    used_years = set()
+    for position, date_ in enumerate(dates):
+        if date_[0] != "month":
+            continue
+        _, first, last, year_position = date_
+        if year_position is None and years:
+            following = [year for year in years if year > position]
+            year_position = following[0] if following else years[-1]
+        used_years.add(year_position)
+        year = dates[year_position][1] if year_position is not None else 0
+        spans.append((position, (year, first), (year, last)))
+    for position in years:
+        if position not in used_years:
+            spans.append((position, (dates[position][1], 1), (dates[position][1], 12)))
+    spans.sort()
+
+    if any(span[1] <= previous[2] for previous, span in zip(spans, spans[1:])):
+        return None  # "between 2024 and 2023", "2023 november to 2024 february"
+    (start_year, start), (end_year, end) = spans[0][1], spans[-1][2]
+    if range_words:
+        if len(spans) == 1 and len(range_words) > 1:
+            return None
+        if range_words & {"before", "after"} and (len(spans) > 1 or len(range_words) > 1):
+            return None
+
+    if not years:
+        # Months of any year (no wrap around the new year)
+        if "before" in range_words:
+            start, end = 1, start - 1
+        elif "after" in range_words:
+            start, end = end + 1, 12
+        elif len(spans) == 1 and range_words & RANGE_FROM_WORDS:
+            end = 12
+        elif len(spans) == 1 and range_words & RANGE_TO_WORDS:
+            start = 1
+        return {"year": None, "start": start, "end": end} if start <= end else None
+
+    first_day, day_after = month_start(start_year, start), month_start(end_year, end + 1)
+    if "before" in range_words:
+        first_day, day_after = None, first_day
+    elif "after" in range_words:
+        first_day, day_after = day_after, None
+    elif len(spans) == 1 and range_words & RANGE_FROM_WORDS:
+        day_after = None
+    elif len(spans) == 1 and range_words & RANGE_TO_WORDS:
+        first_day = None
+    return {
+        "start": first_day.isoformat() if first_day else None,
+        "end": day_after.isoformat() if day_after else None,
+    }
+
+
+class IntentRouter:
+    """Rule and slot based router from questions to parameterized SQL"""
+
+    def __init__(
+        self,
+        bu_values: dict[tuple, str],
+        site_values: dict[tuple, list[str]],
+        species_values: dict[tuple, str],
+        templates: list[dict] = INTENT_TEMPLATES,
+    ):
+        self.templates = templates
+        # token phrase -> (slot, values), longest phrases matched first
+        self.vocabulary = {}
+        for phrase, bu in bu_values.items():
+            self.vocabulary[phrase] = ("bu", [bu])
+        for phrase, site_codes in site_values.items():
+            self.vocabulary[phrase] = ("site", site_codes)
+        for phrase, specie_code in species_values.items():
+            self.vocabulary[phrase] = ("species", [specie_code])
+        self.max_phrase = max((len(phrase) for phrase in self.vocabulary), default=1)
+
+    def filter_vocabulary(self) -> dict[tuple, tuple]:
+        """Dimension value phrases -> (slot, values), for the question index filter guard"""
+        return {phrase: (slot, tuple(sorted(values))) for phrase, (slot, values) in self.vocabulary.items()}
+
+    @classmethod
+    def from_connection(cls, conn) -> "IntentRouter":
+        """Build slot vocabularies from the dimension tables"""
+        bu_values = {}
+        for (bu,) in conn.execute("SELECT DISTINCT bu_source FROM fact_batch_production").fetchall():
+            bu_values[tuple(tokenize(bu))] = bu
+        for word, bu in BU_SYNONYMS.items():
+            if bu in bu_values.values():
+                bu_values[(word,)] = bu
+
+        site_values = {}
+        sites = conn.execute("SELECT site_code, country, region FROM dim_site").fetchall()
+        for site_code, country, region in sites:
+            city = site_code.split("-")[0]
+            site_values.setdefault(tuple(tokenize(city)), []).append(site_code)
+            if country in COUNTRY_NAMES:
+                site_values.setdefault((COUNTRY_NAMES[country],), []).append(site_code)
+            if region:
+                site_values.setdefault(tuple(tokenize(region)), []).append(site_code)
+
+        species_values = {}
+        for specie_code, specie_name in conn.execute("SELECT specie_code, specie_name FROM dim_specie").fetchall():
+            species_values[tuple(tokenize(specie_code))] = specie_code
+            species_values[tuple(tokenize(specie_name))] = specie_code
+        for word, specie_code in SPECIES_SYNONYMS.items():
+            if specie_code in species_values.values():
+                species_values[(word,)] = specie_code
+
+        return cls(bu_values, site_values, species_values)
+
+    def extract_slots(self, tokens: list[str]) -> tuple[dict | None, list[str]]:
+        """Extract slot values, return (slots, tokens not used by a slot)
+
+        slots is None when the question's dates can't be read as one clear range.
+        """
+        slots = {}
+        rest = []
+        dates = []
+        range_words = set()
+
+        i = 0
+        while i < len(tokens):
+            # Dimension values (multi-word phrases first)
+            for length in range(min(self.max_phrase, len(tokens) - i), 0, -1):
+                phrase = tuple(tokens[i:i + length])
+                if phrase in self.vocabulary:
+                    slot, values = self.vocabulary[phrase]
+                    slots.setdefault(slot, [])
+                    slots[slot] += [value for value in values if value not in slots[slot]]
+                    i += length
+                    break
+            else:
+                token = tokens[i]
+                if token in MONTHS:
+                    dates.append(("month", MONTHS[token], MONTHS[token], None))
+                elif token in QUARTERS:
+                    dates.append(("month", *QUARTERS[token], None))
+                elif re.fullmatch(r"(19|20)\d\d", token):
+                    dates.append(("year", int(token)))
+                elif token.isdigit() and 1 <= int(token) <= 12 and dates and dates[-1] == ("year", int(tokens[i - 1])):
+                    dates.append(("month", int(token), int(token), len(dates) - 1))  # 2024-03
+                else:
+                    if token in RANGE_FROM_WORDS | RANGE_TO_WORDS:
+                        range_words.add(token)
+                    rest.append(token)
+                i += 1
+
+        if dates:
+            slots["months"] = month_range(dates, range_words)
+            if slots["months"] is None:
+                return None, rest
+
+        return slots, rest
+
+    def slot_conditions(self, slots: dict, template: dict) -> list[str]:
+        """SQL conditions for the extracted slots"""
+        conditions = []
+
+        if "bu" in slots:
+            bu_column = template.get("bu_column", "f.bu_source")
+            conditions.append(f"{bu_column} IN ({', '.join(quote(bu) for bu in slots['bu'])})")
+        if "site" in slots:
+            site_codes = ", ".join(quote(code) for code in slots["site"])
+            conditions.append(f"f.site_fk IN (SELECT site_sk FROM dim_site WHERE site_code IN ({site_codes}))")
+        if "species" in slots:
+            specie_codes = ", ".join(quote(code) for code in slots["species"])
+            conditions.append(
+                "list_has_any(f.targeted_species, "
+                f"(SELECT list(specie_sk) FROM dim_specie WHERE specie_code IN ({specie_codes})))"
+            )
+        if "months" in slots:
+            start, end = slots["months"]["start"], slots["months"]["end"]
+            if "year" in slots["months"]:
+                conditions.append(f"month(f.production_date) BETWEEN {start} AND {end}")
+            else:
+                bounds = [f"f.production_date >= DATE '{start}'"] if start else []
+                bounds += [f"f.production_date < DATE '{end}'"] if end else []
+                conditions.append(" AND ".join(bounds))
+
+        return conditions
+
+    def matches(self, template: dict, slots: dict, rest: list[str]) -> bool:
+        """All remaining words are explained by the template and its slots are supported"""
+        words = set(rest) - GENERIC_WORDS
+        required_words = set().union(*template["required"])
+
+        return (
+            all(group & words for group in template["required"])
+            and words <= template["vocabulary"] | required_words
+            and set(slots) <= template["slots"]
+            and template.get("required_slots", set()) <= set(slots)
+        )
+
+    def route(self, question: str) -> dict | None:
+        """Return {"intent", "sql", "slots"} for a recognized question, None otherwise"""
+        slots, rest = self.extract_slots(tokenize(question))
+        if slots is None:
+            return None
+
+        for template in self.templates:
+            if self.matches(template, slots, rest):
+                conditions = template.get("where", []) + self.slot_conditions(slots, template)
+                where = "WHERE " + "\n  AND ".join(conditions) if conditions else ""
+                sql = template["sql"].replace("{where}", where).replace("\n\n", "\n")
+                return {"intent": template["intent"], "sql": sql, "slots": slots}
+
+        return None
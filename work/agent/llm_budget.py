@@ -0,0 +1,37 @@
+"""LLM request budget - deadline shared by the LLM calls of one question
+
+Kept apart from llm_gateway (standard library only) so run_agent can set the
+budget without importing the HTTP client.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+# Deadline (time.monotonic) of the current question's LLM calls
+_deadline: ContextVar[float | None] = ContextVar("llm_deadline", default=None)
+
+
+@contextmanager
+def request_budget(seconds: float | None):
+    """Cap the total time of the LLM calls made inside the block (context-local)
+
+    Nested budgets keep the earliest deadline; None leaves the current one.
+    The deadline follows LangGraph nodes into their worker threads and tasks,
+    and speculative SQL candidates into theirs.
+    """
+    previous = _deadline.get()
+    if seconds is not None:
+        deadline = time.monotonic() + seconds
+        _deadline.set(deadline if previous is None else min(previous, deadline))
+    try:
+        yield
+    finally:
+        _deadline.set(previous)
+
+
+def remaining_budget() -> float | None:
+    """Seconds left in the current request budget (None without budget)"""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
@@ -0,0 +1,445 @@
+"""LLM gateway - pooled HTTP chat client with retries, request budget and circuit breaker
+
+ChatGateway is a LangChain chat model talking to an OpenAI-compatible
+`/chat/completions` endpoint (HuggingFace router, TGI, vLLM, the local
+FakeChatEndpoint of stub_llm) over keep-alive connection pools:
+
+- transient failures (connection errors, timeouts, 429 and 5xx) are retried
+  with full-jitter exponential backoff, honouring Retry-After
+- each call's timeout is capped by what is left of the request budget
+  (llm_budget.request_budget, shared by every LLM call of one question)
+- a circuit breaker opens after consecutive failures: calls then fail at once
+  with LLMUnavailableError (a ConnectionError) so the nodes use their fallbacks
+"""
+
+import asyncio
+import json
+import random
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, convert_to_openai_messages
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from llm_budget import remaining_budget
+
+
+# HTTP statuses worth retrying (rate limited, endpoint overloaded or restarting)
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMTimeoutError(TimeoutError):
+    """An LLM call outlived its deadline (call timeout or request budget)"""
+
+
+class LLMUnavailableError(ConnectionError):
+    """The endpoint is failing: circuit open, or transient errors on every attempt"""
+
+    def __init__(self, message: str, retry_in_seconds: float | None = None):
+        self.retry_in_seconds = retry_in_seconds
+        super().__init__(message)
+
+
+class LLMEndpointError(RuntimeError):
+    """Error response from the endpoint (transient for 429 / 5xx)"""
+
+    def __init__(self, status_code: int, message: str, retry_after: float | None = None):
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(f"LLM endpoint returned HTTP {status_code}: {message}")
+
+    @property
+    def transient(self) -> bool:
+        return self.status_code in RETRYABLE_STATUS
+
+
+def backoff_delay(attempt: int, base_seconds: float, max_seconds: float) -> float:
+    """Full-jitter exponential backoff: uniform in [0, min(max, base * 2**attempt)]"""
+    return random.uniform(0, min(max_seconds, base_seconds * 2 ** attempt))
+
+
+def is_transient(e: Exception) -> bool:
+    """Failures worth a retry (and counted by the circuit breaker)"""
+    if isinstance(e, LLMEndpointError):
+        return e.transient
+    return isinstance(e, (LLMTimeoutError, httpx.TransportError))
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker shared by the calls to one endpoint
+
+    closed: calls go through, failure_threshold consecutive failures open it.
+    open: calls fail at once with LLMUnavailableError for reset_seconds.
+    half_open: one probe call goes through; success closes, failure reopens.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probe_started: float | None = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "open" if self._clock() - self._opened_at < self.reset_seconds else "half_open"
+
+    def before_call(self) -> None:
+        """Raise LLMUnavailableError unless a call may go through now"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            now = self._clock()
+            retry_in = self._opened_at + self.reset_seconds - now
+            # A probe that never reported back (cancelled call) is replaced after reset_seconds
+            probing = self._probe_started is not None and now - self._probe_started < self.reset_seconds
+            if retry_in > 0 or probing:
+                raise LLMUnavailableError(
+                    f"LLM endpoint unavailable (circuit open after {self._failures} failures)",
+                    max(retry_in, 0.0),
+                )
+            self._probe_started = now
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                print("🔌 LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probe_started is not None or (self._opened_at is None and self._failures >= self.failure_threshold):
+                print(f"🔌 LLM circuit open for {self.reset_seconds:g}s ({self._failures} consecutive failures)")
+                self._opened_at = self._clock()
+                self._probe_started = None
+
+
+class ChatGateway(BaseChatModel):
+    """Chat model on a pooled OpenAI-compatible endpoint (retries, budget, circuit breaker)
+
+    The sync client is shared by all threads, at most pool_size calls at a
+    time: the others wait for a free connection here, within their deadline
+    (left to itself, httpx's sync pool fails some requests queued for a
+    connection). Async calls use one client per event loop (httpx
+    connections belong to the loop that opened them).
+    Streaming calls (LangGraph "messages" mode) are retried until the
+    response headers arrive, never after the first token.
+    """
+
+    base_url: str
+    model: str
+    api_key: str | None = None
+    temperature: float = 0.1
+    max_tokens: int = 2048
+    timeout_seconds: float = 60.0  # Per call, capped by the request budget
+    connect_timeout_seconds: float = 5.0
+    max_attempts: int = 3
+    backoff_base_seconds: float = 0.5
+    backoff_max_seconds: float = 8.0
+    pool_size: int = 16  # Keep-alive connections per client
+    failure_threshold: int = 5
+    reset_seconds: float = 30.0
+
+    _breaker: CircuitBreaker = PrivateAttr()
+    _client: httpx.Client = PrivateAttr()
+    _async_clients: weakref.WeakKeyDictionary = PrivateAttr(default_factory=weakref.WeakKeyDictionary)
+    _slots: threading.BoundedSemaphore = PrivateAttr()
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, context) -> None:
+        self._breaker = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+        self._client = httpx.Client(**self._client_options())
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+
+    @property
+    def _llm_type(self) -> str:
+        return "chat-gateway"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "base_url": self.base_url}
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        return self._breaker
+
+    def close(self) -> None:
+        """Close the pooled sync connections"""
+        self._client.close()
+
+    # HTTP plumbing
+
+    def _client_options(self) -> dict:
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        return {
+            "base_url": self.base_url,
+            "headers": headers,
+            "limits": httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+        }
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = self._async_clients[loop] = httpx.AsyncClient(**self._client_options())
+            return client
+
+    def _payload(self, messages: list[BaseMessage], stop: list[str] | None, stream: bool) -> dict:
+        payload = {
+            "model": self.model,
+            "messages": convert_to_openai_messages(messages),
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+        if stop:
+            payload["stop"] = stop
+        return payload
+
+    def _call_timeout(self) -> float:
+        """Timeout of the next attempt: timeout_seconds capped by the request budget"""
+        remaining = remaining_budget()
+        if remaining is None:
+            return self.timeout_seconds
+        if remaining <= 0:
+            raise LLMTimeoutError("LLM request budget exhausted")
+        return min(self.timeout_seconds, remaining)
+
+    def _acquire_slot(self, timeout: float) -> None:
+        """Wait for one of the pool_size sync connections"""
+        if not self._slots.acquire(timeout=timeout):
+            raise LLMTimeoutError(f"No free LLM connection after {timeout:.1f}s")
+
+    def _request(self, client, payload: dict, timeout: float) -> httpx.Request:
+        return client.build_request(
+            "POST", "chat/completions", json=payload,
+            timeout=httpx.Timeout(timeout, connect=min(self.connect_timeout_seconds, timeout)),
+        )
+
+    @staticmethod
+    def _check_status(response: httpx.Response) -> None:
+        if response.status_code < 400:
+            return
+        retry_after = response.headers.get("Retry-After")
+        raise LLMEndpointError(
+            response.status_code,
+            response.text[:200],
+            float(retry_after) if retry_after and retry_after.isdigit() else None,
+        )
+
+    @contextmanager
+    def _http_errors(self, timeout: float):
+        """Raise httpx timeouts as LLMTimeoutError"""
+        try:
+            yield
+        except httpx.TimeoutException as e:
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s") from e
+
+    # Retry policy
+
+    def _retry_delay(self, e: Exception, attempt: int) -> float:
+        """Record a failed attempt; delay before the next one, or raise the final error"""
+        if not is_transient(e):
+            # The endpoint answered: it is up, the request itself is wrong
+            self._breaker.record_success()
+            raise e
+        self._breaker.record_failure()
+
+        delay = backoff_delay(attempt, self.backoff_base_seconds, self.backoff_max_seconds)
+        if getattr(e, "retry_after", None):
+            delay = max(delay, min(e.retry_after, self.backoff_max_seconds))
+        remaining = remaining_budget()
+        if attempt + 1 < self.max_attempts and (remaining is None or delay < remaining):
+            print(f"🔁 LLM call failed ({e}), retry {attempt + 1}/{self.max_attempts - 1} in {delay:.2f}s")
+            return delay
+
+        if isinstance(e, LLMTimeoutError):
+            raise e
+        raise LLMUnavailableError(f"LLM endpoint failing after {attempt + 1} attempt(s): {e}") from e
+
+    def _with_retries(self, send):
+        """Run send(timeout) under the circuit breaker, retrying transient failures"""
+        for attempt in range(self.max_attempts):
+            timeout = self._call_timeout()
+            self._breaker.before_call()
+            try:
+                with self._http_errors(timeout):
+                    result = send(timeout)
+            except Exception as e:
+                time.sleep(self._retry_delay(e, attempt))
+                continue
+            self._breaker.record_success()
+            return result
+
+    async def _awith_retries(self, send):
+        """Async variant of _with_retries (send is a coroutine function)"""
+        for attempt in range(self.max_attempts):
+            timeout = self._call_timeout()
+            self._breaker.before_call()
+            try:
+                with self._http_errors(timeout):
+                    result = await send(timeout)
+            except Exception as e:
+                await asyncio.sleep(self._retry_delay(e, attempt))
+                continue
+            self._breaker.record_success()
+            return result
+
+    # Responses
+
+    def _chat_result(self, body: dict) -> ChatResult:
+        choice = body["choices"][0]
+        usage = body.get("usage") or {}
+        message = AIMessage(
+            content=choice["message"].get("content") or "",
+            response_metadata={"model": body.get("model", self.model), "finish_reason": choice.get("finish_reason")},
+        )
+        if usage:
+            message.usage_metadata = {
+                "input_tokens": usage.get("prompt_tokens", 0),
+                "output_tokens": usage.get("completion_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    @staticmethod
+    def _chunk(line: str) -> ChatGenerationChunk | None:
+        """Token chunk of one server-sent event line (None for other lines)"""
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:"):].strip()
+        if not data or data == "[DONE]":
+            return None
+        choices = json.loads(data).get("choices") or [{}]
+        text = (choices[0].get("delta") or {}).get("content")
+        return ChatGenerationChunk(message=AIMessageChunk(content=text)) if text else None
+
+    def _check_deadline(self, deadline: float, timeout: float) -> None:
+        if time.monotonic() > deadline:
+            self._breaker.record_failure()
+            raise LLMTimeoutError(f"LLM call timed out after {timeout:.1f}s (streaming)")
+
+    # BaseChatModel interface
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> ChatResult:
+        payload = self._payload(messages, stop, stream=False)
+
+        def send(timeout: float) -> dict:
+            self._acquire_slot(timeout)
+            try:
+                response = self._client.send(self._request(self._client, payload, timeout))
+            finally:
+                self._slots.release()
+            self._check_status(response)
+            return response.json()
+
+        return self._chat_result(self._with_retries(send))
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ) -> ChatResult:
+        payload = self._payload(messages, stop, stream=False)
+        client = self._async_client()
+
+        async def send(timeout: float) -> dict:
+            response = await client.send(self._request(client, payload, timeout))
+            self._check_status(response)
+            return response.json()
+
+        return self._chat_result(await self._awith_retries(send))
+
+    def _stream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: CallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ):
+        payload = self._payload(messages, stop, stream=True)
+
+        def send(timeout: float):
+            # The slot is held until the stream is closed
+            self._acquire_slot(timeout)
+            try:
+                response = self._client.send(self._request(self._client, payload, timeout), stream=True)
+            except BaseException:
+                self._slots.release()
+                raise
+            if response.status_code >= 400:
+                response.read()
+                response.close()
+                self._slots.release()
+                self._check_status(response)
+            return response, timeout
+
+        response, timeout = self._with_retries(send)
+        deadline = time.monotonic() + timeout
+        try:
+            with self._http_errors(timeout):
+                for line in response.iter_lines():
+                    self._check_deadline(deadline, timeout)
+                    chunk = self._chunk(line)
+                    if chunk is not None:
+                        if run_manager:
+                            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                        yield chunk
+        finally:
+            response.close()
+            self._slots.release()
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: list[str] | None = None,
+        run_manager: AsyncCallbackManagerForLLMRun | None = None,
+        **kwargs,
+    ):
+        payload = self._payload(messages, stop, stream=True)
+        client = self._async_client()
+
+        async def send(timeout: float):
+            response = await client.send(self._request(client, payload, timeout), stream=True)
+            if response.status_code >= 400:
+                await response.aread()
+                await response.aclose()
+                self._check_status(response)
+            return response, timeout
+
+        response, timeout = await self._awith_retries(send)
+        deadline = time.monotonic() + timeout
+        try:
+            with self._http_errors(timeout):
+                async for line in response.aiter_lines():
+                    self._check_deadline(deadline, timeout)
+                    chunk = self._chunk(line)
+                    if chunk is not None:
+                        if run_manager:
+                            await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                        yield chunk
+        finally:
+            await response.aclose()
@@ -1,13 +1,20 @@
 """Agent nodes for the NL to SQL pipeline"""
 
 from .generate_sql import create_generate_sql_node
-from .validate_sql import validate_sql
-from .execute_sql import create_execute_sql_node
-from .generate_streamlit_views import create_generate_streamlit_views_node
+from .validate_sql import create_validate_sql_node
+from .execute_sql import create_execute_sql_node, fetch_result_page, RESULT_PAGE_SIZE
+from .generate_streamlit_views import create_generate_streamlit_views_node, create_plan_visualization_node
+from .match_question import create_match_question_node
+from .route_intent import create_route_intent_node
 
 __all__ = [
     "create_generate_sql_node",
-    "validate_sql",
+    "create_validate_sql_node",
     "create_execute_sql_node",
+    "fetch_result_page",
+    "RESULT_PAGE_SIZE",
     "create_generate_streamlit_views_node",
+    "create_plan_visualization_node",
+    "create_match_question_node",
+    "create_route_intent_node",
 ]
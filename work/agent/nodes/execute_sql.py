@@ -1,14 +1,116 @@
 """SQL execution node - runs queries against DuckDB"""
 
-import duckdb
+import asyncio
+from contextlib import nullcontext
 from typing import TYPE_CHECKING
 
+import pyarrow as pa
+import pyarrow.compute as pc
+
 if TYPE_CHECKING:
+    import duckdb
     from ..agent import AgentState
+    from ..cursor_pool import CursorPool
+    from ..query_governor import QueryGovernor
+    from ..result_store import ResultStore
+    from ..rollup_rewriter import RollupRewriter
+
+
+# Rows kept in the agent state (first page), further pages are fetched on demand
+RESULT_PAGE_SIZE = 1000
+
+
+def normalize_arrow_types(table: pa.Table) -> pa.Table:
+    """Cast DECIMAL(38,0) columns (DuckDB HUGEINT, e.g. SUM of integers) to int64 when they fit"""
+    for index, field in enumerate(table.schema):
+        if pa.types.is_decimal(field.type) and field.type.scale == 0 and field.type.precision == 38:
+            try:
+                table = table.set_column(index, field.name, pc.cast(table.column(index), pa.int64()))
+            except pa.ArrowInvalid:
+                pass  # Out of int64 range: keep the decimal
+    return table
+
+
+def read_first_page(reader: pa.RecordBatchReader, page_size: int = RESULT_PAGE_SIZE) -> tuple[pa.Table, int]:
+    """First page_size rows of a record batch stream, and the total row count
+
+    Rows after the first page are only counted (never converted to Python).
+    """
+    batches, total = [], 0
+    for batch in reader:
+        if total < page_size:
+            batches.append(batch.slice(0, page_size - total))
+        total += batch.num_rows
+    return normalize_arrow_types(pa.Table.from_batches(batches, schema=reader.schema)), total
+
+
+def fetch_result_page(
+    conn: "duckdb.DuckDBPyConnection",
+    sql: str,
+    page: int,
+    page_size: int = RESULT_PAGE_SIZE,
+    governor: "QueryGovernor | None" = None,
+) -> pa.Table:
+    """Rows of page `page` (0-based) of a query result, as an Arrow table
+
+    Server-side pagination (LIMIT / OFFSET on the query): pages are stable when
+    the query has an ORDER BY. With a governor, the page query is interrupted
+    past its deadline like execute_sql (QueryTimeoutError).
+    """
+    sql = sql.strip().rstrip(";")
+    cursor = conn.cursor()
+    try:
+        with governor.deadline(cursor) if governor is not None else nullcontext():
+            result = cursor.execute(f"SELECT * FROM ({sql}) LIMIT {int(page_size)} OFFSET {int(page) * int(page_size)}")
+            return normalize_arrow_types(result.arrow().read_all())
+    finally:
+        cursor.close()
 
 
-def create_execute_sql_node(conn: duckdb.DuckDBPyConnection):
-    """Factory function to create execute_sql node with persistent DuckDB connection"""
+def create_execute_sql_node(
+    conn: "duckdb.DuckDBPyConnection",
+    result_store: "ResultStore",
+    cursor_pool: "CursorPool | None" = None,
+    query_rewriter: "RollupRewriter | None" = None,
+    governor: "QueryGovernor | None" = None,
+):
+    """Factory function to create execute_sql node with persistent DuckDB connection
+
+    With a cursor_pool, each execution borrows its own cursor so concurrent
+    requests don't share one connection. With a query_rewriter, aggregate
+    queries on the fact table are transparently run on rollup tables. The
+    returned node exposes an async variant as `.afunc` (query runs in a
+    worker thread). With a governor, the query (rollup rewrite, execution
+    and fetch) is interrupted past its deadline and failures are described
+    in query_error (kind "timeout", "out_of_memory", ...).
+
+    Results are fetched as Arrow record batches. The first RESULT_PAGE_SIZE
+    rows go to result_store as a pyarrow Table: the state only keeps its
+    handle (result_handle), its schema and stats (result_summary) and the
+    total row count (result_row_count).
+    """
+
+    def run_query(cursor, sql: str):
+        """Execute on a rollup when possible, falling back to the original SQL"""
+        if query_rewriter is None:
+            return cursor.execute(sql)
+
+        try:
+            rollup_sql, rollup = query_rewriter.rewrite(cursor, sql)
+        except Exception as e:
+            print(f"⚠️  Rollup rewrite skipped: {e}")
+            return cursor.execute(sql)
+
+        if rollup is None:
+            return cursor.execute(sql)
+
+        try:
+            result = cursor.execute(rollup_sql)
+            print(f"🗜️  Answered from rollup {rollup}")
+            return result
+        except Exception as e:
+            print(f"⚠️  Rollup query failed ({e}), running original SQL")
+            return cursor.execute(sql)
 
     def execute_sql(state: "AgentState") -> "AgentState":
         """Execute SQL query against DuckDB using persistent connection"""
@@ -18,34 +120,57 @@ def create_execute_sql_node(conn: duckdb.DuckDBPyConnection):
 
         if not sql:
             print("❌ No SQL to execute")
-            state["query_results"] = []
+            state["result_handle"] = ""
+            state["result_summary"] = {}
             state["result_columns"] = []
+            state["result_row_count"] = 0
             return state
 
         try:
-            # Execute the query using persistent connection with views
-            result = conn.execute(sql)
+            # Execute the query on a pooled cursor (or the persistent connection with views), under the deadline
+            with (
+                cursor_pool.acquire() if cursor_pool is not None else nullcontext(conn) as cursor,
+                governor.deadline(cursor) if governor is not None else nullcontext(),
+            ):
+                result = run_query(cursor, sql)
 
-            # Fetch all results as list of tuples
-            rows = result.fetchall()
+                # Get column names
+                columns = [desc[0] for desc in result.description]
 
-            # Get column names
-            columns = [desc[0] for desc in result.description]
+                # Stream results as Arrow record batches, keep the first page
+                table, row_count = read_first_page(result.arrow(RESULT_PAGE_SIZE))
 
-            # Store in state
-            state["query_results"] = rows
+            # Keep the rows in the result store, only the handle goes in the state
+            state["result_handle"] = result_store.put(table)
+            state["result_summary"] = result_store.summarize(table)
             state["result_columns"] = columns
+            state["result_row_count"] = row_count
+            state["execution_error"] = False
+            state["query_error"] = {}
 
-            print(f"✅ Executed successfully: {len(rows)} rows, {len(columns)} columns")
+            print(f"✅ Executed successfully: {row_count} rows, {len(columns)} columns")
+            if row_count > table.num_rows:
+                print(f"📄 Keeping the first {table.num_rows} rows, other pages fetched on demand")
 
         except Exception as e:
-            print(f"❌ SQL execution failed: {str(e)}")
+            print(f"{'⏱️ ' if isinstance(e, TimeoutError) else '❌'} SQL execution failed: {str(e)}")
             state["execution_error"] = True
-            state["query_results"] = []
+            state["query_error"] = (
+                governor.describe(e) if governor is not None
+                else {"kind": "error", "message": str(e), "timeout_seconds": None, "elapsed_seconds": None}
+            )
+            state["result_handle"] = ""
+            state["result_summary"] = {}
             state["result_columns"] = []
+            state["result_row_count"] = 0
             # Store error message for user display
             state["validation_error"] = f"SQL execution error: {str(e)}"
 
         return state
 
+    async def aexecute_sql(state: "AgentState") -> "AgentState":
+        """Async variant - runs the blocking DuckDB query in a worker thread"""
+        return await asyncio.to_thread(execute_sql, state)
+
+    execute_sql.afunc = aexecute_sql
     return execute_sql
@@ -1,23 +1,54 @@
 """SQL generation node - converts natural language to DuckDB SQL"""
 
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import aclosing, closing
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from ..agent import AgentState
 
 
-def create_generate_sql_node(llm, agent_specs: str, semantic_layer: str):
-    """Factory function to create generate_sql node with dependencies"""
+def extract_sql(generated_text: str) -> str:
+    """Extract SQL from LLM output (remove markdown formatting if present)"""
+    sql = generated_text.strip()
+    if "```sql" in sql:
+        sql = sql.split("```sql")[1].split("```")[0].strip()
+    elif "```" in sql:
+        sql = sql.split("```")[1].split("```")[0].strip()
+    return sql
 
-    def generate_sql(state: "AgentState") -> "AgentState":
-        """Generate SQL query from natural language question"""
+
+def create_generate_sql_node(
+    llm,
+    agent_specs: str,
+    semantic_layer: str,
+    prompt_builder=None,
+    num_candidates: int = 1,
+    validate_sql=None,
+):
+    """Factory function to create generate_sql node with dependencies
+
+    When a prompt_builder is given, a compact schema-pruned prompt is used
+    instead of the full specs + semantic layer. The returned node exposes an
+    async variant as `.afunc` (used when the graph runs with ainvoke).
+
+    With num_candidates > 1 (speculative mode), that many SQL candidates are
+    requested concurrently. As they arrive, each one is checked with the
+    validate_sql node (parse-tree checks and EXPLAIN); the first candidate
+    passing is kept, so a bad sample costs no extra round-trip.
+    """
+
+    def build_prompt(state: "AgentState") -> str:
+        """Build the SQL prompt (with validation feedback when retrying)"""
 
         # Check if this is a retry due to validation failure
         validation_error = state.get("validation_error", "")
         previous_sql = state.get("generated_sql", "")
 
-        if validation_error and previous_sql:
-            # Increment retry count
+        if validation_error:
+            # Increment retry count (LLM errors leave no SQL but count as attempts too)
             state["retry_count"] = state.get("retry_count", 0) + 1
             print(f"🔄 Regenerating SQL (attempt {state['retry_count']}/3, fixing: {validation_error})...")
         else:
@@ -43,8 +74,14 @@ Previous SQL:
 Please fix this error and generate a corrected SQL query.
 """
 
-        # Build simple prompt - let LLM understand the YAML directly
-        prompt = f"""{agent_specs}
+        if prompt_builder is not None:
+            # Compact prompt with only the relevant schema and examples
+            prompt, prompt_tokens = prompt_builder.build(state["question"], error_feedback)
+            state["prompt_tokens"] = prompt_tokens
+            print(f"🧮 SQL prompt: ~{prompt_tokens} tokens")
+        else:
+            # Build simple prompt - let LLM understand the YAML directly
+            prompt = f"""{agent_specs}
 
 ---
 
@@ -64,39 +101,152 @@ Please fix this error and generate a corrected SQL query.
 Generate ONLY the SQL query needed to answer this question. Return the SQL without any explanation or markdown formatting.
 """
 
+        return prompt
+
+    def handle_llm_timeout(state: "AgentState", e: Exception) -> "AgentState":
+        print(f"⏱️  LLM timeout: {e}")
+        state["validation_error"] = "LLM timeout, please retry"
+        state["generated_sql"] = ""
+        state["sql_valid"] = False
+        return state
+
+    def handle_llm_error(state: "AgentState", e: Exception) -> "AgentState":
+        # Catch other exceptions (network errors, API errors, etc.)
+        error_msg = str(e)
+        if isinstance(e, ConnectionError):
+            # LLM gateway circuit open / endpoint down: fail fast instead of waiting for it
+            print(f"🔌 LLM unavailable: {e}")
+            state["validation_error"] = "LLM unavailable, please retry later"
+        elif "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
+            print(f"⏱️  LLM timeout (caught as general exception): {e}")
+            state["validation_error"] = "LLM timeout, please retry"
+        else:
+            print(f"❌ LLM invocation failed: {e}")
+            state["validation_error"] = f"LLM error: {error_msg}"
+        state["generated_sql"] = ""
+        state["sql_valid"] = False
+        return state
+
+    def apply_response(state: "AgentState", generated_text: str) -> "AgentState":
+        sql = extract_sql(generated_text)
+        state["generated_sql"] = sql
+        print(f"📝 Generated SQL:\n{sql}\n")
+        return state
+
+    def check_candidate(sql: str) -> str:
+        """Validation error for a candidate ("" if it passes)"""
+        if validate_sql is None:
+            return ""
+        checked = validate_sql({"generated_sql": sql})
+        return "" if checked["sql_valid"] else checked["validation_error"]
+
+    def record_candidate(response, error, checked: dict, llm_errors: list) -> str:
+        """Check one candidate, return its SQL if it passes ("" otherwise)"""
+        if error is not None:
+            llm_errors.append(error)
+            return ""
+
+        sql = extract_sql(response.content.strip())
+        if sql in checked:
+            # Duplicate sample, already rejected
+            return ""
+        checked[sql] = check_candidate(sql)
+        if checked[sql]:
+            return ""
+
+        print(f"🏁 Candidate {len(checked)}/{num_candidates} passed checks")
+        return sql
+
+    def reject_candidates(state: "AgentState", checked: dict, llm_errors: list) -> "AgentState":
+        """No candidate passed: keep the first one so validate_sql reports its error"""
+        if not checked:
+            return handle_llm_error(state, llm_errors[0])
+
+        sql, error = next(iter(checked.items()))
+        print(f"❌ No SQL candidate passed checks ({len(checked)} distinct, first error: {error})")
+        return apply_response(state, sql)
+
+    def generate_candidates(prompt: str):
+        """Yield (response, error) from concurrent LLM calls in completion order
+
+        Each call runs in a copy of the caller's context, so ContextVars (LLM
+        request budget, LangGraph callbacks and stream config) reach it.
+        """
+        executor = ThreadPoolExecutor(max_workers=num_candidates)
+        futures = [
+            executor.submit(contextvars.copy_context().run, llm.invoke, prompt)
+            for _ in range(num_candidates)
+        ]
+        try:
+            for future in as_completed(futures):
+                try:
+                    yield future.result(), None
+                except Exception as e:
+                    yield None, e
+        finally:
+            # Don't wait for slower candidates once one was picked
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    async def agenerate_candidates(prompt: str):
+        """Async variant of generate_candidates (pending calls are cancelled)"""
+        tasks = [asyncio.ensure_future(llm.ainvoke(prompt)) for _ in range(num_candidates)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    yield await next_done, None
+                except Exception as e:
+                    yield None, e
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def generate_sql(state: "AgentState") -> "AgentState":
+        """Generate SQL query from natural language question"""
+        prompt = build_prompt(state)
+
+        if num_candidates > 1:
+            print(f"🎲 Requesting {num_candidates} SQL candidates in parallel...")
+            checked, llm_errors = {}, []
+            with closing(generate_candidates(prompt)) as candidates:
+                for response, error in candidates:
+                    sql = record_candidate(response, error, checked, llm_errors)
+                    if sql:
+                        return apply_response(state, sql)
+            return reject_candidates(state, checked, llm_errors)
+
         # Call LLM with timeout handling
         try:
             response = llm.invoke(prompt)
-            generated_text = response.content.strip()
         except TimeoutError as e:
-            print(f"⏱️  LLM timeout: {e}")
-            state["validation_error"] = "LLM timeout, please retry"
-            state["generated_sql"] = ""
-            state["sql_valid"] = False
-            return state
+            return handle_llm_timeout(state, e)
         except Exception as e:
-            # Catch other exceptions (network errors, API errors, etc.)
-            error_msg = str(e)
-            if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                print(f"⏱️  LLM timeout (caught as general exception): {e}")
-                state["validation_error"] = "LLM timeout, please retry"
-            else:
-                print(f"❌ LLM invocation failed: {e}")
-                state["validation_error"] = f"LLM error: {error_msg}"
-            state["generated_sql"] = ""
-            state["sql_valid"] = False
-            return state
-
-        # Extract SQL (remove markdown formatting if present)
-        sql = generated_text
-        if "```sql" in sql:
-            sql = sql.split("```sql")[1].split("```")[0].strip()
-        elif "```" in sql:
-            sql = sql.split("```")[1].split("```")[0].strip()
+            return handle_llm_error(state, e)
 
-        state["generated_sql"] = sql
-        print(f"📝 Generated SQL:\n{sql}\n")
+        return apply_response(state, response.content.strip())
 
-        return state
+    async def agenerate_sql(state: "AgentState") -> "AgentState":
+        """Async variant (non-blocking LLM call) used by ainvoke"""
+        prompt = build_prompt(state)
+
+        if num_candidates > 1:
+            print(f"🎲 Requesting {num_candidates} SQL candidates in parallel...")
+            checked, llm_errors = {}, []
+            async with aclosing(agenerate_candidates(prompt)) as candidates:
+                async for response, error in candidates:
+                    # EXPLAIN is a blocking DuckDB call
+                    sql = await asyncio.to_thread(record_candidate, response, error, checked, llm_errors)
+                    if sql:
+                        return apply_response(state, sql)
+            return reject_candidates(state, checked, llm_errors)
+
+        try:
+            response = await llm.ainvoke(prompt)
+        except TimeoutError as e:
+            return handle_llm_timeout(state, e)
+        except Exception as e:
+            return handle_llm_error(state, e)
+
+        return apply_response(state, response.content.strip())
 
+    generate_sql.afunc = agenerate_sql
     return generate_sql
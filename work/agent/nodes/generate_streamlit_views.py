@@ -1,12 +1,19 @@
 """Generate Streamlit views - LLM-driven visualization code generation"""
 
-import re
 import ast
+import asyncio
+from contextlib import closing
 from typing import TYPE_CHECKING
-from datetime import datetime
+
+import pyarrow as pa
+import pyarrow.compute as pc
 
 if TYPE_CHECKING:
+    import duckdb
     from ..agent import AgentState
+    from ..chart_selector import ChartSelector
+    from ..cursor_pool import CursorPool
+    from ..result_store import ResultStore
 
 # Safety validation constants
 ALLOWED_IMPORTS = {'pandas', 'pd', 'streamlit', 'st', 'plotly', 'plotly.express', 'px'}
@@ -22,87 +29,206 @@ FORBIDDEN_METHODS = {
     'builtins': ['__import__', 'eval', 'exec', 'compile'],
 }
 
+# Column profiling: distinct sample values shown to the LLM, first rows scanned for them
+SAMPLE_SIZE = 5
+SAMPLE_SCAN_ROWS = 1000
+ISO_DATE_PATTERN = r"^\d{4}-\d{2}-\d{2}"
+
+# DuckDB output types of numeric and temporal columns (DESCRIBE column_type, without parameters)
+DUCKDB_NUMERIC_TYPES = {
+    'TINYINT', 'SMALLINT', 'INTEGER', 'BIGINT', 'HUGEINT', 'UTINYINT', 'USMALLINT', 'UINTEGER',
+    'UBIGINT', 'UHUGEINT', 'FLOAT', 'DOUBLE', 'DECIMAL',
+}
+DUCKDB_DATETIME_TYPES = {'DATE', 'TIME'}
+
 
-def analyze_data_context(rows: list, columns: list, question: str, sql: str) -> dict:
-    """Prepare structured metadata for LLM prompt
+def analyze_data_context(rows, columns: list, question: str, sql: str, engine: str = "arrow") -> dict:
+    """Prepare structured metadata for LLM prompt and chart rules
+
+    rows is the result as a pyarrow Table (row tuples are converted to one).
+    All columns are profiled on the columnar data, without per-value Python:
+    with pyarrow.compute (engine="arrow") or DuckDB's SUMMARIZE (engine="duckdb").
 
     Returns:
         {
             "num_rows": int,
             "num_columns": int,
             "column_metadata": [
-                {"name": str, "inferred_type": str, "sample_values": list, "has_nulls": bool}
+                {"name": str, "dtype": str, "inferred_type": str, "sample_values": list,
+                 "has_nulls": bool, "null_count": int, "distinct_count": int | None,
+                 "min": Any, "max": Any}
             ],
             "data_sample": list[dict],
             "sql_context": str,
             "question_context": str
         }
     """
-    num_rows = len(rows)
-    num_columns = len(columns)
+    table = rows if isinstance(rows, pa.Table) else rows_to_table(rows, columns)
+    if len(columns) == table.num_columns:
+        table = table.rename_columns(columns)
+
+    column_metadata = profile_columns(table) if engine == "arrow" else summarize_columns(table)
+
+    return {
+        "num_rows": table.num_rows,
+        "num_columns": table.num_columns,
+        "column_metadata": column_metadata,
+        "data_sample": table.slice(0, 3).to_pylist(),
+        "sql_context": sql,
+        "question_context": question
+    }
 
-    # Analyze each column
-    column_metadata = []
-    for col_idx, col_name in enumerate(columns):
-        # Extract column values (up to first 10 rows for type inference)
-        col_values = [row[col_idx] if col_idx < len(row) else None for row in rows[:10]]
 
-        # Infer type
-        inferred_type = infer_column_type(col_values)
+def rows_to_table(rows: list, columns: list) -> pa.Table:
+    """Arrow table from row tuples (columns of mixed Python types become strings)"""
+    arrays = []
+    for col_idx in range(len(columns)):
+        values = [row[col_idx] if col_idx < len(row) else None for row in rows]
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+            arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+    return pa.Table.from_arrays(arrays, names=list(columns))
 
-        # Sample diverse values (first 5 non-null)
-        sample_values = [v for v in col_values if v is not None][:5]
 
-        # Check for nulls
-        has_nulls = any(row[col_idx] is None if col_idx < len(row) else True for row in rows)
+def infer_arrow_type(data_type: pa.DataType, non_null: pa.ChunkedArray) -> str:
+    """Column type for prompts and chart rules: numeric, datetime, string or unknown (no values)"""
+    if len(non_null) == 0 or pa.types.is_null(data_type):
+        return "unknown"
+    if pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_decimal(data_type):
+        return "numeric"
+    if pa.types.is_date(data_type) or pa.types.is_timestamp(data_type) or pa.types.is_time(data_type):
+        return "datetime"
+    # ISO date strings (YYYY-MM-DD), checked on the first values
+    if pa.types.is_string(data_type) or pa.types.is_large_string(data_type):
+        if pc.any(pc.match_substring_regex(non_null.slice(0, 3), ISO_DATE_PATTERN)).as_py():
+            return "datetime"
+    # Booleans and everything else are categories
+    return "string"
+
+
+def has_min_max(data_type: pa.DataType) -> bool:
+    """True for types with an order meaningful to charts (numbers, dates, strings)"""
+    return (
+        pa.types.is_integer(data_type) or pa.types.is_floating(data_type) or pa.types.is_decimal(data_type)
+        or pa.types.is_temporal(data_type) or pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+    )
+
+
+def sample_distinct(non_null: pa.ChunkedArray, size: int = SAMPLE_SIZE) -> list:
+    """First `size` distinct values (in order of appearance)"""
+    head = non_null.slice(0, SAMPLE_SCAN_ROWS)
+    try:
+        return pc.unique(head).slice(0, size).to_pylist()
+    except pa.ArrowNotImplementedError:
+        return head.slice(0, size).to_pylist()  # Nested types: no hashing
+
+
+def profile_columns(table: pa.Table) -> list[dict]:
+    """Column metadata of a table computed with pyarrow.compute kernels"""
+    column_metadata = []
+    for field, column in zip(table.schema, table.columns):
+        non_null = pc.drop_null(column)
+        inferred_type = infer_arrow_type(field.type, non_null)
+
+        try:
+            distinct_count = pc.count_distinct(non_null).as_py() if len(non_null) else 0
+        except pa.ArrowNotImplementedError:
+            distinct_count = None  # Nested types: no hashing
+
+        min_value = max_value = None
+        if len(non_null) and has_min_max(field.type):
+            min_max = pc.min_max(non_null)
+            min_value, max_value = min_max["min"].as_py(), min_max["max"].as_py()
 
         column_metadata.append({
-            "name": col_name,
+            "name": field.name,
+            "dtype": str(field.type),
             "inferred_type": inferred_type,
-            "sample_values": sample_values,
-            "has_nulls": has_nulls
+            "sample_values": sample_distinct(non_null),
+            "has_nulls": column.null_count > 0,
+            "null_count": column.null_count,
+            "distinct_count": distinct_count,
+            "min": min_value,
+            "max": max_value,
         })
+    return column_metadata
 
-    # Sample first 3 rows as dicts
-    data_sample = []
-    for row in rows[:3]:
-        row_dict = {columns[i]: row[i] if i < len(row) else None for i in range(len(columns))}
-        data_sample.append(row_dict)
 
-    return {
-        "num_rows": num_rows,
-        "num_columns": num_columns,
-        "column_metadata": column_metadata,
-        "data_sample": data_sample,
-        "sql_context": sql,
-        "question_context": question
-    }
+def summarize_columns(table: pa.Table) -> list[dict]:
+    """Column metadata of a table computed by DuckDB's SUMMARIZE (one query for all columns)
 
+    Distinct counts are SUMMARIZE's approx_unique (HyperLogLog estimates).
+    """
+    import duckdb
 
-def infer_column_type(values: list) -> str:
-    """Infer column type from sample values"""
-    # Filter out None values
-    non_null_values = [v for v in values if v is not None]
+    with closing(duckdb.connect()) as conn:
+        conn.register("result", table)
+        summary = conn.execute("SUMMARIZE result").fetchall()
 
-    if not non_null_values:
-        return "unknown"
+    column_metadata = []
+    # SUMMARIZE rows: column_name, column_type, min, max, approx_unique, avg, std, q25, q50, q75, count, null_percentage
+    for field, column, stats in zip(table.schema, table.columns, summary):
+        min_value, max_value, approx_unique, count, null_percentage = stats[2], stats[3], stats[4], stats[10], stats[11]
+        null_count = round(float(null_percentage or 0) * count / 100)
+        non_null = pc.drop_null(column)
+
+        # min / max come back as text: cast to the column type
+        if not has_min_max(field.type):
+            min_value = max_value = None
+        elif min_value is not None:
+            try:
+                min_value, max_value = pc.cast(pa.array([min_value, max_value]), field.type).to_pylist()
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                pass
+
+        column_metadata.append({
+            "name": field.name,
+            "dtype": str(field.type),
+            "inferred_type": infer_arrow_type(field.type, non_null),
+            "sample_values": sample_distinct(non_null),
+            "has_nulls": null_count > 0,
+            "null_count": null_count,
+            "distinct_count": approx_unique,
+            "min": min_value,
+            "max": max_value,
+        })
+    return column_metadata
 
-    # Check if all are numeric
-    if all(isinstance(v, (int, float)) for v in non_null_values):
-        return "numeric"
 
-    # Check if any look like dates (ISO format or datetime objects)
-    if any(isinstance(v, datetime) for v in non_null_values):
+def infer_duckdb_type(type_name: str) -> str:
+    """Column type (as infer_arrow_type) from a DuckDB type name"""
+    base = type_name.upper().split("(")[0].strip()
+    if base in DUCKDB_NUMERIC_TYPES:
+        return "numeric"
+    if base in DUCKDB_DATETIME_TYPES or base.startswith("TIMESTAMP"):
         return "datetime"
+    return "string"
 
-    # Check string dates (ISO format: YYYY-MM-DD)
-    if all(isinstance(v, str) for v in non_null_values):
-        # Simple check for date patterns
-        if any(re.match(r'\d{4}-\d{2}-\d{2}', str(v)) for v in non_null_values[:3]):
-            return "datetime"
 
-    # Default to string/categorical
-    return "string"
+def analyze_output_schema(schema: list[tuple[str, str]], question: str, sql: str) -> dict:
+    """Data context (as analyze_data_context) from the query's output schema, before any row exists"""
+    return {
+        "num_rows": "unknown (query still running)",
+        "num_columns": len(schema),
+        "column_metadata": [
+            {
+                "name": name,
+                "dtype": type_name,
+                "inferred_type": infer_duckdb_type(type_name),
+                "sample_values": [],
+                "has_nulls": "unknown",
+                "null_count": None,
+                "distinct_count": None,
+                "min": None,
+                "max": None,
+            }
+            for name, type_name in schema
+        ],
+        "data_sample": [],
+        "sql_context": sql,
+        "question_context": question,
+    }
 
 
 def build_visualization_prompt(context: dict, viz_guidelines: str) -> str:
@@ -112,7 +238,8 @@ def build_visualization_prompt(context: dict, viz_guidelines: str) -> str:
     column_details = []
     for col in context['column_metadata']:
         column_details.append(f"- **{col['name']}**: {col['inferred_type']}")
-        column_details.append(f"  - Sample values: {col['sample_values']}")
+        if col['sample_values']:
+            column_details.append(f"  - Sample values: {col['sample_values']}")
         column_details.append(f"  - Has nulls: {col['has_nulls']}")
     column_details_str = "\n".join(column_details)
 
@@ -287,51 +414,71 @@ def generate_safe_table_fallback(columns: list) -> str:
 '''
 
 
-def create_generate_streamlit_views_node(llm, viz_guidelines: str):
-    """Factory function to inject LLM and guidelines dependencies"""
+def create_generate_streamlit_views_node(
+    llm, viz_guidelines: str, result_store: "ResultStore", chart_selector: "ChartSelector | None" = None
+):
+    """Factory function to inject LLM, guidelines and result store dependencies
 
-    def generate_streamlit_views(state: "AgentState") -> "AgentState":
-        """Generate Streamlit visualization code using LLM"""
+    Query results are resolved from result_store with the state's result_handle.
+    When a chart_selector is given, common result shapes get its prebuilt code
+    and the LLM is only called for the others. Code planned from the query
+    schema (planned_streamlit_code, see create_plan_visualization_node) is
+    used instead of a new LLM call.
+    The returned node exposes an async variant as `.afunc` (used by ainvoke).
+    """
+
+    def build_context(state: "AgentState") -> dict:
+        """Analyze query results"""
         print("🎨 Generating Streamlit views...")
 
-        # 1. Extract state
-        rows = state.get("query_results", [])
+        # 1. Extract state (first page of results from the store, as an Arrow table)
+        table = result_store.get(state.get("result_handle", ""))
         columns = state.get("result_columns", [])
         question = state.get("question", "")
         sql = state.get("generated_sql", "")
 
-        # 2. Analyze data context
-        context = analyze_data_context(rows, columns, question, sql)
+        # 2. Analyze data context (columnar profiling)
+        context = analyze_data_context(table if table is not None else [], columns, question, sql)
+        # Rows after the first page are not in the state, only counted
+        context["num_rows"] = max(context["num_rows"], state.get("result_row_count") or 0)
         print(f"→ Data: {context['num_rows']} rows, {context['num_columns']} columns")
+        return context
+
+    def apply_chart_rules(state: "AgentState", context: dict) -> bool:
+        """Use the rule-based chart for common shapes, True if the LLM is not needed"""
+        if chart_selector is None:
+            return False
+        selection = chart_selector.select(context)
+        if selection is None:
+            print("→ No chart rule for this result shape")
+            return False
+        chart_type, state["streamlit_code"] = selection
+        print(f"📐 Rule-based {chart_type} view (no LLM call)")
+        return True
+
+    def handle_llm_timeout(state: "AgentState", e: Exception) -> "AgentState":
+        print(f"⏱️  LLM timeout: {e}. Using safe table fallback.")
+        state["streamlit_code"] = generate_safe_table_fallback(state.get("result_columns", []))
+        return state
 
-        # 3. Build LLM prompt
-        prompt = build_visualization_prompt(context, viz_guidelines)
+    def handle_llm_error(state: "AgentState", e: Exception) -> "AgentState":
+        error_msg = str(e)
+        if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
+            print(f"⏱️  LLM timeout (caught as general exception): {e}. Using safe table fallback.")
+        else:
+            print(f"❌ LLM invocation failed: {e}. Using safe table fallback.")
+        state["streamlit_code"] = generate_safe_table_fallback(state.get("result_columns", []))
+        return state
 
-        # 4. Call LLM with timeout handling
-        try:
-            response = llm.invoke(prompt)
-            generated_code = extract_python_code(response.content)
-        except TimeoutError as e:
-            print(f"⏱️  LLM timeout: {e}. Using safe table fallback.")
-            generated_code = generate_safe_table_fallback(columns)
-            state["streamlit_code"] = generated_code
-            return state
-        except Exception as e:
-            error_msg = str(e)
-            if "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                print(f"⏱️  LLM timeout (caught as general exception): {e}. Using safe table fallback.")
-            else:
-                print(f"❌ LLM invocation failed: {e}. Using safe table fallback.")
-            generated_code = generate_safe_table_fallback(columns)
-            state["streamlit_code"] = generated_code
-            return state
+    def apply_response(state: "AgentState", response_text: str) -> "AgentState":
+        generated_code = extract_python_code(response_text)
 
         # 5. Validate generated code
         is_valid, error = validate_generated_code(generated_code)
 
         if not is_valid:
             # Fallback to safe table view
-            generated_code = generate_safe_table_fallback(columns)
+            generated_code = generate_safe_table_fallback(state.get("result_columns", []))
             print(f"⚠️  Validation failed: {error}. Using table fallback.")
         else:
             print("✅ Generated code validated")
@@ -341,4 +488,118 @@ def create_generate_streamlit_views_node(llm, viz_guidelines: str):
 
         return state
 
+    def generate_streamlit_views(state: "AgentState") -> "AgentState":
+        """Generate Streamlit visualization code (chart rules first, then LLM)"""
+        context = build_context(state)
+        if apply_chart_rules(state, context):
+            return state
+        if state.get("planned_streamlit_code"):
+            print("→ Using the visualization planned while the query ran")
+            return apply_response(state, state["planned_streamlit_code"])
+
+        # 3. Build LLM prompt
+        prompt = build_visualization_prompt(context, viz_guidelines)
+
+        # 4. Call LLM with timeout handling
+        try:
+            response = llm.invoke(prompt)
+        except TimeoutError as e:
+            return handle_llm_timeout(state, e)
+        except Exception as e:
+            return handle_llm_error(state, e)
+
+        return apply_response(state, response.content)
+
+    async def agenerate_streamlit_views(state: "AgentState") -> "AgentState":
+        """Async variant (non-blocking LLM call) used by ainvoke"""
+        context = build_context(state)
+        if apply_chart_rules(state, context):
+            return state
+        if state.get("planned_streamlit_code"):
+            print("→ Using the visualization planned while the query ran")
+            return apply_response(state, state["planned_streamlit_code"])
+
+        prompt = build_visualization_prompt(context, viz_guidelines)
+
+        try:
+            response = await llm.ainvoke(prompt)
+        except TimeoutError as e:
+            return handle_llm_timeout(state, e)
+        except Exception as e:
+            return handle_llm_error(state, e)
+
+        return apply_response(state, response.content)
+
+    generate_streamlit_views.afunc = agenerate_streamlit_views
     return generate_streamlit_views
+
+
+def create_plan_visualization_node(
+    llm,
+    viz_guidelines: str,
+    conn: "duckdb.DuckDBPyConnection",
+    cursor_pool: "CursorPool | None" = None,
+    chart_selector: "ChartSelector | None" = None,
+):
+    """Factory function to create plan_visualization node (runs in parallel with execute_sql)
+
+    The visualization prompt is built from the query's output schema (DuckDB
+    DESCRIBE, no execution), so the LLM call overlaps the query. Only
+    planned_streamlit_code is returned (parallel branches can't write the
+    same state keys); generate_streamlit_views validates and uses it once
+    the rows are there. Shapes the chart_selector may handle are not planned.
+    The returned node exposes an async variant as `.afunc` (used by ainvoke).
+    """
+
+    def plan_context(state: "AgentState") -> dict | None:
+        """Output schema context, None when no LLM call should be planned"""
+        print("🗺️  Planning visualization from the query schema...")
+        sql = state.get("generated_sql", "").strip().rstrip(";")
+
+        try:
+            with cursor_pool.acquire() if cursor_pool is not None else closing(conn.cursor()) as cursor:
+                schema = [(row[0], row[1]) for row in cursor.execute(f"DESCRIBE {sql}").fetchall()]
+        except Exception as e:
+            print(f"⚠️  Output schema unavailable ({e}), visualization generated after execution")
+            return None
+
+        context = analyze_output_schema(schema, state.get("question", ""), sql)
+        if chart_selector is not None and chart_selector.may_select(context["column_metadata"]):
+            print("→ Chart rules expected to apply, no visualization LLM call planned")
+            return None
+        return context
+
+    def handle_llm_error(state: "AgentState", e: Exception) -> dict:
+        print(f"❌ Visualization planning failed: {e}. Using safe table fallback.")
+        return {"planned_streamlit_code": generate_safe_table_fallback(state.get("result_columns", []))}
+
+    def plan_visualization(state: "AgentState") -> dict:
+        """Generate visualization code from the query schema while the query runs"""
+        context = plan_context(state)
+        if context is None:
+            return {"planned_streamlit_code": ""}
+
+        try:
+            response = llm.invoke(build_visualization_prompt(context, viz_guidelines))
+        except Exception as e:
+            return handle_llm_error(state, e)
+
+        print("✅ Visualization planned from the query schema")
+        return {"planned_streamlit_code": extract_python_code(response.content)}
+
+    async def aplan_visualization(state: "AgentState") -> dict:
+        """Async variant (non-blocking LLM call) used by ainvoke"""
+        context = await asyncio.to_thread(plan_context, state)
+        if context is None:
+            return {"planned_streamlit_code": ""}
+
+        try:
+            response = await llm.ainvoke(build_visualization_prompt(context, viz_guidelines))
+        except Exception as e:
+            return handle_llm_error(state, e)
+
+        print("✅ Visualization planned from the query schema")
+        return {"planned_streamlit_code": extract_python_code(response.content)}
+
+    plan_visualization.afunc = aplan_visualization
+    return plan_visualization
@@ -0,0 +1,36 @@
+"""Question matching node - reuses SQL from near-duplicate answered questions"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..agent import AgentState
+
+
+def create_match_question_node(question_index, threshold: float):
+    """Factory function to create match_question node with the question index"""
+
+    def match_question(state: "AgentState") -> "AgentState":
+        """Look up a close enough known question and reuse its SQL (skips LLM generation)"""
+        print("🔎 Matching question against known questions...")
+
+        state["matched_question"] = ""
+        state["match_score"] = 0.0
+
+        match = question_index.search(state["question"])
+        if match is None:
+            print("→ Question index is empty")
+            return state
+
+        entry, score = match
+        state["match_score"] = score
+
+        if score >= threshold and entry["sql"]:
+            state["matched_question"] = entry["question"]
+            state["generated_sql"] = entry["sql"]
+            print(f"⚡ Matched '{entry['question']}' ({entry['source']}, score={score:.2f}) - reusing SQL")
+        else:
+            print(f"→ No close match (best score={score:.2f})")
+
+        return state
+
+    return match_question
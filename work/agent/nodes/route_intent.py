@@ -0,0 +1,30 @@
+"""Intent routing node - fills SQL templates for known intents without an LLM call"""
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from ..agent import AgentState
+
+
+def create_route_intent_node(intent_router):
+    """Factory function to create route_intent node with the intent router"""
+
+    def route_intent(state: "AgentState") -> "AgentState":
+        """Recognize a known intent and its slots, fill the SQL template"""
+        print("🧭 Routing question to known intents...")
+
+        state["routed_intent"] = ""
+
+        route = intent_router.route(state["question"])
+        if route is None:
+            print("→ No known intent, falling back to SQL generation")
+            return state
+
+        state["routed_intent"] = route["intent"]
+        state["generated_sql"] = route["sql"]
+        slots = ", ".join(f"{name}={value}" for name, value in route["slots"].items()) or "no slots"
+        print(f"⚡ Routed to '{route['intent']}' ({slots}) - template SQL")
+
+        return state
+
+    return route_intent
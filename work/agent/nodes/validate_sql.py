@@ -1,78 +1,237 @@
 """SQL validation node - ensures generated SQL is safe and correct"""
 
-import re
+import json
+import math
+import threading
 from typing import TYPE_CHECKING
 
+import duckdb
+
 if TYPE_CHECKING:
     from ..agent import AgentState
+    from ..cursor_pool import CursorPool
 
 
-# Forbidden SQL keywords (DDL/DML operations)
-FORBIDDEN_KEYWORDS = [
-    "INSERT", "UPDATE", "DELETE", "DROP", "CREATE", "ALTER",
-    "TRUNCATE", "REPLACE", "MERGE", "GRANT", "REVOKE"
-]
-
-# Maximum allowed LIMIT value
+# Maximum allowed LIMIT value, and the one added to queries without LIMIT
 MAX_LIMIT = 10000
+DEFAULT_LIMIT = 1000
+MISSING_LIMIT_ERROR = f"Query must include a LIMIT clause (max {MAX_LIMIT})"
+
+# Rough bytes per scanned value (DuckDB string_t size) for the plan byte estimate
+VALUE_BYTES = 16
+
+# FROM clause items allowed besides tables, and the table functions that read no files
+ALLOWED_TABLE_REFS = {"BASE_TABLE", "SUBQUERY", "JOIN", "EMPTY", "EXPRESSION_LIST", "PIVOT"}
+ALLOWED_TABLE_FUNCTIONS = {"unnest", "range", "generate_series"}
+
+# Integer literal types accepted for LIMIT
+INTEGER_TYPES = {"TINYINT", "SMALLINT", "INTEGER", "BIGINT", "HUGEINT", "UTINYINT", "USMALLINT", "UINTEGER", "UBIGINT"}
+
+# Parser-only connection (json_serialize_sql needs no catalog), opened on first use and shared by all threads
+_parser = None
+_parser_lock = threading.Lock()
+
+
+def parse_sql(sql: str) -> dict:
+    """DuckDB parse tree of a query (json_serialize_sql output)"""
+    global _parser
+    with _parser_lock:
+        if _parser is None:
+            _parser = duckdb.connect(":memory:")
+        serialized = _parser.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0]
+    return json.loads(serialized)
+
+
+def walk(node):
+    """Yield every dict of a parse tree"""
+    if isinstance(node, dict):
+        yield node
+        for value in node.values():
+            yield from walk(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from walk(value)
+
+
+def check_sql(sql: str, allowed_tables) -> str:
+    """Check a query on its parse tree, return the error ("" if it passes)
+
+    - a single SELECT statement (WITH, FROM-first, set operations included)
+    - only allowed tables (or CTEs) in FROM, no table functions or file reads
+    - a constant top-level LIMIT <= MAX_LIMIT
+    String literals, column names and functions like REPLACE() are never
+    mistaken for statements since nothing is matched on the query text.
+    """
+    tree = parse_sql(sql)
+
+    # Check 1: Must parse as SELECT only
+    if tree["error"]:
+        if tree.get("error_type") == "parser":
+            return f"SQL syntax error: {tree['error_message']}"
+        return "Query must be a SELECT statement (or CTE starting with WITH)"
+
+    if len(tree["statements"]) != 1:
+        return "Only one SQL statement is allowed"
+
+    # Check 2: Only allowed tables (CTE names are local tables)
+    nodes = list(walk(tree["statements"][0]))
+    allowed = {table.lower() for table in allowed_tables}
+    allowed |= {cte["key"].lower() for node in nodes if "cte_map" in node for cte in node["cte_map"]["map"]}
+
+    # Table references are the tree dicts with a sample clause that are neither expressions nor query nodes
+    for node in nodes:
+        if "sample" not in node or "class" in node or "modifiers" in node:
+            continue
+        if node["type"] == "TABLE_FUNCTION" and node["function"].get("function_name", "").lower() not in ALLOWED_TABLE_FUNCTIONS:
+            return f"Table function {node['function']['function_name']}() is not allowed. Query the star schema tables only."
+        if node["type"] not in ALLOWED_TABLE_REFS | {"TABLE_FUNCTION"}:
+            return f"{node['type']} is not allowed in FROM. Query the star schema tables only."
+        if node["type"] == "BASE_TABLE" and (node["table_name"].lower() not in allowed or node["schema_name"] not in ("", "main")):
+            table = ".".join(part for part in [node["schema_name"], node["table_name"]] if part)
+            return f"Unknown table: {table}. Allowed tables: {', '.join(sorted(allowed_tables))}"
+
+    # Check 3: Must have a constant top-level LIMIT <= MAX_LIMIT
+    modifiers = {modifier["type"]: modifier for modifier in tree["statements"][0]["node"]["modifiers"]}
+    if "LIMIT_PERCENT_MODIFIER" in modifiers:
+        return f"LIMIT must be a constant integer, not a percentage (max {MAX_LIMIT})"
+    if "LIMIT_MODIFIER" not in modifiers or modifiers["LIMIT_MODIFIER"]["limit"] is None:
+        return MISSING_LIMIT_ERROR
+
+    limit = modifiers["LIMIT_MODIFIER"]["limit"]
+    value = limit.get("value", {})
+    if (
+        limit.get("class") != "CONSTANT"
+        or value.get("is_null")
+        or value["type"]["id"] not in INTEGER_TYPES
+        or value["value"] < 0
+    ):
+        return f"LIMIT must be a constant integer (max {MAX_LIMIT})"
+    if value["value"] > MAX_LIMIT:
+        return f"LIMIT value ({value['value']}) exceeds maximum allowed ({MAX_LIMIT})"
+
+    # Check 4: Warn about SELECT * (not blocking, just a warning)
+    if any(item.get("class") == "STAR" for item in tree["statements"][0]["node"].get("select_list", [])):
+        print("⚠️  Warning: Query uses SELECT * - consider specifying explicit columns")
 
-
-def validate_sql(state: "AgentState") -> "AgentState":
-    """Validate generated SQL for safety and correctness"""
-    print("✅ Validating SQL...")
-
-    sql = state.get("generated_sql", "").strip()
-
-    if not sql:
-        state["sql_valid"] = False
-        state["validation_error"] = "No SQL query generated"
-        print(f"❌ Validation failed: {state['validation_error']}")
-        return state
-
-    # Normalize SQL for checking (uppercase, remove extra whitespace)
-    sql_upper = " ".join(sql.upper().split())
-
-    # Check 1: Must be SELECT only
-    if not sql_upper.startswith("SELECT") and not sql_upper.startswith("WITH"):
-        state["sql_valid"] = False
-        state["validation_error"] = "Query must be a SELECT statement (or CTE starting with WITH)"
-        print(f"❌ Validation failed: {state['validation_error']}")
-        return state
-
-    # Check 2: No forbidden keywords (DDL/DML operations)
-    for keyword in FORBIDDEN_KEYWORDS:
-        # Use word boundaries to avoid false positives (e.g., "INSERTED" column name)
-        pattern = r'\b' + keyword + r'\b'
-        if re.search(pattern, sql_upper):
-            state["sql_valid"] = False
-            state["validation_error"] = f"Forbidden operation detected: {keyword}. Only SELECT queries allowed."
-            print(f"❌ Validation failed: {state['validation_error']}")
-            return state
-
-    # Check 3: Must have LIMIT clause
-    if not re.search(r'\bLIMIT\s+\d+', sql_upper):
-        state["sql_valid"] = False
-        state["validation_error"] = "Query must include a LIMIT clause (max 10000)"
-        print(f"❌ Validation failed: {state['validation_error']}")
-        return state
-
-    # Check 4: LIMIT value must be <= MAX_LIMIT
-    limit_match = re.search(r'\bLIMIT\s+(\d+)', sql_upper)
-    if limit_match:
-        limit_value = int(limit_match.group(1))
-        if limit_value > MAX_LIMIT:
+    return ""
+
+
+def with_default_limit(sql: str, limit: int = DEFAULT_LIMIT) -> str:
+    """Append a top-level LIMIT to a query that has none (after a newline, so a trailing comment can't swallow it)"""
+    return f"{sql.strip().rstrip(';').rstrip()}\nLIMIT {limit}"
+
+
+def plan_rows(node: dict) -> int:
+    """Estimated output rows of an EXPLAIN (FORMAT json) operator
+
+    Operators without an estimate (CROSS_PRODUCT, projections...) are derived
+    from their children: cross products multiply, others pass the largest on.
+    """
+    estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+    if estimate is not None:
+        return int(estimate)
+    rows = [plan_rows(child) for child in node.get("children", [])]
+    if not rows:
+        return 0
+    if node["name"] == "CROSS_PRODUCT":
+        return math.prod(rows)
+    return max(rows)
+
+
+def estimate_cost(plan: list) -> dict:
+    """Peak estimated rows of any operator and estimated bytes scanned by a plan
+
+    Returns:
+        {"rows": int, "scan_bytes": int} - scanned bytes are rows x projected
+        columns x VALUE_BYTES per scan, a coarse bound rather than an exact size.
+    """
+    rows, scan_bytes = 0, 0
+    for node in walk(plan):
+        if "name" not in node:
+            continue
+        node_rows = plan_rows(node)
+        rows = max(rows, node_rows)
+        if not node.get("children"):
+            projections = node.get("extra_info", {}).get("Projections") or []
+            columns = len(projections) if isinstance(projections, list) else 1
+            scan_bytes += node_rows * columns * VALUE_BYTES
+    return {"rows": rows, "scan_bytes": scan_bytes}
+
+
+def check_cost(cost: dict, max_rows: int | None, max_scan_bytes: int | None) -> str:
+    """Budget error for a plan cost ("" if within budget)"""
+    if max_rows is not None and cost["rows"] > max_rows:
+        return (
+            f"Query plan too large: ~{cost['rows']:,} estimated rows (budget {max_rows:,}). "
+            "Filter earlier, aggregate on a rollup table or avoid cross joins."
+        )
+    if max_scan_bytes is not None and cost["scan_bytes"] > max_scan_bytes:
+        return (
+            f"Query scans too much data: ~{cost['scan_bytes'] / 1024**2:,.0f} MB estimated "
+            f"(budget {max_scan_bytes / 1024**2:,.0f} MB). Select fewer columns or filter on partitions."
+        )
+    return ""
+
+
+def create_validate_sql_node(
+    allowed_tables,
+    cursor_pool: "CursorPool | None" = None,
+    default_limit: int | None = DEFAULT_LIMIT,
+    max_rows: int | None = None,
+    max_scan_bytes: int | None = None,
+):
+    """Factory function to create validate_sql node with its table allow-list
+
+    A query without LIMIT gets LIMIT default_limit appended instead of being
+    sent back to the LLM (None keeps it a validation error).
+
+    With a cursor_pool, queries passing the parse-tree checks are also bound
+    with EXPLAIN, so unknown columns or type errors are sent back to
+    generate_sql as validation errors instead of failing at execution. The
+    plan's cardinality estimates are then checked against max_rows (largest
+    operator output) and max_scan_bytes, so runaway scans never start.
+    """
+
+    def validate_sql(state: "AgentState") -> "AgentState":
+        """Validate generated SQL for safety and correctness"""
+        print("✅ Validating SQL...")
+
+        sql = state.get("generated_sql", "").strip()
+
+        if not sql:
+            # Keep the LLM error (timeout, missing token...) that left no SQL
+            error = state.get("validation_error") or "No SQL query generated"
+        else:
+            error = check_sql(sql, allowed_tables)
+
+        # Missing LIMIT: add one rather than regenerating the whole query
+        if error == MISSING_LIMIT_ERROR and default_limit is not None:
+            limited = with_default_limit(sql, default_limit)
+            if not check_sql(limited, allowed_tables):
+                print(f"🩹 No LIMIT in the query, added LIMIT {default_limit}")
+                sql, error = limited, ""
+                state["generated_sql"] = sql
+
+        # Check 5: Must bind against the star schema (no execution) within the cost budgets
+        if not error and cursor_pool is not None:
+            try:
+                with cursor_pool.acquire() as cursor:
+                    plan = cursor.execute(f"EXPLAIN (FORMAT json) {sql}").fetchone()[1]
+                error = check_cost(estimate_cost(json.loads(plan)), max_rows, max_scan_bytes)
+            except Exception as e:
+                error = f"SQL check (EXPLAIN) failed: {e}"
+
+        if error:
             state["sql_valid"] = False
-            state["validation_error"] = f"LIMIT value ({limit_value}) exceeds maximum allowed ({MAX_LIMIT})"
-            print(f"❌ Validation failed: {state['validation_error']}")
+            state["validation_error"] = error
+            print(f"❌ Validation failed: {error}")
             return state
 
-    # Check 5: Warn about SELECT * (not blocking, just a warning)
-    if re.search(r'\bSELECT\s+\*\b', sql_upper):
-        print("⚠️  Warning: Query uses SELECT * - consider specifying explicit columns")
+        # All checks passed
+        state["sql_valid"] = True
+        state["validation_error"] = ""
+        print("✅ Validation passed")
 
-    # All checks passed
-    state["sql_valid"] = True
-    state["validation_error"] = ""
-    print("✅ Validation passed")
+        return state
 
-    return state
+    return validate_sql
@@ -0,0 +1,215 @@
+"""SQL prompt builder - compact, schema-pruned prompts for generate_sql
+
+The semantic layer is parsed once. For each question only the relevant tables,
+columns, metrics and few-shot examples are selected through keyword and
+column-synonym indexes, instead of pasting the whole YAML into every prompt.
+"""
+
+import re
+from functools import lru_cache
+
+from question_index import parse_semantic_layer, tokenize
+
+
+FACT_TABLE = "fact_batch_production"
+
+# Extra words pointing to a dimension table
+TABLE_SYNONYMS = {
+    "dim_product": ["product", "products", "drug", "medicine", "sku", "catalog", "storage", "cold", "temperature"],
+    "dim_site": ["site", "sites", "plant", "factory", "location", "country", "region", "where"],
+    "dim_specie": ["species", "animal", "animals", "target", "targeted", "pet", "pets", "livestock"],
+}
+
+# Extra words pointing to a column (table, column)
+COLUMN_SYNONYMS = {
+    ("fact_batch_production", "production_date"): ["date", "month", "year", "when", "timeline", "trend", "latest", "recent"],
+    ("fact_batch_production", "quantity_doses"): ["dose", "doses", "volume", "quantity"],
+    ("fact_batch_production", "quantity_units"): ["unit", "units", "volume", "quantity"],
+    ("fact_batch_production", "batch_status"): ["status", "released", "rejected", "pending", "quarantine"],
+    ("fact_batch_production", "gmp_deviation"): ["gmp", "deviation", "deviations", "quality"],
+    ("fact_batch_production", "destination_market"): ["market", "destination"],
+    ("fact_batch_production", "targeted_species"): ["species", "animal", "target"],
+    ("dim_product", "therapeutic_class"): ["therapeutic", "class", "antibiotic", "vaccine"],
+    ("dim_product", "temp_max_c"): ["cold", "temperature", "storage", "refrigerated"],
+    ("dim_product", "temp_min_c"): ["cold", "temperature", "storage"],
+    ("dim_site", "country"): ["country", "countries"],
+    ("dim_site", "region"): ["region", "europe", "asia", "america"],
+}
+
+# Minimum share of an example's tokens found in the question to use it as few-shot
+MIN_EXAMPLE_OVERLAP = 0.25
+
+# SQL skill sections kept in the compact prompt
+RULE_SECTIONS = ["DuckDB Specifics", "Query Safety Rules", "Star Schema Navigation"]
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate LLM token count (words and punctuation marks)"""
+    return len(re.findall(r"\w+|[^\w\s]", text))
+
+
+def extract_sections(markdown: str, titles: list[str]) -> str:
+    """Extract '## <title>' sections from a markdown document"""
+    sections = []
+    for title in titles:
+        match = re.search(rf"^## ({re.escape(title)}[^\n]*)\n(.*?)(?=^## |\Z)", markdown, re.MULTILINE | re.DOTALL)
+        if match:
+            sections.append(f"## {match.group(1)}\n{match.group(2).strip()}")
+    return "\n\n".join(sections)
+
+
+class SQLPromptBuilder:
+    """Build compact generate_sql prompts from the parsed semantic layer"""
+
+    def __init__(self, sql_skill: str, semantic_layer: str, max_examples: int = 2):
+        parsed = parse_semantic_layer(semantic_layer)["semantic_layer"]
+
+        self.tables = parsed.get("tables", {})
+        self.metrics = parsed.get("metrics", {})
+        self.examples = parsed.get("question_examples", [])
+        self.max_examples = max_examples
+        self.rules = extract_sections(sql_skill, RULE_SECTIONS) or sql_skill
+
+        self.table_index = self._build_table_index()
+        self.column_index = self._build_column_index()
+        self.example_tokens = [set(tokenize(example["question"])) for example in self.examples]
+
+        # Retries for the same question reuse the selection
+        self.select = lru_cache(maxsize=256)(self._select)
+
+    def _build_table_index(self) -> dict[str, set[str]]:
+        """token -> tables (from table name and synonyms)"""
+        index = {}
+        for table in self.tables:
+            words = table.split("_")[1:] + TABLE_SYNONYMS.get(table, [])
+            for token in tokenize(" ".join(words)):
+                index.setdefault(token, set()).add(table)
+        return index
+
+    def _build_column_index(self) -> dict[str, set[tuple[str, str]]]:
+        """token -> (table, column) (from column name, enumerated values and synonyms)"""
+        index = {}
+        for table, spec in self.tables.items():
+            for column, column_spec in spec.get("columns", {}).items():
+                words = column.split("_")
+                # Enumerated values, e.g. "(vaccine, antiparasitic, antibiotic)"
+                for values in re.findall(r"\(([^)]*)\)", column_spec.get("description", "")):
+                    words += re.split(r"[,\s]+", values)
+                words += COLUMN_SYNONYMS.get((table, column), [])
+
+                for token in tokenize(" ".join(words)):
+                    index.setdefault(token, set()).add((table, column))
+        return index
+
+    def _select(self, question: str) -> dict:
+        """Select relevant tables, columns, metrics and examples for a question"""
+        tokens = set(tokenize(question))
+        fact_columns = set(self.tables.get(FACT_TABLE, {}).get("columns", {}))
+
+        tables = {FACT_TABLE}
+        columns = set()
+
+        for token in tokens:
+            tables |= self.table_index.get(token, set())
+
+            matches = self.column_index.get(token, set())
+            # The fact table wins: "poultry" or "doses" don't pull in a dimension
+            # when a fact column (bu_source, quantity_doses) already answers them
+            fact_matches = {match for match in matches if match[0] == FACT_TABLE}
+            for table, column in fact_matches or matches:
+                if table != FACT_TABLE and column in fact_columns:
+                    continue
+                tables.add(table)
+                columns.add((table, column))
+
+        # Few-shot examples ranked by token overlap
+        scored = []
+        for example, example_tokens in zip(self.examples, self.example_tokens):
+            score = len(tokens & example_tokens) / len(example_tokens)
+            if score >= MIN_EXAMPLE_OVERLAP:
+                scored.append((score, example))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        examples = [example for _, example in scored[: self.max_examples]]
+
+        # Dimensions used by the selected examples are needed too
+        for example in examples:
+            tables |= {table for table in self.tables if re.search(rf"\b{table}\b", example["sql"])}
+
+        metrics = [
+            name for name in self.metrics
+            if tokens & set(tokenize(" ".join(name.split("_")[1:])))
+        ] or list(self.metrics)
+
+        return {
+            "tables": [table for table in self.tables if table in tables],
+            "columns": columns,
+            "metrics": metrics,
+            "examples": examples,
+        }
+
+    def _render_table(self, table: str, matched_columns: set) -> str:
+        """One line per column; descriptions only for keys and matched columns"""
+        spec = self.tables[table]
+        lines = [f"### {table}: {spec.get('description', '')}"]
+        if spec.get("grain"):
+            lines[0] += f" (grain: {spec['grain']})"
+
+        for column, column_spec in spec.get("columns", {}).items():
+            line = f"- {column} {column_spec.get('type', '')}"
+            if column_spec.get("primary_key"):
+                line += " PK"
+            if column_spec.get("foreign_key"):
+                line += f" FK -> {column_spec['foreign_key']}"
+            if column_spec.get("nullable"):
+                line += " NULL"
+            if (table, column) in matched_columns or column_spec.get("foreign_key"):
+                line += f" -- {column_spec.get('description', '')}"
+            lines.append(line)
+
+        return "\n".join(lines)
+
+    def build(self, question: str, error_feedback: str = "") -> tuple[str, int]:
+        """Build the compact prompt, return (prompt, approximate token count)"""
+        selection = self.select(question)
+
+        schema = "\n\n".join(self._render_table(table, selection["columns"]) for table in selection["tables"])
+        metrics = "\n".join(
+            f"- {name}: {self.metrics[name]['sql']} ({self.metrics[name].get('description', '')})"
+            for name in selection["metrics"]
+        )
+        examples = "\n\n".join(
+            f"Q: {example['question']}\n```sql\n{example['sql'].strip()}\n```"
+            for example in selection["examples"]
+        ) or "(none)"
+
+        prompt = f"""You are a data analyst translating questions into DuckDB SQL over a star schema.
+
+{self.rules}
+
+---
+
+# SCHEMA (relevant tables)
+
+{schema}
+
+# METRICS
+
+{metrics}
+
+# EXAMPLES
+
+{examples}
+
+---
+
+# USER QUESTION
+
+{question}
+{error_feedback}
+
+---
+
+Generate ONLY the SQL query needed to answer this question. Return the SQL without any explanation or markdown formatting.
+"""
+
+        return prompt, estimate_tokens(prompt)
@@ -0,0 +1,91 @@
+"""Query governor - deadline, cancellation and resource limits for DuckDB queries"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+import duckdb
+
+
+class QueryTimeoutError(TimeoutError):
+    """A query interrupted by the governor after its deadline"""
+
+    def __init__(self, timeout_seconds: float, elapsed_seconds: float):
+        self.timeout_seconds = timeout_seconds
+        self.elapsed_seconds = elapsed_seconds
+        super().__init__(f"Query cancelled after {elapsed_seconds:.1f}s (timeout {timeout_seconds:g}s)")
+
+
+def describe_query_error(e: Exception) -> dict:
+    """Structured description of a query failure for the agent state
+
+    Returns:
+        {"kind": "timeout" | "out_of_memory" | "interrupted" | "error",
+         "message": str, "timeout_seconds": float | None, "elapsed_seconds": float | None}
+    """
+    if isinstance(e, QueryTimeoutError):
+        kind = "timeout"
+    elif isinstance(e, duckdb.OutOfMemoryException):
+        kind = "out_of_memory"
+    elif isinstance(e, duckdb.InterruptException):
+        kind = "interrupted"
+    else:
+        kind = "error"
+    return {
+        "kind": kind,
+        "message": str(e),
+        "timeout_seconds": getattr(e, "timeout_seconds", None),
+        "elapsed_seconds": getattr(e, "elapsed_seconds", None),
+    }
+
+
+class QueryGovernor:
+    """Runs each query under a deadline, with capped DuckDB memory and threads
+
+    A watchdog timer calls cursor.interrupt() when a query (execution and
+    fetch) outlives timeout_seconds; the resulting InterruptException is
+    raised as QueryTimeoutError. memory_limit and threads are DuckDB database
+    settings shared by every cursor of the connection, so they are applied
+    once by apply(): they bound the whole process, not each query.
+    """
+
+    def __init__(self, timeout_seconds: float = 30.0, memory_limit: str | None = "2GB", threads: int | None = None):
+        self.timeout_seconds = timeout_seconds
+        self.memory_limit = memory_limit
+        self.threads = threads
+
+    describe = staticmethod(describe_query_error)
+
+    def apply(self, conn: duckdb.DuckDBPyConnection) -> None:
+        """Set memory_limit / threads on the database of a connection"""
+        if self.memory_limit is not None:
+            conn.execute(f"SET memory_limit = '{self.memory_limit}'")
+        if self.threads is not None:
+            conn.execute(f"SET threads = {int(self.threads)}")
+
+    @contextmanager
+    def deadline(self, cursor: duckdb.DuckDBPyConnection, timeout_seconds: float | None = None):
+        """Interrupt the cursor's query if the block outlives the timeout
+
+        Everything run on the cursor inside the block (execute and fetch)
+        counts against the same deadline.
+        """
+        timeout = self.timeout_seconds if timeout_seconds is None else timeout_seconds
+        expired = threading.Event()
+
+        def interrupt():
+            expired.set()
+            cursor.interrupt()
+
+        watchdog = threading.Timer(timeout, interrupt)
+        watchdog.daemon = True
+        start = time.perf_counter()
+        watchdog.start()
+        try:
+            yield cursor
+        except duckdb.InterruptException:
+            if expired.is_set():
+                raise QueryTimeoutError(timeout, time.perf_counter() - start) from None
+            raise
+        finally:
+            watchdog.cancel()
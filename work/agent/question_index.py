@@ -0,0 +1,214 @@
+"""Question index - local vector search over previously answered questions
+
+Questions are embedded with a hashed bag of normalized words and word bigrams
+(no model download, no network) and matched with NumPy cosine similarity.
+"""
+
+import re
+import threading
+import zlib
+from functools import lru_cache
+
+import numpy as np
+import yaml
+
+from answer_cache import normalize_question
+
+
+# Domain abbreviations expanded before embedding
+SYNONYMS = {
+    "bu": "business unit",
+    "bus": "business unit",
+    "qty": "quantity",
+    "nb": "number",
+    "num": "number",
+    "count": "number",
+    "lots": "batches",
+    "lot": "batch",
+    "species": "specie",
+    "per": "by",
+    "monthly": "by month",
+    "yearly": "by year",
+}
+
+# Words that carry no intent
+STOP_WORDS = {
+    "a", "an", "the", "of", "in", "on", "for", "to", "and", "or", "is", "are", "was", "were",
+    "be", "been", "do", "does", "did", "what", "which", "how", "many", "much", "me", "show",
+    "give", "list", "tell", "please", "i", "we", "our", "there", "have", "has", "each", "by",
+    "all", "with", "that", "this", "number", "total", "produced",
+}
+
+# Aggregate and comparison words (canonical form): like filter values, a question
+# only reuses the SQL of a known question with exactly the same ones
+AGGREGATE_WORDS = {
+    "average": "average", "avg": "average", "mean": "average",
+    "total": "total", "sum": "total",
+    "min": "min", "minimum": "min",
+    "max": "max", "maximum": "max",
+    "median": "median",
+    "vs": "vs", "versus": "vs", "compare": "vs", "compared": "vs", "comparison": "vs",
+}
+
+# Month and quarter names (filter values here, month range slots in the intent router)
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3,
+    "april": 4, "apr": 4, "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7,
+    "august": 8, "aug": 8, "september": 9, "sep": 9, "sept": 9, "october": 10, "oct": 10,
+    "november": 11, "nov": 11, "december": 12, "dec": 12,
+}
+QUARTERS = {"q1": (1, 3), "q2": (4, 6), "q3": (7, 9), "q4": (10, 12)}
+
+EMBEDDING_DIM = 1024
+BIGRAM_WEIGHT = 0.5
+
+# Default LIMIT added to example SQL that has none (validate_sql requires one)
+EXAMPLE_LIMIT = 1000
+
+
+def tokenize(question: str) -> list[str]:
+    """Normalize, expand synonyms, drop stop words and plural 's'"""
+    words = " ".join(SYNONYMS.get(w, w) for w in normalize_question(question).split()).split()
+
+    tokens = []
+    for word in words:
+        if word in STOP_WORDS:
+            continue
+        if word.endswith(("ches", "shes", "xes")):
+            word = word[:-2]
+        elif len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def aggregate_words(question: str) -> frozenset[str]:
+    """Aggregate and comparison words of a question (canonical forms)"""
+    return frozenset(AGGREGATE_WORDS[w] for w in normalize_question(question).split() if w in AGGREGATE_WORDS)
+
+
+def filter_terms(question: str, vocabulary: dict[tuple, tuple] | None = None) -> frozenset:
+    """Filter values of a question: numbers, months, quarters and dimension values
+
+    vocabulary maps token phrases to a canonical value (IntentRouter.filter_vocabulary),
+    longest phrases are matched first.
+    """
+    vocabulary = vocabulary or {}
+    max_phrase = max(map(len, vocabulary), default=1)
+    tokens = tokenize(question)
+
+    terms = set()
+    i = 0
+    while i < len(tokens):
+        for length in range(min(max_phrase, len(tokens) - i), 0, -1):
+            phrase = tuple(tokens[i:i + length])
+            if phrase in vocabulary:
+                terms.add(vocabulary[phrase])
+                i += length
+                break
+        else:
+            token = tokens[i]
+            if token in MONTHS:
+                terms.add(("month", MONTHS[token]))
+            elif token in QUARTERS:
+                terms.add(("quarter", token))
+            elif token.isdigit() and 1 <= int(token) <= 12 and i > 0 and re.fullmatch(r"(19|20)\d\d", tokens[i - 1]):
+                terms.add(("month", int(token)))  # 2024-03
+            elif any(c.isdigit() for c in token):
+                terms.add(("number", token.lstrip("0") or "0"))
+            i += 1
+    return frozenset(terms)
+
+
+def embed(question: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """Hashed unigram + bigram embedding, L2-normalized"""
+    vector = np.zeros(dim, dtype=np.float32)
+    tokens = tokenize(question)
+
+    for token in tokens:
+        vector[zlib.crc32(token.encode()) % dim] += 1.0
+    for first, second in zip(tokens, tokens[1:]):
+        vector[zlib.crc32(f"{first} {second}".encode()) % dim] += BIGRAM_WEIGHT
+
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+def with_limit(sql: str, limit: int = EXAMPLE_LIMIT) -> str:
+    """Append a LIMIT clause to SQL that has none"""
+    sql = sql.strip().rstrip(";").strip()
+    if re.search(r"\bLIMIT\s+\d+", sql, re.IGNORECASE):
+        return sql
+    return f"{sql}\nLIMIT {limit}"
+
+
+@lru_cache(maxsize=4)
+def parse_semantic_layer(semantic_layer: str) -> dict:
+    """Semantic layer YAML text parsed once, shared by its readers (do not mutate)"""
+    return yaml.safe_load(semantic_layer) or {}
+
+
+def load_question_examples(semantic_layer: str) -> list[dict]:
+    """Extract question_examples (question, intent, sql) from semantic layer YAML text"""
+    return parse_semantic_layer(semantic_layer).get("semantic_layer", {}).get("question_examples", [])
+
+
+class QuestionIndex:
+    """In-memory cosine similarity index of question -> SQL
+
+    filter_vocabulary (dimension value phrases, see filter_terms) lets the
+    index tell apart questions filtering on other BU, site or species values.
+    """
+
+    def __init__(self, dim: int = EMBEDDING_DIM, filter_vocabulary: dict[tuple, tuple] | None = None):
+        self.dim = dim
+        self.filter_vocabulary = filter_vocabulary or {}
+        self._lock = threading.Lock()
+        self._entries: list[dict] = []
+        self._terms: list[frozenset] = []
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._positions: dict[str, int] = {}
+
+    def terms(self, question: str) -> frozenset:
+        """Words that must be identical for two questions to share SQL (aggregates, filter values)"""
+        return aggregate_words(question) | filter_terms(question, self.filter_vocabulary)
+
+    def add(self, question: str, sql: str, source: str = "answered") -> None:
+        """Add (or update) a question and the SQL that answered it"""
+        key = normalize_question(question)
+        vector = embed(question, self.dim)
+        entry = {"question": question, "sql": sql, "source": source}
+
+        with self._lock:
+            if key in self._positions:
+                position = self._positions[key]
+                self._entries[position] = entry
+                self._terms[position] = self.terms(question)
+                self._matrix[position] = vector
+                return
+
+            self._positions[key] = len(self._entries)
+            self._entries.append(entry)
+            self._terms.append(self.terms(question))
+            self._matrix = np.vstack([self._matrix, vector])
+
+    def search(self, question: str) -> tuple[dict, float] | None:
+        """Return the closest entry and its cosine similarity (None if index empty)
+
+        Entries asking for other aggregates or comparisons ("average" vs
+        "total", "vs") or filtering on other values ("March" vs "April",
+        "poultry" vs "ruminants", "2023" vs "2024") score 0: a single differing
+        word would otherwise leave them close enough to reuse the wrong SQL.
+        """
+        terms = self.terms(question)
+        with self._lock:
+            if not self._entries:
+                return None
+            scores = self._matrix @ embed(question, self.dim)
+            same_terms = np.array([entry_terms == terms for entry_terms in self._terms])
+            scores = np.where(same_terms, scores, 0.0)
+            best = int(np.argmax(scores))
+            return self._entries[best], float(scores[best])
+
+    def __len__(self) -> int:
+        return len(self._entries)
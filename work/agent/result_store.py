@@ -0,0 +1,137 @@
+"""Result store - query results kept out of the agent state, referenced by handle"""
+
+import shutil
+import tempfile
+import threading
+import uuid
+import weakref
+from collections import OrderedDict
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pyarrow as pa  # imported on first use: creating a store stays cheap
+
+
+def summarize_table(table: "pa.Table") -> dict:
+    """Schema and per-column stats of a result table (small enough for the state)
+
+    Returns:
+        {"num_rows": int, "columns": [{"name", "type", "null_count", "min", "max"}]}
+        min / max are only set for numeric and temporal columns.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns = []
+    for field, column in zip(table.schema, table.columns):
+        stats = {"name": field.name, "type": str(field.type), "null_count": column.null_count, "min": None, "max": None}
+        if column.null_count < len(column) and (
+            pa.types.is_integer(field.type)
+            or pa.types.is_floating(field.type)
+            or pa.types.is_decimal(field.type)
+            or pa.types.is_temporal(field.type)
+        ):
+            min_max = pc.min_max(column)
+            stats["min"], stats["max"] = min_max["min"].as_py(), min_max["max"].as_py()
+        columns.append(stats)
+
+    return {"num_rows": table.num_rows, "columns": columns}
+
+
+class ResultStore:
+    """In-process LRU of Arrow tables, spilled to Arrow IPC files over budget
+
+    Nodes put result tables here and pass the returned handle in the agent
+    state; readers resolve it when they need the rows. Tables pushed out of
+    the max_bytes memory budget are written to a private spill directory and
+    memory-mapped back on access, so resident memory stays flat whatever the
+    result sizes. Spill files beyond max_spill_bytes are deleted (oldest
+    first), their handles then resolve to None.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024**2, spill_dir: Path | None = None, max_spill_bytes: int = 1024**3):
+        self.max_bytes = max_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.spill_dir = Path(spill_dir) if spill_dir is not None else None
+
+        self._lock = threading.Lock()
+        self._tables = OrderedDict()  # handle -> (table, size), least recently used first
+        self._spilled = OrderedDict()  # handle -> (path, size), oldest first
+        self._memory_bytes = 0
+        self._spill_bytes = 0
+        self._spill_path = None
+
+    summarize = staticmethod(summarize_table)
+
+    def _spill_directory(self) -> Path:
+        """Private spill directory, created on first spill and removed with the store"""
+        if self._spill_path is None:
+            if self.spill_dir is not None:
+                self.spill_dir.mkdir(parents=True, exist_ok=True)
+            self._spill_path = Path(tempfile.mkdtemp(prefix="results-", dir=self.spill_dir))
+            weakref.finalize(self, shutil.rmtree, self._spill_path, ignore_errors=True)
+        return self._spill_path
+
+    def _spill(self, handle: str, table: "pa.Table", size: int) -> None:
+        """Write an evicted table to an Arrow IPC file"""
+        import pyarrow as pa
+
+        path = self._spill_directory() / f"{handle}.arrow"
+        with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        self._spilled[handle] = (path, size)
+        self._spill_bytes += size
+
+        while self._spill_bytes > self.max_spill_bytes and len(self._spilled) > 1:
+            old_path, old_size = self._spilled.popitem(last=False)[1]
+            old_path.unlink(missing_ok=True)
+            self._spill_bytes -= old_size
+
+    def put(self, table: "pa.Table") -> str:
+        """Store a table, return its handle"""
+        handle = uuid.uuid4().hex
+        size = table.get_total_buffer_size()
+
+        with self._lock:
+            self._tables[handle] = (table, size)
+            self._memory_bytes += size
+
+            # Evict least recently used tables to disk (the new one stays in memory)
+            while self._memory_bytes > self.max_bytes and len(self._tables) > 1:
+                old_handle, (old_table, old_size) = self._tables.popitem(last=False)
+                self._memory_bytes -= old_size
+                self._spill(old_handle, old_table, old_size)
+
+        return handle
+
+    def get(self, handle: str) -> "pa.Table | None":
+        """Table for a handle (memory-mapped when spilled), None if unknown or expired"""
+        with self._lock:
+            if handle in self._tables:
+                self._tables.move_to_end(handle)
+                return self._tables[handle][0]
+            spilled = self._spilled.get(handle)
+
+        if spilled is None:
+            return None
+
+        import pyarrow as pa
+
+        try:
+            return pa.ipc.open_file(pa.memory_map(str(spilled[0]))).read_all()
+        except FileNotFoundError:
+            return None
+
+    def memory_bytes(self) -> int:
+        """Bytes of the tables held in memory"""
+        with self._lock:
+            return self._memory_bytes
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            return handle in self._tables or handle in self._spilled
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._tables) + len(self._spilled)
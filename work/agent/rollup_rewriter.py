@@ -0,0 +1,378 @@
+"""Rollup rewriter - redirects aggregate queries on the fact table to rollup tables
+
+The ETL pre-aggregates fact_batch_production per month (agg_batch_monthly) and
+per month x product x targeted species (agg_batch_species). Queries are parsed
+with DuckDB's json_serialize_sql; when every fact column used is a rollup
+dimension (or production_date at month grain) and every aggregate can be
+re-aggregated (COUNT(*), SUM of quantities), the parse tree is pointed at the
+rollup and turned back into SQL with json_deserialize_sql. Anything else is
+left untouched.
+"""
+
+import copy
+import json
+import re
+from datetime import date
+
+
+FACT_TABLE = "fact_batch_production"
+FACT_COLUMNS = {
+    "batch_production_sk", "batch_id", "product_fk", "site_fk", "production_date", "expiry_date",
+    "release_date", "quantity_doses", "quantity_units", "batch_status", "gmp_deviation",
+    "destination_market", "bu_source", "targeted_species",
+}
+
+# Rollup tables, best (smallest) first
+ROLLUPS = [
+    {
+        "table": "agg_batch_monthly",
+        "dimensions": {"bu_source", "site_fk", "batch_status"},
+        "unnest": False,
+    },
+    {
+        "table": "agg_batch_species",
+        "dimensions": {"bu_source", "site_fk", "batch_status", "product_fk"},
+        "unnest": True,
+    },
+]
+
+# Rollup columns
+MONTH_COLUMN = "production_month"
+SPECIE_COLUMN = "specie_fk"
+COUNT_COLUMN = "n_batches"
+SUM_COLUMNS = {"quantity_doses": "sum_quantity_doses", "quantity_units": "sum_quantity_units"}
+
+# Batch identifiers: COUNT(DISTINCT ...) is a batch count (one fact row per batch)
+BATCH_KEYS = {"batch_id", "batch_production_sk"}
+
+# Date functions that give the same result on production_date and its month start
+MONTH_FUNCTIONS = {"year", "month", "quarter", "monthname"}
+MONTH_TRUNC_UNITS = {"month", "quarter", "year"}
+MONTH_FORMAT = re.compile(r"^(?:%[Ymy]|%[Bb]|[^%])*$")
+
+# Aggregates whose result doesn't change when duplicate rows are collapsed
+DUPLICATE_INSENSITIVE = {"min", "max", "any_value", "first", "arbitrary", "bool_and", "bool_or"}
+
+# dim_specie columns identifying one species (species rollup keeps batch counts exact)
+SPECIE_KEYS = {"specie_sk", "specie_code", "specie_name"}
+
+# Comparison operators valid at month grain against a first-of-month date
+MONTH_BOUNDARY_COMPARISONS = {
+    ("left", "COMPARE_GREATERTHANOREQUALTO"),
+    ("left", "COMPARE_LESSTHAN"),
+    ("right", "COMPARE_LESSTHANOREQUALTO"),
+    ("right", "COMPARE_GREATERTHAN"),
+}
+
+
+class NotRewritable(Exception):
+    """The query can't be answered exactly from a rollup"""
+
+
+def column_ref(*names: str) -> dict:
+    return {"class": "COLUMN_REF", "type": "COLUMN_REF", "alias": "", "column_names": list(names)}
+
+
+def function(name: str, *children: dict) -> dict:
+    return {
+        "class": "FUNCTION", "type": "FUNCTION", "alias": "", "function_name": name, "schema": "",
+        "catalog": "", "children": list(children), "filter": None,
+        "order_bys": {"type": "ORDER_MODIFIER", "orders": []},
+        "distinct": False, "is_operator": False, "export_state": False,
+    }
+
+
+def constant_value(expression: dict):
+    """Value of a constant (or a cast constant), None otherwise"""
+    if expression.get("class") == "CAST":
+        expression = expression["child"]
+    if expression.get("class") == "CONSTANT" and not expression["value"].get("is_null"):
+        return expression["value"].get("value")
+    return None
+
+
+def is_month_start(value) -> bool:
+    try:
+        return date.fromisoformat(str(value)).day == 1
+    except ValueError:
+        return False
+
+
+class RollupRewriter:
+    """Rewrite aggregate fact queries to read a rollup table instead"""
+
+    def __init__(self, tables: list[str]):
+        self.rollups = [rollup for rollup in ROLLUPS if rollup["table"] in tables]
+        self._aggregates = None
+
+    def aggregate_functions(self, conn) -> set[str]:
+        """Names of DuckDB aggregate functions (read once)"""
+        if self._aggregates is None:
+            rows = conn.execute(
+                "SELECT DISTINCT function_name FROM duckdb_functions() WHERE function_type = 'aggregate'"
+            ).fetchall()
+            self._aggregates = {name for (name,) in rows} | {"count_star"}
+        return self._aggregates
+
+    def rewrite(self, conn, sql: str) -> tuple[str, str | None]:
+        """Return (sql to run, rollup table used or None)"""
+        sql = sql.strip().rstrip(";")
+        if not self.rollups or FACT_TABLE not in sql:
+            return sql, None
+
+        parsed = json.loads(conn.execute("SELECT json_serialize_sql(?)", [sql]).fetchone()[0])
+        if parsed.get("error") or len(parsed["statements"]) != 1:
+            return sql, None
+
+        node = parsed["statements"][0]["node"]
+        if node.get("type") != "SELECT_NODE" or node["cte_map"]["map"]:
+            return sql, None
+
+        for rollup in self.rollups:
+            try:
+                rewritten = _QueryRewrite(rollup, self.aggregate_functions(conn)).apply(copy.deepcopy(node))
+            except NotRewritable:
+                continue
+
+            # Keep the original result column names
+            names = [row[0] for row in conn.execute(f"DESCRIBE {sql}").fetchall()]
+            for expression, name in zip(rewritten["select_list"], names):
+                expression["alias"] = name
+
+            parsed["statements"][0]["node"] = rewritten
+            rollup_sql = conn.execute("SELECT json_deserialize_sql(?)", [json.dumps(parsed)]).fetchone()[0]
+            return rollup_sql, rollup["table"]
+
+        return sql, None
+
+
+class _QueryRewrite:
+    """Rewrite of one SELECT node for one rollup (raises NotRewritable)"""
+
+    def __init__(self, rollup: dict, aggregates: set[str]):
+        self.rollup = rollup
+        self.aggregates = aggregates
+        self.fact_alias = None
+        self.unnest_alias = None
+        self.unnest_column = None
+        self.specie_aliases = set()
+        self.species_grouped = False
+        self.rewritten_aggregates = 0
+
+    def apply(self, node: dict) -> dict:
+        if node.get("qualify") or node.get("sample"):
+            raise NotRewritable("QUALIFY / SAMPLE")
+
+        node["from_table"] = self.rewrite_from(node["from_table"])
+        if self.fact_alias is None:
+            raise NotRewritable("fact table not queried")
+        if self.rollup["unnest"] != (self.unnest_alias is not None):
+            raise NotRewritable("species unnest mismatch")
+
+        self.species_grouped = any(self.is_specie_key(e) for e in node["group_expressions"])
+
+        node["select_list"] = [self.expression(e) for e in node["select_list"]]
+        node["where_clause"] = self.expression(node["where_clause"])
+        node["group_expressions"] = [self.expression(e) for e in node["group_expressions"]]
+        node["having"] = self.expression(node["having"])
+        for modifier in node["modifiers"]:
+            for order in modifier.get("orders", []):
+                order["expression"] = self.expression(order["expression"])
+
+        if not self.rewritten_aggregates:
+            raise NotRewritable("no aggregate over the fact table")
+        return node
+
+    # FROM clause
+
+    def rewrite_from(self, table: dict) -> dict:
+        if table["type"] == "BASE_TABLE":
+            if table["table_name"] == FACT_TABLE:
+                if self.fact_alias is not None:
+                    raise NotRewritable("fact table joined twice")
+                # Keep the fact alias so qualified column references stay valid
+                self.fact_alias = table["alias"] or FACT_TABLE
+                table["alias"] = self.fact_alias
+                table["table_name"] = self.rollup["table"]
+            elif table["table_name"] == "dim_specie":
+                self.specie_aliases.add(table["alias"] or table["table_name"])
+            return table
+
+        if table["type"] == "JOIN":
+            # CROSS JOIN UNNEST(fact.targeted_species): the species rollup is pre-unnested
+            for side, other in (("right", "left"), ("left", "right")):
+                if self.is_species_unnest(table[side]):
+                    if table.get("condition") is not None or self.unnest_alias is not None:
+                        raise NotRewritable("unsupported unnest join")
+                    self.unnest_alias = table[side]["alias"]
+                    self.unnest_column = (table[side].get("column_name_alias") or ["unnest"])[0]
+                    return self.rewrite_from(table[other])
+
+            table["left"] = self.rewrite_from(table["left"])
+            table["right"] = self.rewrite_from(table["right"])
+            if table.get("using_columns") or table["ref_type"] not in ("REGULAR", "CROSS"):
+                raise NotRewritable("JOIN USING / NATURAL")
+            # Fact rows must be preserved: rows added for unmatched dimension members
+            # would count as 1 on the fact table but as NULL on the rollup
+            fact_on_right = self.rollup["table"] in json.dumps(table["right"])
+            if table["join_type"] not in ("INNER", "LEFT") or (table["join_type"] == "LEFT" and fact_on_right):
+                raise NotRewritable(f"{table['join_type']} JOIN")
+            table["condition"] = self.expression(table.get("condition"))
+            return table
+
+        raise NotRewritable(f"unsupported table reference {table['type']}")
+
+    def is_species_unnest(self, table: dict) -> bool:
+        return (
+            table["type"] == "TABLE_FUNCTION"
+            and table["function"].get("function_name") == "unnest"
+            and len(table["function"]["children"]) == 1
+            and table["function"]["children"][0].get("class") == "COLUMN_REF"
+            and table["function"]["children"][0]["column_names"][-1] == "targeted_species"
+        )
+
+    # Column references
+
+    def fact_column(self, expression: dict) -> str | None:
+        """Fact column name referenced by a COLUMN_REF (None for other tables/aliases)"""
+        names = expression["column_names"]
+        if len(names) == 2 and names[0] == self.fact_alias:
+            return names[1]
+        if len(names) == 1 and names[0] in FACT_COLUMNS:
+            return names[0]
+        return None
+
+    def is_specie_ref(self, expression: dict) -> bool:
+        names = expression.get("column_names", [])
+        return self.unnest_alias is not None and (
+            names == [self.unnest_alias, self.unnest_column] or names == [self.unnest_column]
+        )
+
+    def is_specie_key(self, expression: dict) -> bool:
+        if expression.get("class") != "COLUMN_REF":
+            return False
+        names = expression["column_names"]
+        return self.is_specie_ref(expression) or (
+            len(names) == 2 and names[0] in self.specie_aliases and names[1] in SPECIE_KEYS
+        )
+
+    def rollup_column(self, column: str) -> dict:
+        return column_ref(self.fact_alias, column)
+
+    # Expressions
+
+    def expression(self, expression):
+        """Rewrite an expression tree (dicts with a 'class' are expressions)"""
+        if isinstance(expression, list):
+            return [self.expression(item) for item in expression]
+        if not isinstance(expression, dict):
+            return expression
+        if "class" not in expression:
+            return {key: self.expression(value) for key, value in expression.items()}
+
+        kind = expression["class"]
+
+        if kind == "COLUMN_REF":
+            if self.is_specie_ref(expression):
+                return {**self.rollup_column(SPECIE_COLUMN), "alias": expression["alias"]}
+            column = self.fact_column(expression)
+            if column is None:
+                return expression
+            if column not in self.rollup["dimensions"]:
+                raise NotRewritable(f"column {column} not in rollup")
+            return {**self.rollup_column(column), "alias": expression["alias"]}
+
+        if kind in ("STAR", "WINDOW"):
+            raise NotRewritable(kind)
+
+        if kind == "SUBQUERY":
+            # Uncorrelated subqueries on dimensions are kept as they are
+            text = json.dumps(expression.get("subquery"))
+            if FACT_TABLE in text or f'"{self.fact_alias}"' in text:
+                raise NotRewritable("subquery on the fact table")
+            return {**expression, "child": self.expression(expression.get("child"))}
+
+        if kind == "FUNCTION":
+            if expression["function_name"] in self.aggregates:
+                return self.aggregate(expression)
+            month_expression = self.month_function(expression)
+            if month_expression is not None:
+                return month_expression
+
+        if kind == "COMPARISON":
+            month_expression = self.month_comparison(expression)
+            if month_expression is not None:
+                return month_expression
+
+        return {key: self.expression(value) for key, value in expression.items()}
+
+    def aggregate(self, expression: dict) -> dict:
+        """Re-aggregate COUNT / SUM over rollup measures"""
+        name = expression["function_name"]
+        children = expression["children"]
+        if expression.get("filter") is not None or expression["order_bys"]["orders"]:
+            raise NotRewritable("aggregate FILTER / ORDER BY")
+
+        fact_children = [
+            self.fact_column(child) for child in children if child.get("class") == "COLUMN_REF"
+        ]
+
+        replacement = None
+        if name == "count_star":
+            replacement = self.batch_count()
+        elif name == "count" and expression["distinct"] and fact_children and fact_children[0] in BATCH_KEYS:
+            # A batch appears once in the monthly rollup, once per species in the species rollup
+            if self.rollup["unnest"] and not self.species_grouped:
+                raise NotRewritable("distinct batches across species")
+            replacement = self.batch_count()
+        elif name == "sum" and not expression["distinct"] and len(children) == 1 and fact_children[:1] in (["quantity_doses"], ["quantity_units"]):
+            replacement = function("sum", self.rollup_column(SUM_COLUMNS[fact_children[0]]))
+
+        if replacement is not None:
+            self.rewritten_aggregates += 1
+            replacement["alias"] = expression["alias"]
+            return replacement
+
+        # Other aggregates: exact only over dimension values that survive the rollup
+        if not (expression["distinct"] or name in DUPLICATE_INSENSITIVE):
+            raise NotRewritable(f"aggregate {name} is not re-aggregable")
+        return {**expression, "children": [self.expression(child) for child in children]}
+
+    def batch_count(self) -> dict:
+        """COALESCE(CAST(SUM(n_batches) AS BIGINT), 0) - same type and empty result as COUNT(*)"""
+        total = function("sum", self.rollup_column(COUNT_COLUMN))
+        cast = {"class": "CAST", "type": "OPERATOR_CAST", "alias": "", "child": total,
+                "cast_type": {"id": "BIGINT", "type_info": None}, "try_cast": False}
+        zero = {"class": "CONSTANT", "type": "VALUE_CONSTANT", "alias": "",
+                "value": {"type": {"id": "INTEGER", "type_info": None}, "is_null": False, "value": 0}}
+        return {"class": "OPERATOR", "type": "OPERATOR_COALESCE", "alias": "", "children": [cast, zero]}
+
+    def is_production_date(self, expression: dict) -> bool:
+        return expression.get("class") == "COLUMN_REF" and self.fact_column(expression) == "production_date"
+
+    def month_function(self, expression: dict) -> dict | None:
+        """year()/month()/strftime('%Y-%m')/date_trunc('month') of production_date"""
+        name = expression["function_name"]
+        children = expression["children"]
+        month_ref = self.rollup_column(MONTH_COLUMN)
+
+        if name in MONTH_FUNCTIONS and len(children) == 1 and self.is_production_date(children[0]):
+            return {**expression, "children": [month_ref]}
+        if name == "strftime" and len(children) == 2 and self.is_production_date(children[0]):
+            if MONTH_FORMAT.match(str(constant_value(children[1]) or "%d")):
+                return {**expression, "children": [month_ref, children[1]]}
+        if name == "date_trunc" and len(children) == 2 and self.is_production_date(children[1]):
+            if str(constant_value(children[0])).lower() in MONTH_TRUNC_UNITS:
+                return {**expression, "children": [children[0], month_ref]}
+        return None
+
+    def month_comparison(self, expression: dict) -> dict | None:
+        """production_date >= / < a first-of-month date"""
+        for side, other in (("left", "right"), ("right", "left")):
+            if (
+                self.is_production_date(expression[side])
+                and (side, expression["type"]) in MONTH_BOUNDARY_COMPARISONS
+                and is_month_start(constant_value(expression[other]))
+            ):
+                return {**expression, side: self.rollup_column(MONTH_COLUMN)}
+        return None
@@ -0,0 +1,191 @@
+"""Stub LLM - deterministic stand-in for the HuggingFace chat model (tests, load tests)
+
+StubLLM replaces the chat model object; FakeChatEndpoint serves the same
+answers over HTTP (OpenAI-compatible /chat/completions) for the LLM gateway.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.messages import AIMessage
+
+
+DEFAULT_SQL = """SELECT bu_source, COUNT(*) AS batch_count
+FROM fact_batch_production
+GROUP BY bu_source
+ORDER BY bu_source
+LIMIT 100"""
+
+DEFAULT_CODE = '''def render_visualization(viz_type: str, columns: list, rows: list):
+    """Render visualization - STUB"""
+    import pandas as pd
+    import streamlit as st
+
+    df = pd.DataFrame(rows, columns=columns)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+'''
+
+
+class StubLLM:
+    """Answers SQL prompts with fixed SQL and visualization prompts with fixed code
+
+    latency_seconds simulates the endpoint round-trip (time.sleep for invoke,
+    asyncio.sleep for ainvoke). max_in_flight is the highest number of calls
+    seen waiting at once (> 1 when calls overlap).
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, sql: str = DEFAULT_SQL, code: str = DEFAULT_CODE):
+        self.latency_seconds = latency_seconds
+        self.sql = sql
+        self.code = code
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _start(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def _finish(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def _respond(self, prompt) -> AIMessage:
+        self.calls += 1
+        text = prompt if isinstance(prompt, str) else str(prompt)
+        return AIMessage(content=self.code if "render_visualization" in text else self.sql)
+
+    def invoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        self._start()
+        try:
+            time.sleep(self.latency_seconds)
+        finally:
+            self._finish()
+        return self._respond(prompt)
+
+    async def ainvoke(self, prompt, config=None, **kwargs) -> AIMessage:
+        self._start()
+        try:
+            await asyncio.sleep(self.latency_seconds)
+        finally:
+            self._finish()
+        return self._respond(prompt)
+
+
+class FakeChatHandler(BaseHTTPRequestHandler):
+    """POST /v1/chat/completions of a FakeChatEndpoint (keep-alive, JSON or SSE answers)"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.count_connection()
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            return self.send_body(404, b'{"error": "Unknown path"}', "application/json")
+
+        status, latency_seconds = self.server.next_answer()
+        time.sleep(latency_seconds)
+        try:
+            if status != 200:
+                return self.send_body(status, json.dumps({"error": f"Scripted HTTP {status}"}).encode(), "application/json")
+
+            prompt = " ".join(str(message.get("content", "")) for message in payload.get("messages", []))
+            text = self.server.code if "render_visualization" in prompt else self.server.sql
+            if payload.get("stream"):
+                # One server-sent event per line of the answer
+                events = [
+                    {"choices": [{"index": 0, "delta": {"content": line}}]}
+                    for line in text.splitlines(keepends=True)
+                ]
+                body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+                return self.send_body(200, body.encode(), "text/event-stream")
+
+            prompt_tokens, completion_tokens = len(prompt.split()), len(text.split())
+            completion = {
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            }
+            self.send_body(200, json.dumps(completion).encode(), "application/json")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # Client gave up (timeout)
+
+
+class FakeChatEndpoint(ThreadingHTTPServer):
+    """Local OpenAI-compatible chat endpoint answering like StubLLM (LLM gateway tests)
+
+    Faults: fail(status, times) answers the next requests with an HTTP error,
+    slow(seconds, times) delays them, down=True answers 503 to everything.
+    `requests` and `connections` count calls and TCP connections (keep-alive reuse).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, sql: str = DEFAULT_SQL, code: str = DEFAULT_CODE):
+        super().__init__((host, port), FakeChatHandler)
+        self.sql = sql
+        self.code = code
+        self.down = False
+        self.requests = 0
+        self.connections = 0
+        self._faults = []  # (status, latency_seconds) of the next requests
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def fail(self, status: int = 503, times: int = 1) -> None:
+        with self._lock:
+            self._faults.extend([(status, 0.0)] * times)
+
+    def slow(self, seconds: float, times: int = 1) -> None:
+        with self._lock:
+            self._faults.extend([(200, seconds)] * times)
+
+    def count_connection(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def next_answer(self) -> tuple[int, float]:
+        """(HTTP status, latency) of the current request"""
+        with self._lock:
+            self.requests += 1
+            if self.down:
+                return 503, 0.0
+            return self._faults.pop(0) if self._faults else (200, 0.0)
+
+    def start(self) -> "FakeChatEndpoint":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeChatEndpoint":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
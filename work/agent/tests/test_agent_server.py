@@ -0,0 +1,111 @@
+"""Test the agent server and its thin client (stub LLM, server on a free local port)"""
+
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, get_query_results, run_agent
+from agent_client import AgentClient, AgentServerError
+from agent_server import AgentServer, AgentService
+from stub_llm import DEFAULT_SQL, StubLLM
+
+
+def start_server(llm, workers: int = 4) -> tuple[AgentServer, AgentClient]:
+    server = AgentServer(AgentService(build_agent(llm=llm)), port=0, workers=workers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, AgentClient(server.url)
+
+
+def stop_server(server: AgentServer) -> None:
+    server.shutdown()
+    server.server_close()
+
+
+def test_ask_streams_events_and_results():
+    """Events come in stream_agent order, the result table is fetched by handle as Arrow"""
+    print("Testing /ask and /results...")
+
+    llm = StubLLM()
+    server, client = start_server(llm)
+    try:
+        assert client.health()["status"] == "ok"
+
+        events = list(client.stream("How many batches per BU?"))
+        nodes = [event["node"] for event in events if event["type"] == "node"]
+        assert nodes[-3:] == ["validate_sql", "execute_sql", "generate_streamlit_views"], nodes
+        assert events[-1]["type"] == "result"
+
+        state = events[-1]["state"]
+        assert state["generated_sql"] == DEFAULT_SQL
+        table = client.get_query_results(state)
+        expected = get_query_results(run_agent("How many batches per BU?", build_agent(llm=StubLLM())))
+        assert table.equals(expected)
+
+        assert client.get_query_results({"result_handle": "0" * 32}) is None
+    finally:
+        stop_server(server)
+
+    print("✅ Events streamed, results fetched as Arrow")
+
+
+def test_page_is_validated():
+    """Pages run the SQL through validate_sql again: unsafe SQL is rejected"""
+    print("Testing /page...")
+
+    server, client = start_server(StubLLM())
+    try:
+        page = client.fetch_result_page(DEFAULT_SQL, 0)
+        assert page.num_rows > 0 and page.column_names == ["bu_source", "batch_count"]
+        assert client.fetch_result_page(DEFAULT_SQL, 5).num_rows == 0
+
+        try:
+            client.fetch_result_page("SELECT * FROM read_csv('/etc/passwd') LIMIT 10", 0)
+            raise AssertionError("Unsafe SQL was executed")
+        except AgentServerError as e:
+            assert str(e).startswith("400") and "read_csv" in str(e)
+    finally:
+        stop_server(server)
+
+    print("✅ Pages fetched, unsafe SQL rejected")
+
+
+def test_concurrent_clients_share_one_agent():
+    """Several clients are served in parallel by the worker pool, one LLM / agent for all"""
+    print("Testing concurrent clients...")
+
+    llm = StubLLM(latency_seconds=0.3)
+    server, client = start_server(llm, workers=4)
+    try:
+        with ThreadPoolExecutor(4) as executor:
+            states = list(executor.map(client.ask, [f"How many batches per BU? ({i})" for i in range(4)]))
+
+        assert all(state["result_row_count"] > 0 for state in states)
+        assert llm.calls == 4  # SQL per question (rule-based chart), all on the server's agent
+        # Requests served one at a time never have two LLM calls waiting at once
+        assert llm.max_in_flight > 1, "Requests were not served in parallel"
+    finally:
+        stop_server(server)
+
+    print(f"✅ 4 concurrent clients served, up to {llm.max_in_flight} LLM calls in flight")
+
+
+def main():
+    print("=" * 60)
+    print("Agent Server Test Suite")
+    print("=" * 60 + "\n")
+
+    test_ask_streams_events_and_results()
+    test_page_is_validated()
+    test_concurrent_clients_share_one_agent()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL AGENT SERVER TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
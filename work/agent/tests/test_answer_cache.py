@@ -0,0 +1,192 @@
+"""Test persistent answer cache (normalization, data fingerprint, LRU/TTL eviction)"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import Mock
+
+import pyarrow as pa
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from answer_cache import AnswerCache, normalize_question
+
+
+ANSWER_STATE = {
+    "generated_sql": "SELECT bu_source, COUNT(*) FROM fact_batch_production GROUP BY bu_source LIMIT 10",
+    "query_results": [("companion", 15), ("poultry", 60)],
+    "result_columns": ["bu_source", "batch_count"],
+    "streamlit_code": "def render_visualization(viz_type, columns, rows):\n    pass\n",
+    "validation_error": "",
+    "execution_error": False,
+}
+
+
+def make_cache(tmp_dir: str, **kwargs) -> tuple[AnswerCache, Path]:
+    """Create a cache bound to a single fake parquet file"""
+    data_file = Path(tmp_dir) / "fact_batch_production.parquet"
+    data_file.write_bytes(b"v1")
+    cache = AnswerCache(Path(tmp_dir) / "cache.sqlite", [data_file], **kwargs)
+    return cache, data_file
+
+
+def test_normalize_question():
+    """Case, punctuation and whitespace don't change the key"""
+    print("Testing question normalization...")
+
+    assert normalize_question("How many  batches per BU?") == "how many batches per bu"
+    assert normalize_question("how many batches per bu") == normalize_question("HOW MANY BATCHES PER BU ?!")
+
+    print("✅ Normalization works")
+
+
+def test_cache_hit_on_normalized_question():
+    """A stored answer is returned for the same (normalized) question"""
+    print("Testing cache hit...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, _ = make_cache(tmp_dir)
+
+        assert cache.get("How many batches per BU?") is None
+        cache.put("How many batches per BU?", ANSWER_STATE)
+
+        cached = cache.get("how many batches per bu")
+        assert cached is not None, "Expected a cache hit"
+        assert cached["generated_sql"] == ANSWER_STATE["generated_sql"]
+        assert cached["query_results"] == ANSWER_STATE["query_results"]
+        assert cached["streamlit_code"] == ANSWER_STATE["streamlit_code"]
+
+    print("✅ Cache hit works")
+
+
+def test_cache_invalidated_when_data_changes():
+    """Rewriting a parquet file invalidates previous answers"""
+    print("Testing invalidation on data change...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, data_file = make_cache(tmp_dir)
+        cache.put("question", ANSWER_STATE)
+        assert cache.get("question") is not None
+
+        # Simulate an ETL rewrite (new content + new mtime)
+        data_file.write_bytes(b"v2 - rewritten by ETL")
+        stat = data_file.stat()
+        os.utime(data_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert cache.get("question") is None, "Stale answer should not be served"
+        assert len(cache) == 0, "Stale entries should be purged"
+
+    print("✅ Data change invalidates cache")
+
+
+def test_cache_invalidated_when_version_changes():
+    """Answers stored under another version (render contract) are not served"""
+    print("Testing invalidation on version change...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, data_file = make_cache(tmp_dir)
+        cache.put("question", ANSWER_STATE)
+
+        cache = AnswerCache(Path(tmp_dir) / "cache.sqlite", [data_file], version="render-v2")
+        assert cache.get("question") is None, "Answer written for the old contract should not be served"
+        assert len(cache) == 0, "Old version entries should be purged"
+
+        cache.put("question", ANSWER_STATE)
+        assert cache.get("question") is not None
+
+    print("✅ Version change invalidates cache")
+
+
+def test_ttl_expiry():
+    """Entries older than the TTL are not served"""
+    print("Testing TTL expiry...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, _ = make_cache(tmp_dir, ttl_seconds=0)
+        cache.put("question", ANSWER_STATE)
+        time.sleep(0.01)
+
+        assert cache.get("question") is None, "Expired entry should miss"
+
+    print("✅ TTL expiry works")
+
+
+def test_lru_eviction():
+    """Least recently used entries are evicted above max_entries"""
+    print("Testing LRU eviction...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, _ = make_cache(tmp_dir, max_entries=2)
+
+        cache.put("q1", ANSWER_STATE)
+        time.sleep(0.01)
+        cache.put("q2", ANSWER_STATE)
+        time.sleep(0.01)
+        cache.get("q1")  # q1 becomes most recently used
+        time.sleep(0.01)
+        cache.put("q3", ANSWER_STATE)
+
+        assert len(cache) == 2
+        assert cache.get("q1") is not None
+        assert cache.get("q2") is None, "q2 should have been evicted"
+        assert cache.get("q3") is not None
+
+    print("✅ LRU eviction works")
+
+
+def test_run_agent_uses_cache():
+    """run_agent only invokes the graph on a cache miss"""
+    print("Testing run_agent with answer cache...")
+
+    from agent import RESULT_STORE, get_query_results, run_agent
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache, _ = make_cache(tmp_dir)
+
+        # The graph leaves its results in the result store, the state has the handle
+        handle = RESULT_STORE.put(pa.table({"bu_source": ["companion", "poultry"], "batch_count": [15, 60]}))
+        compiled_app = Mock()
+        compiled_app.invoke.side_effect = lambda state: {**state, **ANSWER_STATE, "result_handle": handle, "sql_valid": True}
+
+        first = run_agent("Batches per BU?", compiled_app, answer_cache=cache)
+        second = run_agent("batches per bu", compiled_app, answer_cache=cache)
+
+        assert compiled_app.invoke.call_count == 1, "Second call should be served from cache"
+        assert second.get("from_cache") is True
+        assert second["generated_sql"] == first["generated_sql"]
+        # The cached table is stored again under a new handle
+        assert second["result_handle"] != first["result_handle"]
+        assert get_query_results(second).equals(get_query_results(first))
+        assert second["result_summary"]["columns"][1]["max"] == 60
+
+        # Failed runs are not cached
+        compiled_app.invoke.side_effect = lambda state: {**state, "validation_error": "boom"}
+        run_agent("failing question", compiled_app, answer_cache=cache)
+        assert cache.get("failing question") is None
+
+    print("✅ run_agent serves repeated questions from cache")
+
+
+def main():
+    print("=" * 60)
+    print("Answer Cache Test Suite")
+    print("=" * 60 + "\n")
+
+    test_normalize_question()
+    test_cache_hit_on_normalized_question()
+    test_cache_invalidated_when_data_changes()
+    test_cache_invalidated_when_version_changes()
+    test_ttl_expiry()
+    test_lru_eviction()
+    test_run_agent_uses_cache()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL ANSWER CACHE TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
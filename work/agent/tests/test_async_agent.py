@@ -0,0 +1,100 @@
+"""Test async agent (arun_agent, concurrent sessions, DuckDB cursor pool)"""
+
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import duckdb
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, arun_agent, get_query_results, run_agent
+from cursor_pool import CursorPool
+from stub_llm import StubLLM, DEFAULT_SQL
+
+
+def test_arun_agent_matches_run_agent():
+    """Async and sync runs produce the same answer"""
+    print("Testing arun_agent...")
+
+    app = build_agent(llm=StubLLM())
+    sync_result = run_agent("How many batches per BU?", app)
+    async_result = asyncio.run(arun_agent("How many batches per BU?", app))
+
+    assert async_result["generated_sql"] == DEFAULT_SQL
+    assert get_query_results(async_result).equals(get_query_results(sync_result))
+    assert "def render_visualization" in async_result["streamlit_code"]
+
+    print(f"✅ arun_agent returned {async_result['result_row_count']} rows")
+
+
+def test_concurrent_sessions_overlap():
+    """8 concurrent sessions wait on the LLM at the same time (LLM waits overlap)"""
+    print("Testing concurrent sessions...")
+
+    llm = StubLLM(latency_seconds=0.2)
+    app = build_agent(llm=llm)
+
+    async def run_many(n):
+        return await asyncio.gather(*(arun_agent(f"How many batches per BU? #{i}", app) for i in range(n)))
+
+    results = asyncio.run(run_many(8))
+
+    assert all(get_query_results(result).num_rows for result in results)
+    # One LLM call per session (SQL, the chart is rule-based); serial sessions never overlap
+    assert llm.calls == 8
+    assert llm.max_in_flight > 1, "Sessions did not overlap"
+
+    print(f"✅ 8 sessions, up to {llm.max_in_flight} LLM calls in flight")
+
+
+def test_cursor_pool_limits_concurrency():
+    """Cursors are handed out once and returned after use"""
+    print("Testing cursor pool...")
+
+    pool = CursorPool(duckdb.connect(":memory:"), size=2)
+    with pool.acquire() as first, pool.acquire() as second:
+        assert first is not second
+        assert pool.available() == 0
+        try:
+            with pool.acquire(timeout=0.05):
+                raise AssertionError("Pool should be exhausted")
+        except TimeoutError:
+            pass
+    assert pool.available() == 2
+
+    # Cursors are usable from worker threads
+    results = []
+
+    def query(i):
+        with pool.acquire() as cursor:
+            results.append(cursor.execute(f"SELECT {i}").fetchone()[0])
+
+    threads = [threading.Thread(target=query, args=(i,)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == list(range(6))
+
+    print("✅ Cursor pool works")
+
+
+def main():
+    print("=" * 60)
+    print("Async Agent Test Suite")
+    print("=" * 60 + "\n")
+
+    test_arun_agent_matches_run_agent()
+    test_concurrent_sessions_overlap()
+    test_cursor_pool_limits_concurrency()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL ASYNC AGENT TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""Test the rule-based chart selector and its use by generate_streamlit_views"""
+
+import sys
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from unittest.mock import Mock
+
+import pyarrow as pa
+
+# Add agent and streamlit-app directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "streamlit-app"))
+
+from chart_selector import ChartSelector
+from nodes.generate_streamlit_views import analyze_data_context, create_generate_streamlit_views_node
+from result_store import ResultStore
+from streamlit_app import RESTRICTED_GLOBALS
+
+SELECTOR = ChartSelector()
+
+BUS = ["companion", "ruminants", "swine", "poultry"]
+
+# (question, columns, rows, expected chart type or None for the LLM)
+SHAPES = [
+    ("Deviation rate?", ["total_batches", "deviation_rate_pct"], [(Decimal("120"), 2.5)], "kpi"),
+    ("Batches per month", ["production_month", "batch_count"], [(date(2024, m, 1), m * 10) for m in range(1, 7)], "line"),
+    ("Batches per year", ["year", "batch_count"], [(2023, 50), (2024, 70)], "line"),
+    (
+        "Monthly doses per BU",
+        ["month", "bu_source", "total_doses"],
+        [(f"2024-0{m}", bu, Decimal(m * 100)) for m in range(1, 4) for bu in BUS],
+        "line",
+    ),
+    ("Batches per BU", ["bu_source", "batch_count", "total_doses"], [(bu, i, Decimal(i * 1000)) for i, bu in enumerate(BUS)], "bar"),
+    ("Distribution of batches by BU", ["bu_source", "batch_count"], [(bu, i + 1) for i, bu in enumerate(BUS)], "pie"),
+    (
+        "Batch status per BU",
+        ["batch_status", "bu_source", "batch_count"],
+        [(status, bu, 3) for status in ["released", "rejected", "quarantine"] for bu in BUS],
+        "bar",
+    ),
+    ("Doses vs units", ["total_doses", "total_units"], [(i * 10.0, i * 2.0) for i in range(10)], "scatter"),
+    ("Anything?", ["bu_source", "batch_count"], [], "table"),
+    ("Single batch", ["batch_id", "site_code", "quantity_doses"], [("B-1", "LYON-01", 1000)], "table"),
+    ("Batches per product", ["product_code", "batch_count"], [(f"P{i}", i) for i in range(40)], "table"),
+    ("All columns", [f"c{i}" for i in range(8)], [tuple(range(8))] * 3, "table"),
+    ("Per site, BU and species", ["site_code", "bu_source", "specie_code", "batch_count"], [("A", "b", "c", 1), ("D", "e", "f", 2)], None),
+    ("Empty column", ["bu_source", "batch_count"], [(None, 1), (None, 2)], None),
+]
+
+
+def test_shapes_select_expected_chart():
+    """Each common result shape gets its chart, unusual shapes are left to the LLM"""
+    print("Testing chart selection...")
+
+    for question, columns, rows, expected in SHAPES:
+        selection = SELECTOR.select(analyze_data_context(rows, columns, question, "SELECT ..."))
+        chart_type = selection[0] if selection else None
+        assert chart_type == expected, f"{question}: expected {expected}, got {chart_type}"
+
+    question, columns, rows, _ = SHAPES[6]
+    bar = SELECTOR.choose(analyze_data_context(rows, columns, question, ""))[1]
+    assert (bar["x"], bar["color"]) == (1, 0), "Stacked bars should be split by the category with fewer values"
+
+    print(f"✅ {len(SHAPES)} result shapes mapped to their chart")
+
+
+def test_templates_render():
+    """Every selected code runs in the app's restricted namespace"""
+    print("Testing rule-based code execution...")
+
+    for question, columns, rows, expected in SHAPES:
+        if expected is None:
+            continue
+        _, code = SELECTOR.select(analyze_data_context(rows, columns, question, ""))
+        namespace = {}
+        exec(code, RESTRICTED_GLOBALS, namespace)
+        namespace["render_visualization"]("auto", columns, rows)
+
+    print("✅ All rule-based views render")
+
+
+def test_code_is_stable_per_shape():
+    """Only column positions are filled in: same shape, same code (render cache hits)"""
+    print("Testing code stability...")
+
+    question, columns, rows, _ = SHAPES[4]
+    _, code = SELECTOR.select(analyze_data_context(rows, columns, question, ""))
+    _, other = SELECTOR.select(analyze_data_context(rows[:2], ["site_code", "batches", "doses"], "Per site", ""))
+    assert code == other
+    assert "bu_source" not in code
+
+    print("✅ Same shape, same code")
+
+
+def test_node_skips_llm_for_common_shapes():
+    """generate_streamlit_views only calls the LLM when no rule applies"""
+    print("Testing node integration...")
+
+    llm = Mock()
+    llm.invoke.return_value = Mock(content="def render_visualization(viz_type: str, columns: list, rows: list):\n    pass\n")
+    result_store = ResultStore()
+    node = create_generate_streamlit_views_node(llm, "guidelines", result_store, SELECTOR)
+
+    def state(table: pa.Table) -> dict:
+        return {
+            "question": "Batches per BU",
+            "generated_sql": "SELECT ...",
+            "result_handle": result_store.put(table),
+            "result_columns": table.column_names,
+            "result_row_count": table.num_rows,
+            "streamlit_code": "",
+        }
+
+    result = node(state(pa.table({"bu_source": BUS, "batch_count": [1, 2, 3, 4]})))
+    assert "bar chart (rule-based)" in result["streamlit_code"]
+    assert llm.invoke.call_count == 0
+
+    unusual = pa.table({"site_code": ["A"] * 2, "bu_source": ["b"] * 2, "specie_code": ["c", "d"], "batch_count": [1, 2]})
+    result = node(state(unusual))
+    assert llm.invoke.call_count == 1
+    assert result["streamlit_code"].startswith("def render_visualization")
+
+    print("✅ LLM called only for the unusual shape")
+
+
+def main():
+    print("=" * 60)
+    print("Chart Selector Test Suite")
+    print("=" * 60 + "\n")
+
+    test_shapes_select_expected_chart()
+    test_templates_render()
+    test_code_is_stable_per_shape()
+    test_node_skips_llm_for_common_shapes()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL CHART SELECTOR TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
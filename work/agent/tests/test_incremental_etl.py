@@ -0,0 +1,167 @@
+"""Test incremental ETL (high-water marks, stable surrogate keys, appended parts), fact partitions and the DuckDB database"""
+
+import json
+import shutil
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from io import StringIO
+from pathlib import Path
+
+import duckdb
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "scripts"))
+
+import etl_to_star_schema as etl
+
+
+NEW_POULTRY = "POL-2025-20000,VAC-POL-099,New Vax,turkey,2025-01-05,2027-01-01,1000,LIBOURNE-FR,2,8,released,2025-01-10\n"
+NEW_RUMINANTS = "RUM-202501-0001,AB-RUM-001,Shotapen,antibiotic,ovine,injectable,50.0,100,2025-01-02,2027-02-22,ALGETE-ES,released,True\n"
+
+
+def run_etl(work_dir: Path, *args: str) -> None:
+    """Run the ETL main() on a copy of the sources"""
+    original_paths = etl.SOURCES_DIR, etl.OUTPUT_DIR, etl.STATE_PATH, etl.DATABASE_PATH
+    etl.SOURCES_DIR = work_dir / "a-sources"
+    etl.OUTPUT_DIR = work_dir / "out"
+    etl.STATE_PATH = etl.OUTPUT_DIR / "_etl_state.json"
+    etl.DATABASE_PATH = etl.OUTPUT_DIR / "star_schema.duckdb"
+    etl.OUTPUT_DIR.mkdir(exist_ok=True)
+
+    argv = sys.argv
+    sys.argv = ["etl_to_star_schema.py", *args]
+    try:
+        with redirect_stdout(StringIO()):
+            etl.main()
+    finally:
+        sys.argv = argv
+        etl.SOURCES_DIR, etl.OUTPUT_DIR, etl.STATE_PATH, etl.DATABASE_PATH = original_paths
+
+
+def query(work_dir: Path, sql: str) -> list:
+    out = work_dir / "out"
+    conn = duckdb.connect()
+    for table in ["dim_product", "agg_batch_monthly"]:
+        conn.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{out}/{table}*.parquet')")
+    conn.execute(
+        "CREATE VIEW fact_batch_production AS SELECT * EXCLUDE (year, month) "
+        f"FROM read_parquet('{out}/fact_batch_production/**/*.parquet', hive_partitioning=true)"
+    )
+    return conn.execute(sql).fetchall()
+
+
+def fact_files(work_dir: Path, part: int) -> list:
+    """Fact part files, relative to the fact partition directory"""
+    fact_dir = work_dir / "out" / "fact_batch_production"
+    return sorted(str(p.relative_to(fact_dir)) for p in fact_dir.rglob(f"part-{part:05d}.parquet"))
+
+
+def test_incremental_appends_only_new_batches():
+    """New source rows become a part file, existing keys and files are untouched"""
+    print("Testing incremental ETL...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        shutil.copytree(etl.SOURCES_DIR, work_dir / "a-sources")
+
+        run_etl(work_dir)
+        keys_before = query(work_dir, "SELECT product_code, product_sk FROM dim_product ORDER BY 1")
+        fact_dir = work_dir / "out" / "fact_batch_production"
+        fact_mtimes = {path: path.stat().st_mtime_ns for path in fact_dir.rglob("*.parquet")}
+
+        # Nothing new: nothing written
+        run_etl(work_dir, "--incremental")
+        assert not fact_files(work_dir, 1)
+
+        # Append one poultry batch (new product) and one ruminant batch
+        with open(work_dir / "a-sources" / "bu_poultry_production.csv", "a") as f:
+            f.write(NEW_POULTRY)
+        with open(work_dir / "a-sources" / "bu_ruminants_production.csv", "a") as f:
+            f.write(NEW_RUMINANTS)
+        run_etl(work_dir, "--incremental")
+
+        out = work_dir / "out"
+        assert all(path.stat().st_mtime_ns == mtime for path, mtime in fact_mtimes.items()), "Base fact files must not be rewritten"
+        assert sorted(p.name for p in out.glob("*-00001.parquet")) == ["agg_batch_monthly-00001.parquet", "agg_batch_species-00001.parquet"]
+        assert fact_files(work_dir, 1) == [
+            "bu_source=poultry/year=2025/month=1/part-00001.parquet",
+            "bu_source=ruminants/year=2025/month=1/part-00001.parquet",
+        ]
+
+        # Existing dimension members keep their keys, the new product gets the next one
+        keys_after = query(work_dir, "SELECT product_code, product_sk FROM dim_product ORDER BY 1")
+        assert set(keys_before) <= set(keys_after)
+        new_product = [row for row in keys_after if row[0] == "VAC-POL-099"]
+        assert new_product == [("VAC-POL-099", max(sk for _, sk in keys_before) + 1)]
+
+        # Only the two new batches were added, with fresh fact keys
+        new_batches = query(work_dir, "SELECT batch_id, batch_production_sk FROM read_parquet('" + str(out) + "/fact_batch_production/**/part-00001.parquet') ORDER BY 2")
+        assert [batch for batch, _ in new_batches] == ["POL-2025-20000", "RUM-202501-0001"]
+        assert [sk for _, sk in new_batches] == [176, 177]
+        assert query(work_dir, "SELECT COUNT(*), COUNT(DISTINCT batch_production_sk) FROM fact_batch_production") == [(177, 177)]
+        assert query(work_dir, "SELECT SUM(n_batches) FROM agg_batch_monthly") == [(177,)]
+
+        state = json.loads((out / "_etl_state.json").read_text())
+        assert state["high_water_marks"]["poultry"] == ["2025-01-05", "POL-2025-20000"]
+        assert state["last_part"] == 1
+
+        # The DuckDB database got the same new rows, keys still enforced
+        db = duckdb.connect(str(out / "star_schema.duckdb"), read_only=True)
+        assert db.execute("SELECT COUNT(*), MAX(batch_production_sk) FROM fact_batch_production").fetchall() == [(177, 177)]
+        assert db.execute("SELECT product_code, product_sk FROM dim_product ORDER BY 1").fetchall() == keys_after
+        assert db.execute("SELECT SUM(n_batches) FROM agg_batch_monthly").fetchall() == [(177,)]
+        primary_keys = db.execute("SELECT table_name FROM duckdb_constraints() WHERE constraint_type = 'PRIMARY KEY' ORDER BY 1").fetchall()
+        assert primary_keys == [("dim_product",), ("dim_site",), ("dim_specie",), ("fact_batch_production",)]
+        db.close()
+
+        # --no-duckdb removes the database rather than leaving a stale one
+        run_etl(work_dir, "--no-duckdb")
+        assert not (out / "star_schema.duckdb").exists()
+
+    print("✅ Incremental run appended 2 batches as part 00001")
+
+
+def test_fact_partitions_are_pruned():
+    """Fact files are split by BU and month, BU filters only scan that BU's files"""
+    print("Testing fact partitions...")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        shutil.copytree(etl.SOURCES_DIR, work_dir / "a-sources")
+        run_etl(work_dir)
+
+        files = fact_files(work_dir, 0)
+        poultry_files = [f for f in files if f.startswith("bu_source=poultry/")]
+        assert 0 < len(poultry_files) < len(files)
+
+        # Every row sits in the partition of its own BU and production month
+        misplaced = query(work_dir, f"""
+            SELECT COUNT(*) FROM read_parquet('{work_dir}/out/fact_batch_production/**/*.parquet', hive_partitioning=true)
+            WHERE year != year(production_date) OR month != month(production_date)
+        """)
+        assert misplaced == [(0,)]
+        assert query(work_dir, "SELECT COUNT(*) FROM fact_batch_production") == [(175,)]
+        assert "year" not in [row[0] for row in query(work_dir, "DESCRIBE fact_batch_production")]
+
+        plan = query(work_dir, "EXPLAIN ANALYZE SELECT COUNT(*) FROM fact_batch_production WHERE bu_source = 'poultry'")[0][1]
+        assert f"Scanning Files: {len(poultry_files)}/{len(files)}" in plan
+
+    print(f"✅ {len(files)} partitions, a BU filter scans {len(poultry_files)} of them")
+
+
+def main():
+    print("=" * 60)
+    print("Incremental ETL Test Suite")
+    print("=" * 60 + "\n")
+
+    test_incremental_appends_only_new_batches()
+    test_fact_partitions_are_pruned()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL INCREMENTAL ETL TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
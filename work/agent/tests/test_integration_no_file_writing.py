@@ -6,7 +6,7 @@ from pathlib import Path
 # Add agent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from agent import build_agent, run_agent
+from agent import build_agent, get_query_results, run_agent
 
 
 def test_agent_stores_code_in_state():
@@ -42,7 +42,7 @@ def test_code_is_executable():
     result = run_agent(question, app)
 
     code = result["streamlit_code"]
-    rows = result["query_results"]
+    rows = get_query_results(result)
     columns = result["result_columns"]
 
     # Execute the code (simulating streamlit execution)
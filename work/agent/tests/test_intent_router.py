@@ -0,0 +1,175 @@
+"""Test deterministic intent routing (slot extraction, SQL templates, route_intent node)"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, get_query_results, run_agent, initialize_duckdb_connection, load_semantic_layer
+from intent_router import IntentRouter
+from question_index import load_question_examples
+from stub_llm import DEFAULT_CODE
+
+
+CONN = initialize_duckdb_connection()
+ROUTER = IntentRouter.from_connection(CONN)
+
+
+def test_examples_route_to_their_intent():
+    """Each semantic layer example routes to its intent and returns the example's rows"""
+    print("Testing semantic layer examples...")
+
+    for example in load_question_examples(load_semantic_layer()):
+        route = ROUTER.route(example["question"])
+        assert route is not None, f"Not routed: {example['question']}"
+        assert route["intent"] == example["intent"], f"{example['question']} -> {route['intent']}"
+
+        expected = CONN.execute(example["sql"]).fetchall()
+        actual = CONN.execute(route["sql"]).fetchall()
+        assert sorted(map(str, actual)) == sorted(map(str, expected)), f"Rows differ for {example['intent']}"
+
+    print("✅ All examples routed with matching results")
+
+
+def test_slot_extraction():
+    """BU, site, species and month range slots are recognized"""
+    print("Testing slot extraction...")
+
+    route = ROUTER.route("Monthly production for poultry since June 2024")
+    assert route["intent"] == "production_timeline"
+    assert route["slots"] == {"bu": ["poultry"], "months": {"start": "2024-06-01", "end": None}}
+    assert "f.production_date >= DATE '2024-06-01'" in route["sql"]
+    assert "f.production_date < DATE" not in route["sql"]
+
+    route = ROUTER.route("Which sites in Europe are the most active?")
+    assert route["intent"] == "production_by_site"
+    assert sorted(route["slots"]["site"]) == ["ALGETE-ES", "BUDAPEST-HU", "LIBOURNE-FR"]
+
+    route = ROUTER.route("List products for cattle")
+    assert route["intent"] == "products_by_species"
+    assert route["slots"] == {"species": ["bovine"]}
+
+    route = ROUTER.route("batch status for Libourne in Q2")
+    assert route["slots"]["months"] == {"year": None, "start": 4, "end": 6}
+    assert "month(f.production_date) BETWEEN 4 AND 6" in route["sql"]
+
+    print("✅ Slots extracted")
+
+
+def test_month_ranges():
+    """Date ranges keep each endpoint's year, range words bound a single date"""
+    print("Testing month ranges...")
+
+    ranges = {
+        "production timeline between november 2023 and february 2024": ("2023-11-01", "2024-03-01"),
+        "production timeline between 2023-11 and 2024-02": ("2023-11-01", "2024-03-01"),
+        "production by business unit 2023 2024": ("2023-01-01", "2025-01-01"),
+        "production by business unit from 2023 to 2024": ("2023-01-01", "2025-01-01"),
+        "production by business unit in 2024 from march to june": ("2024-03-01", "2024-07-01"),
+        "production by business unit before march 2024": (None, "2024-03-01"),
+        "production by business unit after march 2024": ("2024-04-01", None),
+        "production by business unit through march 2024": (None, "2024-04-01"),
+    }
+    for question, (start, end) in ranges.items():
+        route = ROUTER.route(question)
+        assert route["slots"]["months"] == {"start": start, "end": end}, f"{question}: {route['slots']['months']}"
+
+    route = ROUTER.route("production timeline between november 2023 and february 2024")
+    rows = CONN.execute(route["sql"]).fetchall()
+    expected = CONN.execute(
+        "SELECT COUNT(*) FROM fact_batch_production "
+        "WHERE production_date BETWEEN '2023-11-01' AND '2024-02-29'"
+    ).fetchone()[0]
+    assert expected and sum(row[2] for row in rows) == expected
+
+    assert ROUTER.route("batch status for Libourne before March")["slots"]["months"] == {"year": None, "start": 1, "end": 2}
+
+    for question in [
+        "production by business unit between 2024 and 2023",
+        "production by business unit 2023 november to 2024 february",
+        "production by business unit between november and february",
+        "production by business unit after march 2023 and june 2024",
+    ]:
+        assert ROUTER.route(question) is None, f"Ambiguous dates should not be routed: {question}"
+
+    print("✅ Month ranges built across years")
+
+
+def test_slot_filters_are_applied():
+    """Filled templates only return rows matching the slots"""
+    print("Testing slot filters...")
+
+    rows = CONN.execute(ROUTER.route("batches per BU for ruminants in March 2024")["sql"]).fetchall()
+    expected = CONN.execute(
+        "SELECT COUNT(*) FROM fact_batch_production "
+        "WHERE bu_source = 'ruminants' AND production_date BETWEEN '2024-03-01' AND '2024-03-31'"
+    ).fetchone()[0]
+    assert [row[0] for row in rows] == ["ruminants"]
+    assert rows[0][1] == expected
+
+    rows = CONN.execute(ROUTER.route("products for cats")["sql"]).fetchall()
+    assert rows, "Cat products expected"
+
+    print("✅ Slot filters applied")
+
+
+def test_unknown_questions_fall_back():
+    """Questions with words outside an intent's vocabulary are not routed"""
+    print("Testing fallback...")
+
+    for question in [
+        "What is the weather today?",
+        "Average dose per product by business unit",
+        "Which products for dogs are stored cold?",
+        "Compare rejected batches between Libourne and Lenexa",
+    ]:
+        assert ROUTER.route(question) is None, f"Should not be routed: {question}"
+
+    print("✅ Unknown questions fall back to the LLM")
+
+
+def test_graph_skips_llm_for_routed_intent():
+    """A routed question goes straight to validate_sql -> execute_sql"""
+    print("Testing graph routing...")
+
+    prompts = []
+
+    def fake_invoke(prompt):
+        prompts.append(prompt)
+        return SimpleNamespace(content=DEFAULT_CODE)
+
+    llm = Mock()
+    llm.invoke.side_effect = fake_invoke
+
+    app = build_agent(llm=llm, intent_router=ROUTER)
+    result = run_agent("How many batches per BU in 2024?", app)
+
+    assert result["routed_intent"] == "production_volume_by_bu"
+    assert get_query_results(result).num_rows, "Template SQL should have been executed"
+    assert not prompts, "No LLM call should happen (template SQL, rule-based chart)"
+
+    print("✅ Routed intent bypasses SQL generation")
+
+
+def main():
+    print("=" * 60)
+    print("Intent Router Test Suite")
+    print("=" * 60 + "\n")
+
+    test_examples_route_to_their_intent()
+    test_slot_extraction()
+    test_month_ranges()
+    test_slot_filters_are_applied()
+    test_unknown_questions_fall_back()
+    test_graph_skips_llm_for_routed_intent()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL INTENT ROUTER TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
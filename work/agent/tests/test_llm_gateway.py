@@ -0,0 +1,249 @@
+"""Test the LLM gateway (retries, connection pooling, request budget, circuit breaker) on a local fake endpoint"""
+
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import arun_agent, build_agent, run_agent, stream_agent
+from llm_budget import remaining_budget, request_budget
+from llm_gateway import ChatGateway, CircuitBreaker, LLMEndpointError, LLMTimeoutError, LLMUnavailableError
+from stub_llm import DEFAULT_SQL, FakeChatEndpoint, StubLLM
+
+
+def make_gateway(endpoint: FakeChatEndpoint, **kwargs) -> ChatGateway:
+    options = {"backoff_base_seconds": 0.01, "backoff_max_seconds": 0.05, "reset_seconds": 0.3}
+    return ChatGateway(base_url=endpoint.url, model="stub", api_key="test", **{**options, **kwargs})
+
+
+def test_transient_errors_retried():
+    """503 / 429 are retried with backoff, other client errors are not"""
+    print("Testing retries...")
+
+    with FakeChatEndpoint() as endpoint:
+        llm = make_gateway(endpoint)
+
+        endpoint.fail(503)
+        endpoint.fail(429)
+        assert llm.invoke("How many batches per BU?").content == DEFAULT_SQL
+        assert endpoint.requests == 3
+
+        endpoint.fail(400)
+        try:
+            llm.invoke("Bad request")
+            raise AssertionError("HTTP 400 should not be retried")
+        except LLMEndpointError as e:
+            assert e.status_code == 400
+        assert endpoint.requests == 4
+
+        endpoint.fail(503, times=3)
+        try:
+            llm.invoke("Still failing")
+            raise AssertionError("Endpoint failing on every attempt")
+        except LLMUnavailableError:
+            pass
+        assert endpoint.requests == 7
+        assert llm.breaker.state == "closed", "5 consecutive failures needed to open the circuit"
+
+    print("✅ Transient errors retried, 400 raised at once")
+
+
+def test_connections_reused():
+    """Calls share keep-alive connections, at most pool_size of them"""
+    print("Testing connection pooling...")
+
+    with FakeChatEndpoint() as endpoint:
+        llm = make_gateway(endpoint, pool_size=4)
+
+        for _ in range(10):
+            llm.invoke("How many batches per BU?")
+        assert endpoint.connections == 1, f"{endpoint.connections} connections for 10 sequential calls"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda _: llm.invoke("Concurrent"), range(40)))
+        assert endpoint.connections <= 4, f"{endpoint.connections} connections for a pool of 4"
+
+        async def concurrent_calls():
+            return await asyncio.gather(*(llm.ainvoke("Async") for _ in range(10)))
+
+        assert all(r.content == DEFAULT_SQL for r in asyncio.run(concurrent_calls()))
+        assert endpoint.requests == 60
+
+    print(f"✅ 60 calls over {endpoint.connections} connections")
+
+
+def test_request_budget_caps_calls():
+    """Each call's timeout is what is left of the request budget"""
+    print("Testing request budget...")
+
+    with FakeChatEndpoint() as endpoint:
+        llm = make_gateway(endpoint, timeout_seconds=10)
+
+        endpoint.slow(2.0, times=3)
+        start = time.perf_counter()
+        try:
+            with request_budget(0.5):
+                llm.invoke("Slow endpoint")
+            raise AssertionError("Call should outlive the budget")
+        except LLMTimeoutError:
+            pass
+        elapsed = time.perf_counter() - start
+        assert elapsed < 1.0, f"Budget of 0.5s took {elapsed:.2f}s"
+
+        requests = endpoint.requests
+        with request_budget(0):
+            try:
+                llm.invoke("No budget left")
+                raise AssertionError("Exhausted budget should fail")
+            except LLMTimeoutError:
+                pass
+        assert endpoint.requests == requests, "No request once the budget is spent"
+
+        # Nested budgets keep the earliest deadline
+        with request_budget(0.5), request_budget(30):
+            start = time.perf_counter()
+            try:
+                llm.invoke("Slow endpoint")
+            except LLMTimeoutError:
+                pass
+            assert time.perf_counter() - start < 1.0
+
+    print(f"✅ Slow call cut at the budget ({elapsed:.2f}s)")
+
+
+class BudgetRecordingLLM(StubLLM):
+    """StubLLM recording remaining_budget() at each call"""
+
+    def __init__(self):
+        super().__init__()
+        self.budgets = []
+
+    def _respond(self, prompt):
+        self.budgets.append(remaining_budget())
+        return super()._respond(prompt)
+
+
+def test_request_budget_reaches_nodes():
+    """LLM calls made by graph nodes (worker threads, tasks, SQL candidates) see the question's budget"""
+    print("Testing request budget in graph nodes...")
+
+    llm = BudgetRecordingLLM()
+    app = build_agent(llm=llm)
+
+    run_agent("How many batches per BU?", app)
+    asyncio.run(arun_agent("How many batches per BU?", app))
+    list(stream_agent("How many batches per BU?", app))
+    run_agent("How many batches per BU?", build_agent(llm=llm, sql_candidates=3))
+
+    assert len(llm.budgets) >= 6
+    assert all(budget is not None and budget > 0 for budget in llm.budgets), llm.budgets
+    assert remaining_budget() is None, "Budget ends with the question"
+
+    print(f"✅ {len(llm.budgets)} node LLM calls saw the budget")
+
+
+def test_circuit_breaker_states():
+    """closed -> open after consecutive failures -> half-open probe -> closed or open again"""
+    print("Testing circuit breaker...")
+
+    now = [0.0]
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: now[0])
+
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "open"
+    try:
+        breaker.before_call()
+        raise AssertionError("Open circuit should fail fast")
+    except LLMUnavailableError as e:
+        assert e.retry_in_seconds == 10
+
+    now[0] = 10
+    assert breaker.state == "half_open"
+    breaker.before_call()  # Probe
+    try:
+        breaker.before_call()
+        raise AssertionError("Only one probe while half-open")
+    except LLMUnavailableError:
+        pass
+    breaker.record_failure()
+    assert breaker.state == "open", "Failed probe reopens the circuit"
+
+    now[0] = 20
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+    print("✅ Breaker transitions")
+
+
+def test_agent_fails_fast_when_endpoint_down():
+    """Endpoint down: the circuit opens and questions end at once with an LLM error"""
+    print("Testing agent fallback on a down endpoint...")
+
+    with FakeChatEndpoint() as endpoint:
+        llm = make_gateway(endpoint, failure_threshold=3, reset_seconds=60)
+        app = build_agent(llm=llm)
+
+        endpoint.down = True
+        run_agent("How many batches per BU?", app)
+        assert llm.breaker.state == "open"
+        requests = endpoint.requests
+
+        start = time.perf_counter()
+        result = run_agent("How many batches per BU?", app)
+        elapsed = time.perf_counter() - start
+
+        assert endpoint.requests == requests, "Open circuit: no call reaches the endpoint"
+        assert "LLM unavailable" in result["validation_error"]
+        assert not result["generated_sql"]
+        assert elapsed < 0.5, f"Fail fast took {elapsed:.2f}s"
+
+    print(f"✅ Question answered with the fallback in {elapsed * 1000:.0f} ms")
+
+
+def test_agent_on_gateway():
+    """The agent answers, streams SQL tokens and runs async over the gateway"""
+    print("Testing agent over the gateway...")
+
+    with FakeChatEndpoint() as endpoint:
+        app = build_agent(llm=make_gateway(endpoint))
+
+        result = run_agent("How many batches per BU?", app)
+        assert result["generated_sql"] == DEFAULT_SQL and result["result_row_count"] > 0
+
+        events = list(stream_agent("How many batches per BU?", app))
+        tokens = [e["text"] for e in events if e["type"] == "token" and e["node"] == "generate_sql"]
+        assert len(tokens) > 1 and "".join(tokens) == DEFAULT_SQL
+
+        result = asyncio.run(arun_agent("How many batches per BU?", app))
+        assert result["generated_sql"] == DEFAULT_SQL
+
+    print(f"✅ Answered, streamed {len(tokens)} tokens, async run")
+
+
+def main():
+    print("=" * 60)
+    print("LLM Gateway Test Suite")
+    print("=" * 60 + "\n")
+
+    test_transient_errors_retried()
+    test_connections_reused()
+    test_request_budget_caps_calls()
+    test_request_budget_reaches_nodes()
+    test_circuit_breaker_states()
+    test_agent_fails_fast_when_endpoint_down()
+    test_agent_on_gateway()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL LLM GATEWAY TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
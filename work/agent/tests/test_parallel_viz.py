@@ -0,0 +1,150 @@
+"""Test the parallel visualization planning mode (plan_visualization next to execute_sql)"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import arun_agent, build_agent, create_initial_state, run_agent
+from chart_selector import ChartSelector
+from nodes.generate_streamlit_views import analyze_output_schema, infer_duckdb_type
+from stub_llm import DEFAULT_CODE, DEFAULT_SQL, StubLLM
+
+# Three categories and a count: no chart rule, the visualization LLM is needed
+UNUSUAL_SQL = """SELECT s.site_code, f.bu_source, f.batch_status, COUNT(*) AS batch_count
+FROM fact_batch_production f
+JOIN dim_site s ON f.site_fk = s.site_sk
+GROUP BY ALL
+LIMIT 100"""
+
+# Passes validation, fails at runtime (conversion error)
+FAILING_SQL = "SELECT CAST(bu_source AS INTEGER) AS x FROM fact_batch_production LIMIT 10"
+
+
+class RecordingLLM(StubLLM):
+    """StubLLM keeping the visualization prompts"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.viz_prompts = []
+
+    def _respond(self, prompt):
+        if "render_visualization" in str(prompt):
+            self.viz_prompts.append(str(prompt))
+        return super()._respond(prompt)
+
+
+def task_steps(app, question: str) -> dict[str, int]:
+    """Graph step of each node run (debug stream)"""
+    steps = {}
+    for event in app.stream(create_initial_state(question), stream_mode="debug"):
+        if event["type"] == "task":
+            steps[event["payload"]["name"]] = event["step"]
+    return steps
+
+
+def test_schema_types():
+    """DuckDB output types map to the column types used by prompts and chart rules"""
+    print("Testing output schema analysis...")
+
+    assert infer_duckdb_type("BIGINT") == "numeric"
+    assert infer_duckdb_type("DECIMAL(18,2)") == "numeric"
+    assert infer_duckdb_type("TIMESTAMP WITH TIME ZONE") == "datetime"
+    assert infer_duckdb_type("DATE") == "datetime"
+    assert infer_duckdb_type("VARCHAR") == "string"
+
+    selector = ChartSelector()
+    bar = analyze_output_schema([("bu_source", "VARCHAR"), ("batch_count", "BIGINT")], "", "")
+    kpi = analyze_output_schema([("total_batches", "BIGINT")], "", "")
+    unusual = analyze_output_schema([("a", "VARCHAR"), ("b", "VARCHAR"), ("c", "VARCHAR"), ("n", "BIGINT")], "", "")
+    assert selector.may_select(bar["column_metadata"])
+    assert selector.may_select(kpi["column_metadata"])
+    assert not selector.may_select(unusual["column_metadata"])
+
+    print("✅ Schema types and rule coverage")
+
+
+def test_branches_run_in_the_same_step():
+    """Valid SQL fans out: execute_sql and plan_visualization run side by side, then join"""
+    print("Testing fan-out...")
+
+    llm = RecordingLLM(sql=UNUSUAL_SQL)
+    app = build_agent(llm=llm, parallel_viz=True)
+
+    steps = task_steps(app, "Batches per site, BU and status")
+    assert steps["execute_sql"] == steps["plan_visualization"], steps
+    assert steps["generate_streamlit_views"] == steps["execute_sql"] + 1, steps
+
+    llm.calls = 0
+    llm.viz_prompts = []
+    result = run_agent("Batches per site, BU and status", app)
+    assert result["result_row_count"] > 0
+    assert result["streamlit_code"] == DEFAULT_CODE.strip()
+    assert llm.calls == 2, "SQL + planned visualization, no visualization call after execution"
+    assert "unknown (query still running)" in llm.viz_prompts[0], "Prompt should be built from the schema"
+
+    print(f"✅ Branches in step {steps['execute_sql']}, joined in step {steps['generate_streamlit_views']}")
+
+
+def test_rule_shapes_are_not_planned():
+    """Shapes covered by chart rules don't start a visualization LLM call"""
+    print("Testing rule-covered shapes...")
+
+    llm = StubLLM(sql=DEFAULT_SQL)
+    result = run_agent("How many batches per BU?", build_agent(llm=llm, parallel_viz=True))
+
+    assert "rule-based" in result["streamlit_code"]
+    assert not result["planned_streamlit_code"]
+    assert llm.calls == 1
+
+    print("✅ Rule-covered shape: SQL call only")
+
+
+def test_async_fan_out():
+    """ainvoke runs both branches with their async variants"""
+    print("Testing async fan-out...")
+
+    llm = StubLLM(latency_seconds=0.1, sql=UNUSUAL_SQL)
+    result = asyncio.run(arun_agent("Batches per site, BU and status", build_agent(llm=llm, parallel_viz=True)))
+
+    assert result["result_row_count"] > 0
+    assert result["streamlit_code"] == DEFAULT_CODE.strip()
+    assert llm.calls == 2
+
+    print("✅ Async branches joined")
+
+
+def test_runtime_error_reported():
+    """A query failing at runtime reports the same error as in serial mode"""
+    print("Testing runtime error in parallel mode...")
+
+    serial = run_agent("Business unit as a number", build_agent(llm=StubLLM(sql=FAILING_SQL)))
+    parallel = run_agent("Business unit as a number", build_agent(llm=StubLLM(sql=FAILING_SQL), parallel_viz=True))
+
+    assert serial["validation_error"].startswith("SQL execution error: Conversion Error")
+    assert parallel["validation_error"] == serial["validation_error"]
+    assert parallel["execution_error"] and parallel["result_row_count"] == 0
+
+    print("✅ Runtime error kept in validation_error")
+
+
+def main():
+    print("=" * 60)
+    print("Parallel Visualization Planning Test Suite")
+    print("=" * 60 + "\n")
+
+    test_schema_types()
+    test_branches_run_in_the_same_step()
+    test_rule_shapes_are_not_planned()
+    test_async_fan_out()
+    test_runtime_error_reported()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL PARALLEL VISUALIZATION TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Test schema-pruned SQL prompt builder"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import load_agent_specifications, load_semantic_layer, load_sql_skill
+from prompt_builder import SQLPromptBuilder, estimate_tokens
+from nodes.generate_sql import create_generate_sql_node
+
+
+def make_builder() -> SQLPromptBuilder:
+    return SQLPromptBuilder(load_sql_skill(), load_semantic_layer())
+
+
+def test_selects_relevant_tables():
+    """Only dimensions mentioned by the question are kept"""
+    print("Testing table selection...")
+
+    builder = make_builder()
+
+    assert builder.select("How many batches per BU?")["tables"] == ["fact_batch_production"]
+    assert "dim_site" in builder.select("Which sites in Europe produced the most doses?")["tables"]
+    assert "dim_specie" in builder.select("List all products for dogs")["tables"]
+    assert "dim_specie" not in builder.select("Which sites in Europe produced the most doses?")["tables"]
+
+    print("✅ Table selection works")
+
+
+def test_selects_relevant_examples():
+    """Few-shot examples are ranked by overlap with the question"""
+    print("Testing example selection...")
+
+    builder = make_builder()
+    intents = [example["intent"] for example in builder.select("distribution of batches by therapeutic class")["examples"]]
+
+    assert intents[0] == "therapeutic_class_distribution"
+    assert len(intents) <= builder.max_examples
+    assert builder.select("What's the weather")["examples"] == []
+
+    print("✅ Example selection works")
+
+
+def test_prompt_is_compact():
+    """Compact prompt is much smaller than specs + full semantic layer"""
+    print("Testing prompt size...")
+
+    builder = make_builder()
+    full_tokens = estimate_tokens(load_agent_specifications() + load_semantic_layer())
+
+    prompt, tokens = builder.build("How many batches per BU?")
+    assert tokens == estimate_tokens(prompt)
+    assert tokens < full_tokens / 2, f"Prompt not compact enough: {tokens} vs {full_tokens}"
+    assert "How many batches per BU?" in prompt
+    assert "LIMIT" in prompt, "Safety rules must be kept"
+    assert "dim_specie" not in prompt
+
+    print(f"✅ Compact prompt: ~{tokens} tokens (full prompt: ~{full_tokens})")
+
+
+def test_generate_sql_uses_builder():
+    """generate_sql sends the compact prompt and reports its token count"""
+    print("Testing generate_sql with prompt builder...")
+
+    mock_llm = Mock()
+    mock_llm.invoke.return_value = SimpleNamespace(content="SELECT 1 LIMIT 1")
+
+    generate_sql = create_generate_sql_node(mock_llm, "FULL SPECS", "FULL SEMANTIC LAYER", make_builder())
+    state = generate_sql({"question": "How many batches per BU?", "generated_sql": "", "validation_error": ""})
+
+    prompt = mock_llm.invoke.call_args[0][0]
+    assert "FULL SEMANTIC LAYER" not in prompt
+    assert state["prompt_tokens"] == estimate_tokens(prompt)
+    assert state["generated_sql"] == "SELECT 1 LIMIT 1"
+
+    print("✅ generate_sql uses the compact prompt")
+
+
+def main():
+    print("=" * 60)
+    print("Prompt Builder Test Suite")
+    print("=" * 60 + "\n")
+
+    test_selects_relevant_tables()
+    test_selects_relevant_examples()
+    test_prompt_is_compact()
+    test_generate_sql_uses_builder()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL PROMPT BUILDER TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
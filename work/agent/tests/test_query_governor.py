@@ -0,0 +1,124 @@
+"""Test the query governor (deadline interrupt, structured errors, DuckDB resource settings)"""
+
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import duckdb
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cursor_pool import CursorPool
+from nodes.execute_sql import create_execute_sql_node
+from query_governor import QueryGovernor, QueryTimeoutError
+from result_store import ResultStore
+
+
+RUNAWAY_SQL = "SELECT COUNT(*) FROM range(100000000) a, range(100000) b"
+FAST_SQL = "SELECT i FROM range(10) t(i)"
+
+
+def make_node(timeout_seconds: float, pool_size: int = 4):
+    conn = duckdb.connect()
+    governor = QueryGovernor(timeout_seconds, memory_limit=None)
+    return create_execute_sql_node(conn, ResultStore(), CursorPool(conn, size=pool_size), governor=governor)
+
+
+def test_runaway_query_cancelled():
+    """A query past its deadline is interrupted and reported as a timeout"""
+    print("Testing deadline...")
+
+    execute_sql = make_node(timeout_seconds=0.3, pool_size=1)
+
+    start = time.perf_counter()
+    state = execute_sql({"generated_sql": RUNAWAY_SQL})
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 2, f"Query not interrupted: {elapsed:.2f}s"
+    assert state["execution_error"]
+    assert state["query_error"]["kind"] == "timeout"
+    assert state["query_error"]["timeout_seconds"] == 0.3
+    assert state["query_error"]["elapsed_seconds"] >= 0.3
+
+    # The pooled cursor is usable again (the error is cleared), and a finished query is not interrupted later
+    state = execute_sql({**state, "generated_sql": FAST_SQL})
+    assert state["execution_error"] is False and state["query_error"] == {}
+    time.sleep(0.4)
+    state = execute_sql({"generated_sql": FAST_SQL})
+    assert not state.get("execution_error") and state["result_row_count"] == 10
+
+    print(f"✅ Runaway query cancelled after {elapsed:.2f}s")
+
+
+def test_concurrent_latency_bounded():
+    """Runaway queries don't hold up the others: every request ends by its deadline"""
+    print("Testing concurrent queries...")
+
+    execute_sql = make_node(timeout_seconds=1.0)
+    queries = [RUNAWAY_SQL, FAST_SQL, RUNAWAY_SQL, FAST_SQL]
+
+    def timed(sql):
+        start = time.perf_counter()
+        state = execute_sql({"generated_sql": sql})
+        return state, time.perf_counter() - start
+
+    with ThreadPoolExecutor(len(queries)) as executor:
+        results = list(executor.map(timed, queries))
+
+    for sql, (state, elapsed) in zip(queries, results):
+        if sql == RUNAWAY_SQL:
+            assert state["query_error"]["kind"] == "timeout" and elapsed < 3
+        else:
+            assert state["result_row_count"] == 10 and elapsed < 1.0, f"Fast query took {elapsed:.2f}s"
+
+    print(f"✅ Slowest request {max(elapsed for _, elapsed in results):.2f}s")
+
+
+def test_errors_are_structured():
+    """Other failures keep their kind and message"""
+    print("Testing structured errors...")
+
+    state = make_node(timeout_seconds=5)({"generated_sql": "SELECT no_such_column FROM range(10)"})
+    assert state["query_error"]["kind"] == "error"
+    assert "no_such_column" in state["query_error"]["message"]
+    assert state["validation_error"].startswith("SQL execution error")
+
+    error = QueryTimeoutError(1.0, 1.2)
+    assert isinstance(error, TimeoutError)
+    assert QueryGovernor.describe(error)["kind"] == "timeout"
+
+    print("✅ Failures described in query_error")
+
+
+def test_resource_settings_applied():
+    """memory_limit and threads are set on the database"""
+    print("Testing resource settings...")
+
+    conn = duckdb.connect()
+    QueryGovernor(memory_limit="512MB", threads=2).apply(conn)
+
+    assert conn.execute("SELECT current_setting('threads')").fetchone()[0] == 2
+    assert conn.execute("SELECT current_setting('memory_limit')").fetchone()[0] == "488.2 MiB"
+
+    print("✅ memory_limit and threads applied")
+
+
+def main():
+    print("=" * 60)
+    print("Query Governor Test Suite")
+    print("=" * 60 + "\n")
+
+    test_runaway_query_cancelled()
+    test_concurrent_latency_bounded()
+    test_errors_are_structured()
+    test_resource_settings_applied()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL QUERY GOVERNOR TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
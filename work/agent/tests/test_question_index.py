@@ -0,0 +1,202 @@
+"""Test near-duplicate question matching (question index + match_question node)"""
+
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from question_index import QuestionIndex, aggregate_words, embed, filter_terms, tokenize, with_limit
+from nodes.match_question import create_match_question_node
+
+
+BU_SQL = "SELECT bu_source, COUNT(*) AS batch_count FROM fact_batch_production GROUP BY bu_source LIMIT 100"
+STATUS_SQL = "SELECT batch_status, bu_source, COUNT(*) FROM fact_batch_production GROUP BY 1, 2 LIMIT 100"
+
+VIZ_CODE = '''def render_visualization(viz_type: str, columns: list, rows: list):
+    import pandas as pd
+    import streamlit as st
+
+    df = pd.DataFrame(rows, columns=columns)
+    st.dataframe(df)
+'''
+
+
+def make_index() -> QuestionIndex:
+    index = QuestionIndex()
+    index.add("How many batches were produced by each business unit?", BU_SQL, source="example")
+    index.add("Show me batch status distribution by business unit", STATUS_SQL, source="example")
+    return index
+
+
+def test_tokenize_expands_synonyms():
+    """Abbreviations, plurals and stop words are normalized"""
+    print("Testing tokenization...")
+
+    assert tokenize("batches per BU") == ["batch", "business", "unit"]
+    assert tokenize("How many batches by business unit?") == ["batch", "business", "unit"]
+
+    print("✅ Tokenization works")
+
+
+def test_paraphrase_matches():
+    """Paraphrases of a known question match with high similarity"""
+    print("Testing paraphrase matching...")
+
+    index = make_index()
+    entry, score = index.search("batches per BU")
+
+    assert entry["sql"] == BU_SQL, f"Wrong match: {entry['question']}"
+    assert score >= 0.9, f"Score too low: {score}"
+
+    print(f"✅ Paraphrase matched (score={score:.2f})")
+
+
+def test_different_intent_does_not_match():
+    """A related but different question stays below the threshold"""
+    print("Testing different intent...")
+
+    index = QuestionIndex()
+    index.add("How many batches were produced by each business unit?", BU_SQL)
+
+    _, score = index.search("batch status by business unit")
+    assert score < 0.9, f"Different intent should not match (score={score:.2f})"
+
+    _, score = index.search("what is the weather today")
+    assert score < 0.5
+
+    print("✅ Different intents are not matched")
+
+
+def test_different_aggregate_does_not_match():
+    """Near-misses asking for another aggregate or a comparison never reuse SQL"""
+    print("Testing aggregate guard...")
+
+    known = "Show the total production volume by business unit, site and month"
+    near_miss = "Show the average production volume by business unit, site and month"
+    assert float(embed(known) @ embed(near_miss)) >= 0.9, "Near-miss should be close in embedding space"
+
+    index = QuestionIndex()
+    index.add(known, BU_SQL)
+    index.add("What is the total production volume?", STATUS_SQL)
+
+    for question in [near_miss, "total vs average production volume", "Show the max production volume by business unit, site and month"]:
+        _, score = index.search(question)
+        assert score < 0.9, f"{question!r} should not reuse SQL (score={score:.2f})"
+
+    # Same aggregate, other wording
+    entry, score = index.search("Show the sum of production volume per BU, site and month")
+    assert entry["question"] == known and score >= 0.9
+    assert aggregate_words("avg vs mean") == {"average", "vs"}
+
+    print("✅ Different aggregates are not matched")
+
+
+def test_different_filter_values_do_not_match():
+    """Near-misses filtering on another month, year or business unit never reuse SQL"""
+    print("Testing filter value guard...")
+
+    from agent import create_intent_router
+
+    vocabulary = create_intent_router().filter_vocabulary()
+    index = QuestionIndex(filter_vocabulary=vocabulary)
+
+    near_misses = {
+        "How many batches were produced at site FR-01 by business unit, product, batch status and production line in March 2024?":
+            "How many batches were produced at site FR-01 by business unit, product, batch status and production line in April 2024?",
+        "Show the production volume, batch count and batch status by site, product, production line and month for poultry":
+            "Show the production volume, batch count and batch status by site, product, production line and month for ruminants",
+    }
+    for known, near_miss in near_misses.items():
+        assert float(embed(known) @ embed(near_miss)) >= 0.9, "Near-miss should be close in embedding space"
+        index.add(known, BU_SQL)
+
+    for known, near_miss in near_misses.items():
+        _, score = index.search(near_miss)
+        assert score < 0.9, f"{near_miss!r} should not reuse SQL (score={score:.2f})"
+        entry, score = index.search(known.replace("How many", "Number of").replace("Show the", "Give the"))
+        assert entry["question"] == known and score >= 0.9
+
+    _, score = index.search("How many batches were produced at site FR-01 by business unit, product, batch status and production line in March 2023?")
+    assert score < 0.9, "Other year should not reuse SQL"
+
+    # Synonyms of the same value are the same filter
+    assert filter_terms("batches for cattle", vocabulary) == filter_terms("batches for bovine", vocabulary)
+    assert filter_terms("batches in 2024-03") == filter_terms("batches in march 2024")
+
+    print("✅ Different filter values are not matched")
+
+
+def test_with_limit():
+    """Example SQL without LIMIT gets one, existing LIMIT is kept"""
+    assert with_limit("SELECT 1;").endswith("LIMIT 1000")
+    assert with_limit("SELECT 1 LIMIT 5") == "SELECT 1 LIMIT 5"
+
+
+def test_match_node_reuses_sql():
+    """match_question node sets generated_sql on a close match only"""
+    print("Testing match_question node...")
+
+    match_question = create_match_question_node(make_index(), threshold=0.9)
+
+    state = match_question({"question": "how many batches per BU", "generated_sql": ""})
+    assert state["generated_sql"] == BU_SQL
+    assert state["matched_question"] == "How many batches were produced by each business unit?"
+
+    state = match_question({"question": "Which products need cold storage?", "generated_sql": ""})
+    assert state["generated_sql"] == ""
+    assert state["matched_question"] == ""
+
+    print("✅ match_question node works")
+
+
+def test_graph_skips_sql_generation_on_match():
+    """A matched question goes straight to validate_sql -> execute_sql"""
+    print("Testing graph routing on match...")
+
+    from agent import build_agent, get_query_results, run_agent
+
+    prompts = []
+
+    def fake_invoke(prompt):
+        prompts.append(prompt)
+        return SimpleNamespace(content=VIZ_CODE)
+
+    llm = Mock()
+    llm.invoke.side_effect = fake_invoke
+
+    index = make_index()
+    app = build_agent(question_index=index, llm=llm)
+    result = run_agent("batches per BU", app, question_index=index)
+
+    assert result["matched_question"], "Question should have matched"
+    assert result["generated_sql"] == BU_SQL
+    assert get_query_results(result).num_rows, "Reused SQL should have been executed"
+    assert not prompts, "No LLM call should happen (reused SQL, rule-based chart)"
+
+    print("✅ Matched question bypasses SQL generation")
+
+
+def main():
+    print("=" * 60)
+    print("Question Index Test Suite")
+    print("=" * 60 + "\n")
+
+    test_tokenize_expands_synonyms()
+    test_paraphrase_matches()
+    test_different_intent_does_not_match()
+    test_different_aggregate_does_not_match()
+    test_different_filter_values_do_not_match()
+    test_with_limit()
+    test_match_node_reuses_sql()
+    test_graph_skips_sql_generation_on_match()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL QUESTION INDEX TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Test the compiled render_visualization cache of the Streamlit app"""
+
+import sys
+import time
+from pathlib import Path
+from unittest import mock
+
+# Add agent and streamlit-app directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent.parent.parent / "streamlit-app"))
+
+import streamlit_app
+from nodes import generate_streamlit_views
+from streamlit_app import RENDER_CACHE_MAX_ENTRIES, code_hash, compile_render_function
+from stub_llm import DEFAULT_CODE
+
+
+def render(code: str):
+    return compile_render_function(code_hash(code), code)
+
+
+def test_reruns_reuse_compiled_function():
+    """The same code is validated and executed once, reruns get the cached function"""
+    print("Testing cache hits...")
+
+    compile_render_function.clear()
+    with mock.patch.object(generate_streamlit_views, "validate_generated_code", wraps=generate_streamlit_views.validate_generated_code) as validate:
+        first = render(DEFAULT_CODE)
+        start = time.perf_counter()
+        for _ in range(100):
+            assert render(DEFAULT_CODE) is first
+        rerun = (time.perf_counter() - start) / 100
+
+    assert validate.call_count == 1
+    assert first.__name__ == "render_visualization"
+    assert first.__globals__ is streamlit_app.RESTRICTED_GLOBALS
+
+    print(f"✅ One AST validation for 101 renders ({rerun * 1e6:.0f} µs per rerun lookup)")
+
+
+def test_rejected_code_not_cached():
+    """Code failing validation raises every time, it never becomes a cached function"""
+    print("Testing rejected code...")
+
+    compile_render_function.clear()
+    malicious = DEFAULT_CODE + "\n    open('/etc/passwd').read()\n"
+    for _ in range(2):
+        try:
+            render(malicious)
+            raise AssertionError("Malicious code was compiled")
+        except ValueError as e:
+            assert "rejected" in str(e)
+
+    try:
+        render("x = 1\n")
+        raise AssertionError("Code without render_visualization was accepted")
+    except ValueError as e:
+        assert "did not define render_visualization" in str(e) or "rejected" in str(e)
+
+    print("✅ Rejected code raises, nothing cached")
+
+
+def test_cache_is_bounded():
+    """Past RENDER_CACHE_MAX_ENTRIES distinct codes, the oldest function is evicted"""
+    print("Testing eviction...")
+
+    compile_render_function.clear()
+    codes = [DEFAULT_CODE.replace("STUB", f"STUB {i}") for i in range(RENDER_CACHE_MAX_ENTRIES + 1)]
+    first = render(codes[0])
+    for code in codes[1:]:
+        render(code)
+
+    assert render(codes[-1]) is render(codes[-1])
+    assert render(codes[0]) is not first, "Oldest entry should have been evicted"
+
+    print(f"✅ At most {RENDER_CACHE_MAX_ENTRIES} compiled functions kept")
+
+
+def main():
+    print("=" * 60)
+    print("Render Cache Test Suite")
+    print("=" * 60 + "\n")
+
+    test_reruns_reuse_compiled_function()
+    test_rejected_code_not_cached()
+    test_cache_is_bounded()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL RENDER CACHE TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
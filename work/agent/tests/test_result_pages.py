@@ -0,0 +1,103 @@
+"""Test Arrow results in execute_sql (first page in the result store, other pages on demand)"""
+
+import sys
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from nodes.execute_sql import RESULT_PAGE_SIZE, create_execute_sql_node, fetch_result_page
+from query_governor import QueryGovernor, QueryTimeoutError
+from result_store import ResultStore
+
+
+LARGE_SQL = "SELECT i, i % 7 AS bucket, 'batch-' || i AS batch_id FROM range(2500) t(i) ORDER BY i"
+RUNAWAY_SQL = "SELECT a.range % 7 AS bucket, COUNT(*) AS n FROM range(100000000) a, range(100000) b GROUP BY bucket"
+
+
+def test_first_page_in_state():
+    """Only the first page is kept (as Arrow, in the result store), the total row count is reported"""
+    print("Testing first result page...")
+
+    result_store = ResultStore()
+    execute_sql = create_execute_sql_node(duckdb.connect(), result_store)
+    state = execute_sql({"generated_sql": LARGE_SQL})
+
+    table = result_store.get(state["result_handle"])
+    assert isinstance(table, pa.Table)
+    assert table.num_rows == RESULT_PAGE_SIZE
+    assert state["result_row_count"] == 2500
+    assert state["result_columns"] == ["i", "bucket", "batch_id"]
+    assert table.column("i").to_pylist() == list(range(RESULT_PAGE_SIZE))
+    assert "query_results" not in state
+
+    print(f"✅ {table.num_rows} of {state['result_row_count']} rows kept in the store")
+
+
+def test_fetch_other_pages():
+    """Further pages come from LIMIT / OFFSET on the query"""
+    print("Testing result pagination...")
+
+    conn = duckdb.connect()
+    last_page = (2500 - 1) // RESULT_PAGE_SIZE
+
+    assert fetch_result_page(conn, LARGE_SQL + ";", 1).column("i")[0].as_py() == RESULT_PAGE_SIZE
+    assert fetch_result_page(conn, LARGE_SQL, last_page).num_rows == 2500 - last_page * RESULT_PAGE_SIZE
+    assert fetch_result_page(conn, LARGE_SQL, last_page + 1).num_rows == 0
+
+    print("✅ Pages fetched on demand")
+
+
+def test_page_query_governed():
+    """Page queries run under the governor's deadline like execute_sql"""
+    print("Testing page query deadline...")
+
+    conn = duckdb.connect()
+    governor = QueryGovernor(timeout_seconds=0.3, memory_limit=None)
+
+    try:
+        fetch_result_page(conn, RUNAWAY_SQL, 1, governor=governor)
+        raise AssertionError("Runaway page query should be interrupted")
+    except QueryTimeoutError as e:
+        assert e.timeout_seconds == 0.3
+
+    assert fetch_result_page(conn, LARGE_SQL, 1, governor=governor).num_rows == RESULT_PAGE_SIZE
+
+    print("✅ Runaway page query cancelled")
+
+
+def test_integer_sums_stay_integers():
+    """SUM of integers (HUGEINT, exported as DECIMAL(38,0)) comes back as int64"""
+    print("Testing Arrow type normalization...")
+
+    result_store = ResultStore()
+    execute_sql = create_execute_sql_node(duckdb.connect(), result_store)
+    state = execute_sql({"generated_sql": "SELECT SUM(i) AS total, AVG(i) AS mean FROM range(10) t(i)"})
+
+    table = result_store.get(state["result_handle"])
+    assert table.schema.field("total").type == pa.int64()
+    assert table.to_pylist() == [{"total": 45, "mean": 4.5}]
+
+    print("✅ Integer sums are int64")
+
+
+def main():
+    print("=" * 60)
+    print("Result Pages Test Suite")
+    print("=" * 60 + "\n")
+
+    test_first_page_in_state()
+    test_fetch_other_pages()
+    test_page_query_governed()
+    test_integer_sums_stay_integers()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL RESULT PAGES TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
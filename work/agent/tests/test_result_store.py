@@ -0,0 +1,121 @@
+"""Test the result store (handles in state, LRU memory budget, spill to Arrow files, summaries)"""
+
+import gc
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+
+import duckdb
+import pyarrow as pa
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from nodes.execute_sql import create_execute_sql_node
+from result_store import ResultStore, summarize_table
+
+
+def make_table(start: int, rows: int = 10_000) -> pa.Table:
+    return pa.table({"i": pa.array(range(start, start + rows), pa.int64()), "label": [f"row-{n}" for n in range(start, start + rows)]})
+
+
+def spill_files(spill_dir: str) -> set:
+    return {path.stem for path in Path(spill_dir).rglob("*.arrow")}
+
+
+def test_lru_spills_to_disk():
+    """Tables over the memory budget are spilled (least recently used first) and still resolve"""
+    print("Testing LRU spill...")
+
+    with tempfile.TemporaryDirectory() as spill_dir:
+        tables = [make_table(n * 10_000) for n in range(4)]
+        size = tables[0].get_total_buffer_size()
+        store = ResultStore(max_bytes=int(size * 2.5), spill_dir=spill_dir)
+
+        first, second = store.put(tables[0]), store.put(tables[1])
+        store.get(first)  # first becomes the most recently used
+        third = store.put(tables[2])
+        assert spill_files(spill_dir) == {second}
+        fourth = store.put(tables[3])
+
+        assert store.memory_bytes() <= store.max_bytes
+        assert spill_files(spill_dir) == {second, first}
+        for handle, table in zip([first, second, third, fourth], tables):
+            assert store.get(handle).equals(table)
+        assert len(store) == 4 and store.get("unknown") is None
+
+        # The private spill directory goes away with the store
+        del store
+        gc.collect()
+        assert not list(Path(spill_dir).iterdir())
+
+    print("✅ Least recently used tables spilled and read back")
+
+
+def test_spill_budget_expires_oldest():
+    """Spill files over max_spill_bytes are deleted, their handles resolve to None"""
+    print("Testing spill budget...")
+
+    size = make_table(0).get_total_buffer_size()
+    store = ResultStore(max_bytes=size, max_spill_bytes=int(size * 1.5))
+    handles = [store.put(make_table(n * 10_000)) for n in range(4)]
+
+    assert store.get(handles[0]) is None and store.get(handles[1]) is None
+    assert store.get(handles[2]).column("i")[0].as_py() == 20_000
+    assert handles[3] in store
+
+    print("✅ Oldest spilled results expired")
+
+
+def test_summary():
+    """Schema and column stats are computed without converting rows to Python"""
+    print("Testing result summary...")
+
+    table = pa.table({"bu": ["poultry", None, "swine"], "n": [3, 7, None], "ratio": [0.5, 0.25, 1.0]})
+    summary = summarize_table(table)
+
+    assert summary["num_rows"] == 3
+    assert summary["columns"][0] == {"name": "bu", "type": "string", "null_count": 1, "min": None, "max": None}
+    assert summary["columns"][1] == {"name": "n", "type": "int64", "null_count": 1, "min": 3, "max": 7}
+    assert (summary["columns"][2]["min"], summary["columns"][2]["max"]) == (0.25, 1.0)
+
+    print("✅ Summary computed")
+
+
+def test_state_size_and_memory_stay_flat():
+    """execute_sql states stay tiny and the store memory is bounded whatever the result sizes"""
+    print("Testing state size and memory...")
+
+    store = ResultStore(max_bytes=1024 * 1024)
+    execute_sql = create_execute_sql_node(duckdb.connect(), store)
+
+    state_sizes = []
+    for rows in [10, 1_000, 100_000, 1_000_000]:
+        state = execute_sql({"generated_sql": f"SELECT i, 'batch-' || i AS batch_id, random() AS r FROM range({rows}) t(i)"})
+        state_sizes.append(len(pickle.dumps(state)))
+        assert state["result_row_count"] == rows
+        assert store.memory_bytes() <= store.max_bytes
+
+    assert max(state_sizes) < 2048, f"State should only hold a handle and a summary: {state_sizes}"
+
+    print(f"✅ State size {max(state_sizes)} bytes, store memory {store.memory_bytes()} bytes")
+
+
+def main():
+    print("=" * 60)
+    print("Result Store Test Suite")
+    print("=" * 60 + "\n")
+
+    test_lru_spills_to_disk()
+    test_spill_budget_expires_oldest()
+    test_summary()
+    test_state_size_and_memory_stay_flat()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL RESULT STORE TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
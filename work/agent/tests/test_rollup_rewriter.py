@@ -0,0 +1,129 @@
+"""Test rollup query rewriter (aggregate fact queries answered from rollup tables)"""
+
+import sys
+from pathlib import Path
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import initialize_duckdb_connection, load_semantic_layer, available_rollup_tables
+from question_index import load_question_examples
+from rollup_rewriter import RollupRewriter
+from nodes.execute_sql import create_execute_sql_node
+from result_store import ResultStore
+
+
+CONN = initialize_duckdb_connection()
+REWRITER = RollupRewriter(available_rollup_tables())
+
+
+def run(sql: str) -> tuple[list, list]:
+    result = CONN.execute(sql)
+    return [d[0] for d in result.description], sorted(map(str, result.fetchall()))
+
+
+def assert_same_result(sql: str, rollup_sql: str):
+    assert run(rollup_sql) == run(sql), f"Rollup result differs for:\n{sql}\n->\n{rollup_sql}"
+
+
+def test_rollups_available():
+    """The ETL rollup tables are present"""
+    assert available_rollup_tables() == ["agg_batch_monthly", "agg_batch_species"]
+
+
+def test_examples_rewritten_with_same_results():
+    """Aggregate semantic layer examples read a rollup and return identical results"""
+    print("Testing semantic layer examples...")
+
+    rewritten = {}
+    for example in load_question_examples(load_semantic_layer()):
+        rollup_sql, rollup = REWRITER.rewrite(CONN, example["sql"])
+        assert_same_result(example["sql"], rollup_sql)
+        rewritten[example["intent"]] = rollup
+
+    assert rewritten["production_volume_by_bu"] == "agg_batch_monthly"
+    assert rewritten["production_by_site"] == "agg_batch_monthly"
+    assert rewritten["production_timeline"] == "agg_batch_monthly"
+    assert rewritten["production_by_species"] == "agg_batch_species"
+    # Row-level and non re-aggregable queries stay on the fact table
+    assert rewritten["recent_production"] is None
+    assert rewritten["quality_issues"] is None
+
+    print(f"✅ {sum(1 for r in rewritten.values() if r)} of {len(rewritten)} examples answered from rollups")
+
+
+def test_month_grain_filters():
+    """Month-level date expressions are rewritten, day-level ones are not"""
+    print("Testing date filters...")
+
+    sql = """SELECT bu_source, COUNT(*) AS n FROM fact_batch_production
+             WHERE production_date >= DATE '2024-03-01' AND production_date < DATE '2024-07-01'
+             GROUP BY bu_source LIMIT 10"""
+    rollup_sql, rollup = REWRITER.rewrite(CONN, sql)
+    assert rollup == "agg_batch_monthly"
+    assert_same_result(sql, rollup_sql)
+
+    sql = "SELECT year(production_date) AS y, month(production_date) AS m, SUM(quantity_units) FROM fact_batch_production GROUP BY ALL"
+    rollup_sql, rollup = REWRITER.rewrite(CONN, sql)
+    assert rollup == "agg_batch_monthly"
+    assert_same_result(sql, rollup_sql)
+
+    sql = "SELECT COUNT(*) FROM fact_batch_production WHERE production_date >= '2024-03-15'"
+    assert REWRITER.rewrite(CONN, sql)[1] is None
+
+    print("✅ Date filters handled")
+
+
+def test_unsafe_queries_untouched():
+    """Queries a rollup can't answer exactly are not rewritten"""
+    print("Testing unsafe queries...")
+
+    for sql in [
+        "SELECT bu_source, AVG(quantity_doses) FROM fact_batch_production GROUP BY 1",
+        "SELECT batch_id, bu_source FROM fact_batch_production LIMIT 10",
+        "SELECT bu_source, COUNT(*) FROM fact_batch_production WHERE gmp_deviation GROUP BY 1",
+        # Unmatched sites would count 1 on the fact table
+        "SELECT s.site_code, COUNT(*) FROM dim_site s LEFT JOIN fact_batch_production f ON f.site_fk = s.site_sk GROUP BY 1",
+        # A batch targeting a dog and a cat counts once per animal type
+        """SELECT s.animal_type, COUNT(DISTINCT f.batch_id) FROM fact_batch_production f
+           CROSS JOIN UNNEST(f.targeted_species) AS t(specie_fk) JOIN dim_specie s ON t.specie_fk = s.specie_sk
+           GROUP BY 1""",
+    ]:
+        assert REWRITER.rewrite(CONN, sql) == (sql, None), f"Should not be rewritten: {sql}"
+
+    print("✅ Unsafe queries left on the fact table")
+
+
+def test_execute_sql_uses_rollup():
+    """execute_sql returns the same rows through the rewriter"""
+    print("Testing execute_sql with rewriter...")
+
+    sql = "SELECT bu_source, COUNT(*) AS batch_count FROM fact_batch_production GROUP BY bu_source ORDER BY bu_source LIMIT 10"
+    result_store = ResultStore()
+    plain = create_execute_sql_node(CONN, result_store)({"generated_sql": sql})
+    rolled = create_execute_sql_node(CONN, result_store, query_rewriter=REWRITER)({"generated_sql": sql})
+
+    assert result_store.get(rolled["result_handle"]).equals(result_store.get(plain["result_handle"]))
+    assert rolled["result_columns"] == plain["result_columns"] == ["bu_source", "batch_count"]
+
+    print("✅ execute_sql answers from rollups transparently")
+
+
+def main():
+    print("=" * 60)
+    print("Rollup Rewriter Test Suite")
+    print("=" * 60 + "\n")
+
+    test_rollups_available()
+    test_examples_rewritten_with_same_results()
+    test_month_grain_filters()
+    test_unsafe_queries_untouched()
+    test_execute_sql_uses_rollup()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL ROLLUP REWRITER TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
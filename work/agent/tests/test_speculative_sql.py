@@ -0,0 +1,158 @@
+"""Test speculative SQL generation (parallel candidates, validate + EXPLAIN, first passing wins)"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, arun_agent, get_query_results, run_agent
+from llm_budget import remaining_budget
+from stub_llm import DEFAULT_CODE
+
+
+GOOD_SQL = "SELECT bu_source, COUNT(*) AS batch_count FROM fact_batch_production GROUP BY bu_source LIMIT 10"
+FILE_READ_SQL = "SELECT * FROM read_csv('/etc/passwd') LIMIT 10"
+BAD_COLUMN_SQL = "SELECT no_such_column FROM fact_batch_production LIMIT 10"
+
+
+class ScriptedLLM:
+    """Returns scripted SQL answers (answer, latency) in call order, viz code for viz prompts
+
+    Counts SQL calls in flight (max_in_flight) and finished (cancelled calls never finish).
+    """
+
+    def __init__(self, script: list[tuple[str, float]]):
+        self.script = list(script)
+        self.sql_calls = 0
+        self.budgets = []  # remaining_budget() seen by each SQL call
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.finished = 0
+        self.lock = threading.Lock()
+
+    def _next(self, prompt):
+        if "render_visualization" in prompt:
+            return DEFAULT_CODE, 0.0
+        with self.lock:
+            answer = self.script[self.sql_calls % len(self.script)]
+            self.sql_calls += 1
+            self.budgets.append(remaining_budget())
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        return answer
+
+    def _done(self, prompt, finished: bool) -> None:
+        if "render_visualization" in prompt:
+            return
+        with self.lock:
+            self.in_flight -= 1
+            self.finished += finished
+
+    def invoke(self, prompt, config=None, **kwargs):
+        content, latency = self._next(prompt)
+        finished = False
+        try:
+            time.sleep(latency)
+            finished = True
+        finally:
+            self._done(prompt, finished)
+        return AIMessage(content=content)
+
+    async def ainvoke(self, prompt, config=None, **kwargs):
+        content, latency = self._next(prompt)
+        finished = False
+        try:
+            await asyncio.sleep(latency)
+            finished = True
+        finally:
+            self._done(prompt, finished)
+        return AIMessage(content=content)
+
+
+def test_first_passing_candidate_is_executed():
+    """Invalid and unbindable candidates are skipped without a retry round-trip"""
+    print("Testing speculative candidates...")
+
+    llm = ScriptedLLM([(FILE_READ_SQL, 0.1), (BAD_COLUMN_SQL, 0.1), (GOOD_SQL, 0.2)])
+    app = build_agent(llm=llm, sql_candidates=3)
+
+    result = run_agent("How many batches per BU?", app)
+
+    assert result["generated_sql"] == GOOD_SQL
+    assert result["retry_count"] == 0
+    assert len(get_query_results(result)) == 3
+    assert llm.sql_calls == 3
+    # One round of parallel calls, not three in sequence
+    assert llm.max_in_flight == 3, f"Candidates were not generated in parallel: {llm.max_in_flight} in flight"
+
+    print(f"✅ Passing candidate executed ({llm.max_in_flight} candidates in flight)")
+
+
+def test_fastest_passing_candidate_wins():
+    """Slow candidates are not waited for once one has passed"""
+    print("Testing early exit...")
+
+    llm = ScriptedLLM([(GOOD_SQL, 0.0), (GOOD_SQL, 30.0), (GOOD_SQL, 30.0)])
+    app = build_agent(llm=llm, sql_candidates=3)
+
+    result = asyncio.run(arun_agent("How many batches per BU?", app))
+
+    assert result["generated_sql"] == GOOD_SQL
+    assert llm.sql_calls == 3
+    assert llm.finished == 1, "Slow candidates should be cancelled, not waited for"
+    assert llm.in_flight == 0
+
+    print("✅ Fastest candidate used, slow ones cancelled")
+
+
+def test_all_candidates_fail_falls_back_to_retry():
+    """When no candidate passes, the validation error drives the usual retry loop"""
+    print("Testing retry when all candidates fail...")
+
+    llm = ScriptedLLM([(FILE_READ_SQL, 0.0), (FILE_READ_SQL, 0.0), (GOOD_SQL, 0.0), (GOOD_SQL, 0.0)])
+    app = build_agent(llm=llm, sql_candidates=2)
+    result = run_agent("How many batches per BU?", app)
+
+    assert result["generated_sql"] == GOOD_SQL
+    assert result["retry_count"] == 1
+    assert llm.sql_calls == 4
+
+    print("✅ Falls back to a new round of candidates")
+
+
+def test_candidates_see_request_budget():
+    """Candidate calls run in worker threads with the caller's context (LLM request budget)"""
+    print("Testing request budget in candidate threads...")
+
+    llm = ScriptedLLM([(GOOD_SQL, 0.0)] * 3)
+    run_agent("How many batches per BU?", build_agent(llm=llm, sql_candidates=3))
+
+    assert len(llm.budgets) == 3
+    assert all(budget is not None and budget > 0 for budget in llm.budgets), llm.budgets
+
+    print("✅ Every candidate call sees the request budget")
+
+
+def main():
+    print("=" * 60)
+    print("Speculative SQL Test Suite")
+    print("=" * 60 + "\n")
+
+    test_first_passing_candidate_is_executed()
+    test_fastest_passing_candidate_wins()
+    test_all_candidates_fail_falls_back_to_retry()
+    test_candidates_see_request_budget()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL SPECULATIVE SQL TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
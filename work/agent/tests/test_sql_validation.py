@@ -0,0 +1,183 @@
+"""Test parser-based SQL validation (statement type, table allow-list, LIMIT, binder errors, cost guard)"""
+
+import json
+import sys
+from pathlib import Path
+
+from langchain_core.messages import AIMessage
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import ROLLUP_TABLES, STAR_SCHEMA_TABLES, build_agent, initialize_duckdb_connection, run_agent
+from cursor_pool import CursorPool
+from nodes.validate_sql import DEFAULT_LIMIT, create_validate_sql_node, estimate_cost
+from stub_llm import DEFAULT_CODE, DEFAULT_SQL
+
+
+ALLOWED_TABLES = STAR_SCHEMA_TABLES + ROLLUP_TABLES
+VALIDATE_SQL = create_validate_sql_node(ALLOWED_TABLES)
+
+
+def error_of(sql: str, validate_sql=VALIDATE_SQL) -> str:
+    return validate_sql({"generated_sql": sql})["validation_error"]
+
+
+def test_keywords_in_queries_pass():
+    """Keywords in literals, aliases, comments or functions are not statements"""
+    print("Testing legitimate queries...")
+
+    for sql in [
+        "SELECT replace(product_name, 'Vax', 'Vaccine') AS product FROM dim_product LIMIT 50",
+        "SELECT batch_id FROM fact_batch_production WHERE destination_market = 'update pending' LIMIT 10",
+        "SELECT * REPLACE (upper(country) AS country) FROM dim_site LIMIT 20",
+        "-- don't DELETE this comment\nSELECT COUNT(*) AS created FROM fact_batch_production LIMIT 1",
+        "WITH recent AS (SELECT * FROM fact_batch_production) SELECT batch_id FROM recent LIMIT 5",
+        "SELECT t.specie_fk, COUNT(*) FROM fact_batch_production f, UNNEST(f.targeted_species) AS t(specie_fk) GROUP BY 1 LIMIT 10",
+        "SELECT bu_source FROM dim_product UNION SELECT bu_source FROM dim_site LIMIT 10",
+    ]:
+        assert error_of(sql) == "", f"Should pass: {sql} ({error_of(sql)})"
+
+    print("✅ Legitimate queries pass")
+
+
+def test_unsafe_queries_rejected():
+    """Non-SELECT statements, stacked statements, file reads and system tables are rejected"""
+    print("Testing unsafe queries...")
+
+    cases = [
+        ("DROP TABLE fact_batch_production", "must be a SELECT"),
+        ("COPY dim_site TO '/tmp/sites.csv'", "must be a SELECT"),
+        ("SELECT 1 LIMIT 1; DROP TABLE dim_site", "must be a SELECT"),
+        ("SELECT 1 LIMIT 1; SELECT 2 LIMIT 1", "Only one SQL statement"),
+        ("SELEC batch_id FROM fact_batch_production LIMIT 1", "syntax error"),
+        ("SELECT * FROM read_csv('/etc/passwd') LIMIT 10", "read_csv() is not allowed"),
+        ("SELECT (SELECT COUNT(*) FROM glob('/root/*')) AS n LIMIT 1", "glob() is not allowed"),
+        ("SELECT * FROM '/etc/passwd' LIMIT 10", "Unknown table: /etc/passwd"),
+        ("SELECT * FROM information_schema.tables LIMIT 10", "Unknown table: information_schema.tables"),
+        ("DESCRIBE fact_batch_production", "SHOW_REF is not allowed"),
+    ]
+    for sql, expected in cases:
+        assert expected in error_of(sql), f"{sql}: {error_of(sql)!r}"
+
+    print("✅ Unsafe queries rejected")
+
+
+def test_limit_semantics():
+    """The top-level LIMIT must be a constant integer <= MAX_LIMIT"""
+    print("Testing LIMIT checks...")
+
+    no_limit = create_validate_sql_node(ALLOWED_TABLES, default_limit=None)
+    assert "must include a LIMIT" in error_of("SELECT batch_id FROM fact_batch_production", no_limit)
+    assert "must include a LIMIT" in error_of("SELECT * FROM (SELECT batch_id FROM fact_batch_production LIMIT 5) JOIN dim_site ON true", no_limit)
+    assert "exceeds maximum" in error_of("SELECT batch_id FROM fact_batch_production LIMIT 50000")
+    assert "constant integer" in error_of("SELECT batch_id FROM fact_batch_production LIMIT 10.5")
+    assert "percentage" in error_of("SELECT batch_id FROM fact_batch_production LIMIT 10%")
+    assert error_of("SELECT batch_id FROM fact_batch_production ORDER BY 1 LIMIT 10 OFFSET 20") == ""
+
+    print("✅ LIMIT checked on the parse tree")
+
+
+def test_missing_limit_injected():
+    """A query without top-level LIMIT gets the default one instead of a validation error"""
+    print("Testing LIMIT injection...")
+
+    for sql in [
+        "SELECT batch_id FROM fact_batch_production;",
+        "SELECT bu_source FROM dim_product UNION SELECT bu_source FROM dim_site ORDER BY 1 -- all BUs",
+        "SELECT * FROM (SELECT batch_id FROM fact_batch_production LIMIT 5) JOIN dim_site ON true",
+    ]:
+        state = VALIDATE_SQL({"generated_sql": sql})
+        assert state["sql_valid"], f"{sql}: {state['validation_error']}"
+        assert state["generated_sql"].endswith(f"\nLIMIT {DEFAULT_LIMIT}")
+        assert initialize_duckdb_connection().execute(state["generated_sql"]).fetchall()
+
+    # Unsafe queries are still rejected, not patched
+    assert "must be a SELECT" in error_of("DROP TABLE dim_site")
+    assert "read_csv() is not allowed" in error_of("SELECT * FROM read_csv('/etc/passwd')")
+
+    print("✅ Missing LIMIT added without a retry")
+
+
+def test_binder_errors_caught():
+    """With a cursor pool, queries are bound with EXPLAIN before execution"""
+    print("Testing binder errors...")
+
+    validate_sql = create_validate_sql_node(ALLOWED_TABLES, CursorPool(initialize_duckdb_connection(), size=1))
+
+    assert "Referenced column" in error_of("SELECT batch_number FROM fact_batch_production LIMIT 10", validate_sql)
+    assert "GROUP BY" in error_of("SELECT product_name, COUNT(*) FROM dim_product LIMIT 10", validate_sql)
+    assert error_of(DEFAULT_SQL, validate_sql) == ""
+
+    print("✅ Binder errors reported as validation errors")
+
+
+class SequenceLLM:
+    """Answers SQL prompts with the given queries in order, viz prompts with stub code"""
+
+    def __init__(self, queries: list[str]):
+        self.queries = list(queries)
+
+    def invoke(self, prompt, config=None, **kwargs):
+        if "render_visualization" in str(prompt):
+            return AIMessage(content=DEFAULT_CODE)
+        return AIMessage(content=self.queries.pop(0))
+
+
+def test_cost_guard():
+    """Plans whose estimated rows or scanned bytes exceed the budgets are rejected"""
+    print("Testing cost guard...")
+
+    cursor_pool = CursorPool(initialize_duckdb_connection(), size=1)
+    cross_join = "SELECT COUNT(*) FROM fact_batch_production a, fact_batch_production b, fact_batch_production c LIMIT 1"
+    wide_scan = "SELECT * FROM fact_batch_production LIMIT 10"
+
+    row_budget = create_validate_sql_node(ALLOWED_TABLES, cursor_pool, max_rows=100_000)
+    assert "too large" in error_of(cross_join, row_budget)
+    assert error_of(DEFAULT_SQL, row_budget) == ""
+
+    # Estimates depend on the storage (DuckDB file or Parquet), so the budget is set from a one-column scan
+    narrow_scan = "SELECT bu_source FROM fact_batch_production GROUP BY 1 LIMIT 10"
+    with cursor_pool.acquire() as cursor:
+        plan = json.loads(cursor.execute(f"EXPLAIN (FORMAT json) {narrow_scan}").fetchone()[1])
+    byte_budget = create_validate_sql_node(ALLOWED_TABLES, cursor_pool, max_scan_bytes=2 * estimate_cost(plan)["scan_bytes"])
+    assert "scans too much data" in error_of(wide_scan, byte_budget)
+    assert error_of(narrow_scan, byte_budget) == ""
+
+    print("✅ Runaway plans rejected before execution")
+
+
+def test_binder_error_is_retried():
+    """A query that would fail at execution goes back to generate_sql with the error"""
+    print("Testing retry on binder error...")
+
+    app = build_agent(llm=SequenceLLM(["SELECT batch_number FROM fact_batch_production LIMIT 10", DEFAULT_SQL]))
+    result = run_agent("How many batches per BU?", app)
+
+    assert result["generated_sql"] == DEFAULT_SQL
+    assert result["retry_count"] == 1
+    assert not result["execution_error"]
+
+    print("✅ Binder error retried instead of failing at execution")
+
+
+def main():
+    print("=" * 60)
+    print("SQL Validation Test Suite")
+    print("=" * 60 + "\n")
+
+    test_keywords_in_queries_pass()
+    test_unsafe_queries_rejected()
+    test_limit_semantics()
+    test_missing_limit_injected()
+    test_binder_errors_caught()
+    test_cost_guard()
+    test_binder_error_is_retried()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL SQL VALIDATION TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Test streaming mode (stream_agent yields tokens, node transitions and final state)"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+
+# Add agent directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from agent import build_agent, get_query_results, stream_agent
+from answer_cache import AnswerCache
+
+
+SQL = "SELECT bu_source, COUNT(*) AS batch_count FROM fact_batch_production GROUP BY bu_source LIMIT 10"
+
+VIZ_CODE = '''def render_visualization(viz_type: str, columns: list, rows: list):
+    import pandas as pd
+    import streamlit as st
+
+    df = pd.DataFrame(rows, columns=columns)
+    st.dataframe(df)
+'''
+
+
+def make_streaming_llm() -> GenericFakeChatModel:
+    """Fake chat model that streams its answers token by token"""
+    return GenericFakeChatModel(messages=iter([AIMessage(content=SQL), AIMessage(content=VIZ_CODE)]))
+
+
+def test_stream_yields_tokens_nodes_and_result():
+    """SQL tokens arrive before the query runs, result is the last event"""
+    print("Testing stream_agent events...")
+
+    app = build_agent(llm=make_streaming_llm())
+    events = list(stream_agent("How many batches per BU?", app))
+
+    sql_tokens = [e["text"] for e in events if e["type"] == "token" and e["node"] == "generate_sql"]
+    nodes = [e["node"] for e in events if e["type"] == "node"]
+
+    assert len(sql_tokens) > 1, "SQL should be streamed in several chunks"
+    assert "".join(sql_tokens) == SQL
+    assert nodes == ["generate_sql", "validate_sql", "execute_sql", "generate_streamlit_views"]
+
+    # First SQL token comes before the execute_sql transition
+    first_token = next(i for i, e in enumerate(events) if e["type"] == "token")
+    execute_done = next(i for i, e in enumerate(events) if e["type"] == "node" and e["node"] == "execute_sql")
+    assert first_token < execute_done
+
+    assert events[-1]["type"] == "result"
+    result = events[-1]["state"]
+    assert result["generated_sql"] == SQL
+    assert len(get_query_results(result)) == 3
+    assert "def render_visualization" in result["streamlit_code"]
+
+    print(f"✅ Streamed {len(sql_tokens)} SQL tokens and {len(nodes)} node transitions")
+
+
+def test_stream_cache_hit():
+    """A cached answer is streamed as a single result event"""
+    print("Testing stream_agent with answer cache...")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_file = Path(tmp_dir) / "data.parquet"
+        data_file.write_bytes(b"v1")
+        cache = AnswerCache(Path(tmp_dir) / "cache.sqlite", [data_file])
+
+        app = build_agent(llm=make_streaming_llm())
+        first = list(stream_agent("How many batches per BU?", app, answer_cache=cache))
+        second = list(stream_agent("how many batches per bu", app, answer_cache=cache))
+
+        assert first[-1]["type"] == "result"
+        assert len(second) == 1 and second[0]["type"] == "result"
+        assert second[0]["state"]["from_cache"] is True
+        assert second[0]["state"]["generated_sql"] == SQL
+
+    print("✅ Cache hits are streamed immediately")
+
+
+def main():
+    print("=" * 60)
+    print("Streaming Test Suite")
+    print("=" * 60 + "\n")
+
+    test_stream_yields_tokens_nodes_and_result()
+    test_stream_cache_hit()
+
+    print("\n" + "=" * 60)
+    print("✅ ALL STREAMING TESTS PASSED")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,14 @@ import sys
 from pathlib import Path
 from unittest.mock import Mock, patch
 
+import pyarrow as pa
+
 # Add agent directory to path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from nodes.generate_sql import create_generate_sql_node
 from nodes.generate_streamlit_views import create_generate_streamlit_views_node, generate_safe_table_fallback
+from result_store import ResultStore
 
 
 def test_generate_sql_timeout_handling():
@@ -91,16 +94,18 @@ def test_generate_streamlit_views_timeout_handling():
     mock_llm.invoke.side_effect = TimeoutError("Request timed out after 60 seconds")
 
     # Create the node
+    result_store = ResultStore()
     generate_viz = create_generate_streamlit_views_node(
         mock_llm,
-        viz_guidelines="Test guidelines"
+        viz_guidelines="Test guidelines",
+        result_store=result_store,
     )
 
     # Create initial state with sample data
     state = {
         "question": "Test question",
         "generated_sql": "SELECT * FROM test",
-        "query_results": [("row1", 1), ("row2", 2)],
+        "result_handle": result_store.put(pa.table({"name": ["row1", "row2"], "value": [1, 2]})),
         "result_columns": ["name", "value"],
         "streamlit_code": "",
     }
@@ -135,20 +135,23 @@ def test_timeout_behavior_generate_viz():
     print("\nTesting generate_streamlit_views timeout behavior...")
 
     from unittest.mock import Mock
+    import pyarrow as pa
     from nodes.generate_streamlit_views import create_generate_streamlit_views_node
+    from result_store import ResultStore
 
     # Create mock LLM that times out
     mock_llm = Mock()
     mock_llm.invoke.side_effect = TimeoutError("Test timeout")
 
     # Create node
-    generate_viz = create_generate_streamlit_views_node(mock_llm, "guidelines")
+    result_store = ResultStore()
+    generate_viz = create_generate_streamlit_views_node(mock_llm, "guidelines", result_store)
 
     # Test state
     state = {
         "question": "Test",
         "generated_sql": "SELECT 1",
-        "query_results": [("test", 1)],
+        "result_handle": result_store.put(pa.table({"name": ["test"], "value": [1]})),
         "result_columns": ["name", "value"],
         "streamlit_code": "",
     }
@@ -0,0 +1,118 @@
+"""Species key resolution benchmark - map_elements lambdas vs vectorized join
+
+Resolves species codes to specie_sk lists on synthetic rows (scalar codes like
+poultry/ruminants, code lists like companion). Each variant runs in its own
+process so peak RSS is measured separately.
+
+Usage:
+    python benchmarks/species_resolution_bench.py [--rows 2000000]
+"""
+
+import argparse
+import multiprocessing
+import resource
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+
+# Add scripts directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from etl_to_star_schema import resolve_species_keys
+
+
+SPECIES = ["cat", "dog", "chicken", "duck", "turkey", "bovine", "caprine", "ovine"]
+
+
+def make_dim_specie() -> pl.DataFrame:
+    return pl.DataFrame({"specie_code": SPECIES}).with_row_index(name="specie_sk", offset=1)
+
+
+def make_rows(rows: int, as_list: bool) -> pl.DataFrame:
+    """Synthetic batches; one code in 50 is unknown"""
+    codes = SPECIES + ["unknown"] * (len(SPECIES) // 8 or 1)
+    df = pl.DataFrame({"batch_id": pl.int_range(rows, eager=True)}).with_columns(
+        pl.col("batch_id").mod(len(codes)).map_batches(
+            lambda s: s.replace_strict(list(range(len(codes))), codes, return_dtype=pl.String)
+        ).alias("target_species")
+    )
+    if as_list:
+        # Companion-style: 1 or 2 species per batch
+        df = df.with_columns(
+            pl.when(pl.col("batch_id") % 2 == 0)
+            .then(pl.concat_list(pl.col("target_species"), pl.lit("dog")))
+            .otherwise(pl.concat_list(pl.col("target_species")))
+            .alias("target_species")
+        )
+    return df
+
+
+def resolve_with_map_elements(df: pl.DataFrame, dim_specie: pl.DataFrame) -> pl.DataFrame:
+    """Previous implementation: per-row Python lambda over a lookup dict"""
+    species_lookup = dict(zip(dim_specie["specie_code"], dim_specie["specie_sk"]))
+    if df.schema["target_species"] == pl.List(pl.String):
+        function = lambda arr: [species_lookup[s] for s in arr if s in species_lookup]
+    else:
+        function = lambda x: [species_lookup[x]] if x in species_lookup else []
+    return df.with_columns(
+        pl.col("target_species").map_elements(function, return_dtype=pl.List(pl.Int64)).alias("targeted_species")
+    )
+
+
+VARIANTS = {"map_elements": resolve_with_map_elements, "vectorized": resolve_species_keys}
+
+
+def max_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_variant(variant: str, rows: int, as_list: bool) -> dict:
+    """Run one variant (in a fresh process), return time and memory"""
+    dim_specie = make_dim_specie()
+    df = make_rows(rows, as_list)
+    rss_before = max_rss_mb()
+
+    start = time.perf_counter()
+    result = VARIANTS[variant](df, dim_specie)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "seconds": elapsed,
+        "peak_rss_mb": max_rss_mb(),
+        "extra_rss_mb": max_rss_mb() - rss_before,
+        "checksum": result["targeted_species"].list.sum().sum(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000, help="Synthetic rows per run")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+
+    print(f"Species resolution: {args.rows:,} rows, Polars {pl.__version__}")
+    print("=" * 72)
+    print(f"{'input':>12} | {'variant':>12} | {'time (s)':>9} | {'rows/s':>12} | {'peak RSS':>9} | {'+RSS':>8}")
+
+    for as_list in (False, True):
+        results = {}
+        for variant in VARIANTS:
+            with context.Pool(1) as pool:
+                results[variant] = pool.apply(run_variant, (variant, args.rows, as_list))
+
+        assert results["map_elements"]["checksum"] == results["vectorized"]["checksum"], "Results differ"
+
+        for variant, r in results.items():
+            print(
+                f"{'code list' if as_list else 'code':>12} | {variant:>12} | {r['seconds']:>9.2f} | "
+                f"{args.rows / r['seconds']:>12,.0f} | {r['peak_rss_mb']:>7.0f}MB | {r['extra_rss_mb']:>6.0f}MB"
+            )
+        speedup = results["map_elements"]["seconds"] / results["vectorized"]["seconds"]
+        print(f"{'':>12} | {'speedup':>12} | {speedup:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
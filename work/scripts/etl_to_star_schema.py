@@ -1,14 +1,77 @@
 """
 ELT Script: Transform CEVA Animal Health source data into star schema
-Outputs 4 parquet files: dim_product, dim_specie, dim_site, fact_batch_production
+Outputs dim_product, dim_specie, dim_site parquet files, fact_batch_production
+as hive partitions (bu_source / year / month) + rollup tables (agg_batch_monthly, agg_batch_species) used by the agent query rewriter
+
+The pipeline is a Polars LazyFrame graph run on the streaming engine: sources
+are scanned, the fact table is streamed to parquet (sink_parquet) and rollups
+are computed from the written fact file. Wall time and peak RSS are reported
+per stage.
+
+The star schema is also loaded into native tables of a DuckDB database file
+(star_schema.duckdb), which the agent opens read-only when it exists.
+
+Usage:
+    python etl_to_star_schema.py                 # full rebuild
+    python etl_to_star_schema.py --incremental   # only batches newer than the last run
+    python etl_to_star_schema.py --no-duckdb     # parquet files only
 """
-import polars as pl
+import argparse
+import json
+import os
+import resource
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date
 from pathlib import Path
 
+import duckdb
+import polars as pl
+
 # Paths
 BASE_DIR = Path(__file__).parent.parent
 SOURCES_DIR = BASE_DIR / "data" / "a-sources"
 OUTPUT_DIR = BASE_DIR / "data" / "b-silver-star-schema"
+STATE_PATH = OUTPUT_DIR / "_etl_state.json"
+DATABASE_PATH = OUTPUT_DIR / "star_schema.duckdb"
+
+FACT_TABLE = "fact_batch_production"
+
+# Fact layout: <table>/bu_source=<bu>/year=<yyyy>/month=<m>/part-<part>.parquet
+# (bu_source is also kept in the files). Rows are sorted by production_date in
+# each file, so row group min/max statistics let DuckDB skip dates as well as
+# whole partitions.
+FACT_PARTITION_KEYS = {
+    "bu_source": pl.col("bu_source"),
+    "year": pl.col("production_date").dt.year(),
+    "month": pl.col("production_date").dt.month(),
+}
+FACT_PARQUET_OPTIONS = {
+    "compression": "zstd",
+    "compression_level": 3,
+    "row_group_size": 122_880,  # DuckDB's row group size: one scan task per row group
+    "statistics": "full",
+}
+
+# Rollup tables receive incremental parts: <table>-<part>.parquet
+ROLLUP_TABLES = ["agg_batch_monthly", "agg_batch_species"]
+
+# Primary keys of the DuckDB tables (rollups have none)
+PRIMARY_KEYS = {
+    "dim_product": "product_sk",
+    "dim_specie": "specie_sk",
+    "dim_site": "site_sk",
+    FACT_TABLE: "batch_production_sk",
+}
+
+# High-water mark columns per source: (date, batch id), compared as ISO strings
+HIGH_WATER_COLUMNS = {
+    "poultry": ("production_date", "batch_id"),
+    "ruminants": ("manufacturing_date", "lot_number"),
+    "companion": ("produced_at", "batch_id"),
+}
 
 # Mappings
 ANIMAL_TYPE_MAP = {
@@ -22,26 +85,70 @@ REGION_MAP = {
     'US': 'North America', 'CN': 'Asia'
 }
 
+# Polars engine for every collect / sink
+ENGINE = "streaming"
+
+# (stage, seconds, peak RSS in MB) of the current run
+STAGES = []
+
+
+def reset_peak_rss():
+    """Reset the process peak RSS (Linux only), so each stage reports its own peak"""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    """Peak RSS since the last reset (Linux) or since process start"""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is in bytes on macOS, kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+@contextmanager
+def stage(name):
+    """Record wall time and peak RSS of a pipeline stage"""
+    reset_peak_rss()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGES.append((name, time.perf_counter() - start, peak_rss_mb()))
+
+
+def report_stages():
+    print("\nSTAGES:")
+    for name, seconds, rss in STAGES:
+        print(f"  {name:<12} {seconds:>8.2f}s  peak RSS {rss:>8.1f} MB")
+
 
 def extract_sources():
-    """Load 3 source files"""
-    print("EXTRACT: Loading sources...")
+    """Scan 3 source files (LazyFrames, nothing is read yet)"""
+    print("EXTRACT: Scanning sources...")
 
     # Poultry CSV
-    poultry = pl.read_csv(SOURCES_DIR / "bu_poultry_production.csv")
-    print(f"  Poultry: {len(poultry)} rows")
+    poultry = pl.scan_csv(SOURCES_DIR / "bu_poultry_production.csv")
+    print(f"  Poultry: {len(poultry.collect_schema())} columns")
 
     # Ruminants CSV
-    ruminants = pl.read_csv(SOURCES_DIR / "bu_ruminants_production.csv")
-    print(f"  Ruminants: {len(ruminants)} rows")
+    ruminants = pl.scan_csv(SOURCES_DIR / "bu_ruminants_production.csv")
+    print(f"  Ruminants: {len(ruminants.collect_schema())} columns")
 
-    # Companion JSON
+    # Companion JSON: a single document (not NDJSON), so it is read eagerly.
+    # It is the small catalog export, the large sources are the CSVs.
     companion_json = pl.read_json(SOURCES_DIR / "bu_companion_catalog.json")
     companion_products = companion_json.select(pl.col("products")).explode("products").unnest("products")
     companion_batches = companion_json.select(pl.col("recent_batches")).explode("recent_batches").unnest("recent_batches")
     print(f"  Companion: {len(companion_products)} products, {len(companion_batches)} batches")
 
-    return poultry, ruminants, companion_products, companion_batches
+    return poultry, ruminants, companion_products.lazy(), companion_batches.lazy()
 
 
 def build_dim_specie(poultry, ruminants, companion_products):
@@ -80,7 +187,6 @@ def build_dim_specie(poultry, ruminants, companion_products):
     # Reorder columns
     dim_specie = dim_specie.select(["specie_sk", "specie_code", "specie_name", "animal_type", "bu_source"])
 
-    print(f"  Created {len(dim_specie)} species")
     return dim_specie
 
 
@@ -101,7 +207,7 @@ def build_dim_product(poultry, ruminants, companion_products):
         pl.lit(None, dtype=pl.Float64).alias("dose_ml"),
         pl.lit(None, dtype=pl.Float64).alias("unit_volume_ml"),
         pl.lit("poultry").alias("bu_source")
-    ]).unique(subset=["product_code"])
+    ]).unique(subset=["product_code"], keep="first")
 
     # Normalize Ruminants products
     ruminants_products = ruminants.select([
@@ -116,7 +222,7 @@ def build_dim_product(poultry, ruminants, companion_products):
         pl.lit(None, dtype=pl.Float64).alias("dose_ml"),
         pl.col("unit_volume_ml"),
         pl.lit("ruminants").alias("bu_source")
-    ]).unique(subset=["product_code"])
+    ]).unique(subset=["product_code"], keep="first")
 
     # Normalize Companion products (unnest storage_requirements)
     companion_products_norm = companion_products.select([
@@ -149,7 +255,6 @@ def build_dim_product(poultry, ruminants, companion_products):
         "form", "temp_min_c", "temp_max_c", "light_sensitive", "dose_ml", "unit_volume_ml", "bu_source"
     ])
 
-    print(f"  Created {len(dim_product)} products")
     return dim_product
 
 
@@ -168,8 +273,8 @@ def build_dim_site(poultry, ruminants):
         pl.lit("ruminants").alias("bu_source")
     ]).unique()
 
-    # Union sites
-    all_sites = pl.concat([poultry_sites, ruminants_sites]).unique(subset=["site_code"])
+    # Union sites (a site shared by both BUs keeps its poultry row)
+    all_sites = pl.concat([poultry_sites, ruminants_sites]).unique(subset=["site_code"], keep="first", maintain_order=True)
 
     # Extract country from site_code
     dim_site = all_sites.with_columns([
@@ -187,17 +292,41 @@ def build_dim_site(poultry, ruminants):
     # Reorder columns
     dim_site = dim_site.select(["site_sk", "site_code", "country", "region", "bu_source"])
 
-    print(f"  Created {len(dim_site)} sites")
     return dim_site
 
 
+def resolve_species_keys(df, dim_specie, column="target_species"):
+    """Add targeted_species: list of specie_sk for the species code(s) in `column`
+
+    Vectorized: codes (a string or a list of strings per row) are exploded,
+    joined to dim_specie and re-aggregated per row. Unknown codes are dropped,
+    rows without a known species get an empty list. Returns a LazyFrame.
+    """
+    codes = pl.col(column)
+    if df.collect_schema()[column] != pl.List(pl.String):
+        codes = pl.concat_list(codes)
+
+    df = df.lazy().with_row_index("_row")
+    keys = (
+        df.select("_row", codes.alias("specie_code"))
+        .explode("specie_code")
+        .join(dim_specie.lazy().select("specie_code", pl.col("specie_sk").cast(pl.Int64)), on="specie_code", how="inner")
+        .group_by("_row")
+        .agg(pl.col("specie_sk").alias("targeted_species"))
+    )
+
+    return (
+        df.join(keys, on="_row", how="left")
+        .sort("_row")
+        .with_columns(pl.col("targeted_species").fill_null(pl.lit([], dtype=pl.List(pl.Int64))))
+        .drop("_row")
+    )
+
+
 def build_fact_batch_production(poultry, ruminants, companion_products, companion_batches, dim_product, dim_specie, dim_site):
     """Build fact_batch_production from 3 sources"""
     print("\nTRANSFORM: Building fact_batch_production...")
 
-    # Create species lookup dict
-    species_lookup = dict(zip(dim_specie["specie_code"], dim_specie["specie_sk"]))
-
     # Normalize Poultry batches
     fact_poultry = poultry.select([
         pl.col("batch_id"),
@@ -216,12 +345,7 @@ def build_fact_batch_production(poultry, ruminants, companion_products, companio
     ])
 
     # Convert target_species to array
-    fact_poultry = fact_poultry.with_columns(
-        pl.col("target_species").map_elements(
-            lambda x: [species_lookup[x]] if x in species_lookup else [],
-            return_dtype=pl.List(pl.Int64)
-        ).alias("targeted_species")
-    )
+    fact_poultry = resolve_species_keys(fact_poultry, dim_specie)
 
     # Normalize Ruminants batches
     fact_ruminants = ruminants.select([
@@ -241,12 +365,7 @@ def build_fact_batch_production(poultry, ruminants, companion_products, companio
     ])
 
     # Convert target_species to array
-    fact_ruminants = fact_ruminants.with_columns(
-        pl.col("target_species").map_elements(
-            lambda x: [species_lookup[x]] if x in species_lookup else [],
-            return_dtype=pl.List(pl.Int64)
-        ).alias("targeted_species")
-    )
+    fact_ruminants = resolve_species_keys(fact_ruminants, dim_specie)
 
     # Normalize Companion batches (need to join with products for target_species)
     companion_batches_with_species = companion_batches.join(
@@ -273,12 +392,7 @@ def build_fact_batch_production(poultry, ruminants, companion_products, companio
     ])
 
     # Convert target_species array to targeted_species
-    fact_companion = fact_companion.with_columns(
-        pl.col("target_species").map_elements(
-            lambda arr: [species_lookup[s] for s in arr if s in species_lookup],
-            return_dtype=pl.List(pl.Int64)
-        ).alias("targeted_species")
-    )
+    fact_companion = resolve_species_keys(fact_companion, dim_specie)
 
     # Union all facts
     fact = pl.concat([
@@ -289,14 +403,14 @@ def build_fact_batch_production(poultry, ruminants, companion_products, companio
 
     # Lookup product_fk
     fact = fact.join(
-        dim_product.select(["product_sk", "product_code"]),
+        dim_product.lazy().select(["product_sk", "product_code"]),
         on="product_code",
         how="left"
     ).rename({"product_sk": "product_fk"})
 
     # Lookup site_fk (left join - companion has NULL)
     fact = fact.join(
-        dim_site.select(["site_sk", "site_code"]),
+        dim_site.lazy().select(["site_sk", "site_code"]),
         on="site_code",
         how="left"
     ).rename({"site_sk": "site_fk"})
@@ -312,50 +426,370 @@ def build_fact_batch_production(poultry, ruminants, companion_products, companio
         "gmp_deviation", "destination_market", "bu_source", "targeted_species"
     ])
 
-    print(f"  Created {len(fact)} batches")
     return fact
 
 
-def load_parquet(dim_product, dim_specie, dim_site, fact):
-    """Write 4 parquet files"""
-    print("\nLOAD: Writing parquet files...")
+def sum_or_null(column: str) -> pl.Expr:
+    """SUM with SQL semantics (NULL when the group has no value)"""
+    return pl.when(pl.col(column).count() > 0).then(pl.col(column).sum()).otherwise(None)
+
+
+def build_rollups(fact):
+    """Build rollup tables: batches and quantities pre-aggregated per month
+
+    agg_batch_monthly: bu_source x production_month x site x status
+    agg_batch_species: same grain x product x targeted species (pre-unnested)
+    production_month is the first day of the month, so month-level date
+    expressions give the same result as on the fact table.
+    """
+    monthly_dims = ["bu_source", "production_month", "site_fk", "batch_status"]
+    measures = [
+        pl.len().alias("n_batches"),
+        sum_or_null("quantity_doses").alias("sum_quantity_doses"),
+        sum_or_null("quantity_units").alias("sum_quantity_units"),
+    ]
+
+    fact_monthly = fact.with_columns(pl.col("production_date").dt.truncate("1mo").alias("production_month"))
+
+    agg_batch_monthly = fact_monthly.group_by(monthly_dims).agg(measures).sort(monthly_dims, nulls_last=True)
+
+    # One row per (batch, species), like CROSS JOIN UNNEST(targeted_species)
+    species_dims = ["specie_fk", "product_fk"] + monthly_dims
+    agg_batch_species = (
+        fact_monthly
+        .explode("targeted_species")
+        .rename({"targeted_species": "specie_fk"})
+        .filter(pl.col("specie_fk").is_not_null())
+        .group_by(species_dims)
+        .agg(measures)
+        .sort(species_dims, nulls_last=True)
+    )
+
+    return {"agg_batch_monthly": agg_batch_monthly, "agg_batch_species": agg_batch_species}
+
+
+def build_dimensions(poultry, ruminants, companion_products):
+    """Collect the 3 dimensions in one pass over the sources
+
+    Dimensions are small and reused by every fact join, so they are
+    materialized once (the sources are scanned once for all of them).
+    """
+    dim_specie, dim_product, dim_site = pl.collect_all([
+        build_dim_specie(poultry, ruminants, companion_products),
+        build_dim_product(poultry, ruminants, companion_products),
+        build_dim_site(poultry, ruminants),
+    ], engine=ENGINE)
+    print(f"  Created {len(dim_specie)} species, {len(dim_product)} products, {len(dim_site)} sites")
+    return dim_specie, dim_product, dim_site
+
+
+def load_dimensions(dims):
+    """Write dimension parquet files"""
+    print("\nLOAD: Writing dimension files...")
 
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    dim_product.write_parquet(OUTPUT_DIR / "dim_product.parquet")
-    print(f"  Written: dim_product.parquet ({len(dim_product)} rows)")
+    for name, dim in dims.items():
+        dim.write_parquet(OUTPUT_DIR / f"{name}.parquet")
+        print(f"  Written: {name}.parquet ({len(dim)} rows)")
 
-    dim_specie.write_parquet(OUTPUT_DIR / "dim_specie.parquet")
-    print(f"  Written: dim_specie.parquet ({len(dim_specie)} rows)")
 
-    dim_site.write_parquet(OUTPUT_DIR / "dim_site.parquet")
-    print(f"  Written: dim_site.parquet ({len(dim_site)} rows)")
+def sink_table(lf, file_name):
+    """Stream a LazyFrame to OUTPUT_DIR/<file_name>, return its row count"""
+    path = OUTPUT_DIR / file_name
+    lf.sink_parquet(path, engine=ENGINE)
+    rows = pl.scan_parquet(path).select(pl.len()).collect().item()
+    print(f"  Written: {file_name} ({rows} rows)")
+    return rows
 
-    fact.write_parquet(OUTPUT_DIR / "fact_batch_production.parquet")
-    print(f"  Written: fact_batch_production.parquet ({len(fact)} rows)")
 
+def fact_partition_dir(values):
+    """Hive directory of a fact partition, values: {partition key: value}"""
+    return OUTPUT_DIR / FACT_TABLE / Path(*(f"{key}={values[key]}" for key in FACT_PARTITION_KEYS))
+
+
+def sink_fact_partitions(fact, part):
+    """Write the fact as hive partitions (part-<part>.parquet in each), return its row count
+
+    The sorted fact is streamed once to a staging file, each partition is then
+    a filtered scan of it (BU and month range, pruned by row group statistics).
+    """
+    staging = OUTPUT_DIR / f"_{FACT_TABLE}.staging.parquet"
+    fact.sink_parquet(staging, engine=ENGINE, row_group_size=FACT_PARQUET_OPTIONS["row_group_size"])
+
+    try:
+        staged = pl.scan_parquet(staging)
+        partitions = staged.select(**FACT_PARTITION_KEYS).unique().sort(list(FACT_PARTITION_KEYS)).collect(engine=ENGINE)
+
+        for values in partitions.iter_rows(named=True):
+            first_day = date(values["year"], values["month"], 1)
+            next_month = date(first_day.year + first_day.month // 12, first_day.month % 12 + 1, 1)
+            path = fact_partition_dir(values) / f"part-{part:05d}.parquet"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            staged.filter(
+                (pl.col("bu_source") == values["bu_source"])
+                & (pl.col("production_date") >= first_day)
+                & (pl.col("production_date") < next_month)
+            ).sink_parquet(path, engine=ENGINE, **FACT_PARQUET_OPTIONS)
+
+        rows = staged.select(pl.len()).collect().item()
+    finally:
+        staging.unlink()
+
+    print(f"  Written: {FACT_TABLE}/**/part-{part:05d}.parquet ({rows} rows, {len(partitions)} partitions)")
+    return rows
+
+
+def load_fact_and_rollups(fact, part=0):
+    """Sink the fact partitions, then the rollups computed from the written fact files
+
+    part is 0 for a full build, the part number for an incremental run.
+    Returns the number of fact rows.
+    """
+    print(f"\nLOAD: Streaming {FACT_TABLE} partitions...")
+    with stage("fact"):
+        n_fact = sink_fact_partitions(fact, part)
+
+    print("\nTRANSFORM: Building rollups...")
+    with stage("rollups"):
+        fact_files = OUTPUT_DIR / FACT_TABLE / "**" / f"part-{part:05d}.parquet"
+        rollups = build_rollups(pl.scan_parquet(fact_files, hive_partitioning=False))
+        suffix = f"-{part:05d}" if part else ""
+        for name, rollup in rollups.items():
+            sink_table(rollup, f"{name}{suffix}.parquet")
+
+    return n_fact
+
+
+def load_state():
+    """Last run state (high-water marks, key counters), None before the first run"""
+    if not STATE_PATH.exists():
+        return None
+    return json.loads(STATE_PATH.read_text())
+
+
+def save_state(state):
+    STATE_PATH.write_text(json.dumps(state, indent=2))
 
-def main():
-    print("=" * 60)
-    print("ELT: CEVA Animal Health - Star Schema")
-    print("=" * 60)
 
+def high_water_marks(poultry, ruminants, companion_batches):
+    """Latest (date, batch id) per source"""
+    sources = {"poultry": poultry, "ruminants": ruminants, "companion": companion_batches}
+    lasts = pl.collect_all([
+        df.lazy().select(HIGH_WATER_COLUMNS[name]).top_k(1, by=HIGH_WATER_COLUMNS[name])
+        for name, df in sources.items()
+    ], engine=ENGINE)
+    return {name: list(last.row(0)) for name, last in zip(sources, lasts) if len(last)}
+
+
+def filter_new_batches(df, source, marks):
+    """Rows after the source's high-water mark"""
+    if source not in marks:
+        return df
+    date_col, id_col = HIGH_WATER_COLUMNS[source]
+    last_date, last_id = marks[source]
+    return df.filter(
+        (pl.col(date_col) > last_date)
+        | ((pl.col(date_col) == last_date) & (pl.col(id_col) > last_id))
+    )
+
+
+def merge_dimension(existing, candidates, business_key, surrogate_key):
+    """Append new members to a dimension, existing surrogate keys are kept
+
+    candidates come from a build_dim_* function (keys numbered from 1 in its
+    own sort order); new members get keys after the current maximum, in that
+    same order.
+    """
+    new_members = (
+        candidates
+        .join(existing.select(business_key), on=business_key, how="anti")
+        .sort(surrogate_key)
+        .drop(surrogate_key)
+        .with_row_index(name=surrogate_key, offset=(existing[surrogate_key].max() or 0) + 1)
+        .select(existing.columns)
+        .cast(existing.schema)
+    )
+    return pl.concat([existing, new_members]), len(new_members)
+
+
+def remove_parts():
+    """Delete incremental parts and fact partitions (before a full rebuild)"""
+    for table in ROLLUP_TABLES:
+        for part in OUTPUT_DIR.glob(f"{table}-*.parquet"):
+            part.unlink()
+
+    # Fact partitions, and fact files from the former single-file layout
+    shutil.rmtree(OUTPUT_DIR / FACT_TABLE, ignore_errors=True)
+    for path in OUTPUT_DIR.glob(f"{FACT_TABLE}*.parquet"):
+        path.unlink()
+
+
+def database_sources(part):
+    """read_parquet() expression per table: all files (part 0) or one incremental part"""
+    fact_files = "*" if part == 0 else f"part-{part:05d}"
+    rollup_files = "*" if part == 0 else f"-{part:05d}"
+    return {
+        **{name: f"read_parquet('{OUTPUT_DIR}/{name}.parquet')" for name in ["dim_product", "dim_specie", "dim_site"]},
+        FACT_TABLE: (
+            f"(SELECT * EXCLUDE (year, month) FROM read_parquet('{OUTPUT_DIR}/{FACT_TABLE}/**/{fact_files}.parquet', "
+            "hive_partitioning=true) ORDER BY bu_source, production_date, batch_id)"
+        ),
+        **{name: f"read_parquet('{OUTPUT_DIR}/{name}{rollup_files}.parquet')" for name in ROLLUP_TABLES},
+    }
+
+
+def build_database(part=0):
+    """Load the parquet outputs into native tables of DATABASE_PATH
+
+    A full build (part 0, or no database yet) creates every table with its
+    primary key. An incremental part is appended to a copy of the current
+    file: new dimension members (INSERT OR IGNORE on the key), fact and rollup
+    part rows. Statistics are refreshed and the finished file replaces the
+    previous one, so readers never see a partial build.
+    """
+    print("\nLOAD: Building DuckDB database...")
+
+    building = DATABASE_PATH.with_name(DATABASE_PATH.name + ".building")
+    building.unlink(missing_ok=True)
+    incremental = part > 0 and DATABASE_PATH.exists()
+    if incremental:
+        shutil.copyfile(DATABASE_PATH, building)
+    else:
+        part = 0
+
+    conn = duckdb.connect(str(building))
+    try:
+        for name, source in database_sources(part).items():
+            if not incremental:
+                conn.execute(f"CREATE TABLE {name} AS SELECT * FROM {source}")
+                if name in PRIMARY_KEYS:
+                    conn.execute(f"ALTER TABLE {name} ADD PRIMARY KEY ({PRIMARY_KEYS[name]})")
+            elif name.startswith("dim_"):
+                conn.execute(f"INSERT OR IGNORE INTO {name} SELECT * FROM {source}")
+            else:
+                conn.execute(f"INSERT INTO {name} SELECT * FROM {source}")
+            rows = conn.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0]
+            print(f"  Table: {name} ({rows} rows)")
+
+        conn.execute("ANALYZE")
+        conn.execute("CHECKPOINT")
+    finally:
+        conn.close()
+
+    os.replace(building, DATABASE_PATH)
+    print(f"  Written: {DATABASE_PATH.name}")
+
+
+def run_full():
+    """Rebuild every table from all source rows, return the part number (0)"""
     # Extract
-    poultry, ruminants, companion_products, companion_batches = extract_sources()
+    with stage("extract"):
+        poultry, ruminants, companion_products, companion_batches = extract_sources()
 
-    # Transform Dimensions
-    dim_specie = build_dim_specie(poultry, ruminants, companion_products)
-    dim_product = build_dim_product(poultry, ruminants, companion_products)
-    dim_site = build_dim_site(poultry, ruminants)
+    # Transform + Load Dimensions
+    with stage("dimensions"):
+        dim_specie, dim_product, dim_site = build_dimensions(poultry, ruminants, companion_products)
+        remove_parts()
+        load_dimensions({"dim_product": dim_product, "dim_specie": dim_specie, "dim_site": dim_site})
 
-    # Transform Fact
+    # Transform + Load Fact and Rollups (streamed)
     fact = build_fact_batch_production(
         poultry, ruminants, companion_products, companion_batches,
         dim_product, dim_specie, dim_site
     )
+    n_fact = load_fact_and_rollups(fact)
+
+    with stage("state"):
+        save_state({
+            "high_water_marks": high_water_marks(poultry, ruminants, companion_batches),
+            "last_batch_production_sk": n_fact,
+            "last_part": 0,
+        })
+    return 0
+
+
+def run_incremental(state):
+    """Process only batches after the high-water marks, append them as parts
+
+    Returns the new part number, None when there was nothing to load.
+    """
+    # Extract (rows after the last run only). Deltas are small: they are
+    # collected once and fed back to the lazy builders.
+    with stage("extract"):
+        poultry, ruminants, companion_products, companion_batches = extract_sources()
+        marks = state["high_water_marks"]
+        poultry, ruminants, companion_batches = pl.collect_all([
+            filter_new_batches(poultry, "poultry", marks),
+            filter_new_batches(ruminants, "ruminants", marks),
+            filter_new_batches(companion_batches, "companion", marks),
+        ], engine=ENGINE)
+    print(f"\nINCREMENTAL: {len(poultry)} poultry, {len(ruminants)} ruminants, {len(companion_batches)} companion new batches")
+
+    if not (len(poultry) or len(ruminants) or len(companion_batches)):
+        print("  Nothing to load")
+        return None
+
+    # Transform Dimensions: new members only, existing keys kept
+    with stage("dimensions"):
+        dims = {}
+        candidates = build_dimensions(poultry.lazy(), ruminants.lazy(), companion_products)
+        for name, candidate, business_key, surrogate_key in [
+            ("dim_specie", candidates[0], "specie_code", "specie_sk"),
+            ("dim_product", candidates[1], "product_code", "product_sk"),
+            ("dim_site", candidates[2], "site_code", "site_sk"),
+        ]:
+            existing = pl.read_parquet(OUTPUT_DIR / f"{name}.parquet")
+            dims[name], added = merge_dimension(existing, candidate, business_key, surrogate_key)
+            if added:
+                # Dimensions are small: rewritten only when they gain members
+                dims[name].write_parquet(OUTPUT_DIR / f"{name}.parquet")
+            print(f"  {name}: {added} new members")
+
+    # Transform Fact: keys continue after the last loaded batch
+    fact = build_fact_batch_production(
+        poultry.lazy(), ruminants.lazy(), companion_products, companion_batches.lazy(),
+        dims["dim_product"], dims["dim_specie"], dims["dim_site"]
+    )
+    fact = fact.with_columns(pl.col("batch_production_sk") + state["last_batch_production_sk"])
 
     # Load
-    load_parquet(dim_product, dim_specie, dim_site, fact)
+    part = state["last_part"] + 1
+    n_fact = load_fact_and_rollups(fact, part)
+
+    with stage("state"):
+        save_state({
+            "high_water_marks": {**marks, **high_water_marks(poultry, ruminants, companion_batches)},
+            "last_batch_production_sk": state["last_batch_production_sk"] + n_fact,
+            "last_part": part,
+        })
+    return part
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the star schema from the BU sources")
+    parser.add_argument("--incremental", action="store_true", help="Only load batches newer than the last run")
+    parser.add_argument("--no-duckdb", action="store_true", help="Do not build the DuckDB database (the agent reads the parquet files)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ELT: CEVA Animal Health - Star Schema")
+    print("=" * 60)
+
+    state = load_state() if args.incremental else None
+    if args.incremental and state is None:
+        print("No previous run state, running a full load")
+
+    STAGES.clear()
+    part = run_full() if state is None else run_incremental(state)
+
+    if args.no_duckdb:
+        # A database left from an earlier run would be stale
+        DATABASE_PATH.unlink(missing_ok=True)
+    elif part is not None or not DATABASE_PATH.exists():
+        with stage("database"):
+            build_database(part or 0)
+    report_stages()
 
     print("\n" + "=" * 60)
     print("ELT COMPLETED")
@@ -6,6 +6,8 @@ Phase 2: Full integration with LangGraph agent
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+import hashlib
+import os
 import sys
 from pathlib import Path
 
@@ -13,14 +15,119 @@ from pathlib import Path
 agent_path = Path(__file__).parent.parent / "agent"
 sys.path.insert(0, str(agent_path))
 
-from agent import build_agent, run_agent
+# Cheap to import: the LLM, DuckDB and pyarrow are only loaded once a question is asked
+from agent import (
+    build_agent,
+    stream_agent,
+    create_answer_cache,
+    create_question_index,
+    create_intent_router,
+    create_query_governor,
+    initialize_duckdb_connection,
+    get_query_results,
+)
+
+# Shared agent server (python work/agent/agent_server.py): when set, this process only renders
+AGENT_SERVER_URL = os.getenv("AGENT_SERVER_URL")
+
+
+@st.cache_resource
+def get_agent_client():
+    """Client of the shared agent server"""
+    from agent_client import AgentClient
+    return AgentClient(AGENT_SERVER_URL)
+
+
+# Persistent answer cache shared by all sessions
+@st.cache_resource
+def get_answer_cache():
+    """Open the on-disk answer cache once"""
+    return create_answer_cache()
+
+
+# Known intents router (slot vocabularies read from the star schema once)
+@st.cache_resource
+def get_intent_router():
+    """Build the intent router once"""
+    return create_intent_router()
+
+
+# Known questions index shared by all sessions (near-duplicates reuse SQL)
+@st.cache_resource
+def get_question_index():
+    """Build the question index once (semantic layer examples + cached answers)"""
+    return create_question_index(get_answer_cache(), get_intent_router())
 
 
 # Cache the compiled agent (compile once, reuse)
 @st.cache_resource
 def get_agent():
     """Initialize and compile agent once"""
-    return build_agent()
+    return build_agent(question_index=get_question_index(), intent_router=get_intent_router())
+
+
+# Connection used to fetch further result pages (the agent keeps the first one)
+@st.cache_resource
+def get_connection():
+    """Open the DuckDB connection for result pagination once"""
+    return initialize_duckdb_connection()
+
+
+@st.cache_resource
+def get_query_governor():
+    """Deadline for result page queries (same limits as execute_sql)"""
+    return create_query_governor(get_connection())
+
+
+def ask_agent(question: str):
+    """Agent events for a question, from the agent server or the in-process agent"""
+    if AGENT_SERVER_URL:
+        return get_agent_client().stream(question)
+    return stream_agent(
+        question,
+        get_agent(),
+        answer_cache=get_answer_cache(),
+        question_index=get_question_index(),
+    )
+
+
+def results_page(result: dict, page: int):
+    """Result page (0-based) as an Arrow table, fetched from the agent server or DuckDB"""
+    from agent import fetch_result_page
+
+    if AGENT_SERVER_URL:
+        return get_agent_client().fetch_result_page(result["generated_sql"], page)
+    return fetch_result_page(get_connection(), result["generated_sql"], page, governor=get_query_governor())
+
+
+def results_dataframe(result: dict) -> pd.DataFrame:
+    """First page of the query results as a DataFrame (converted column-wise from Arrow)
+
+    The state only carries a result store handle (resolved by the agent server
+    when there is one). When the stored table was evicted, the first page is
+    fetched again.
+    """
+    if AGENT_SERVER_URL:
+        table = get_agent_client().get_query_results(result)
+    else:
+        table = get_query_results(result)
+    if table is None:
+        table = results_page(result, 0)
+    return table.to_pandas()
+
+
+def render_result_pages(result: dict, first_page: pd.DataFrame, row_count: int):
+    """Browse the rows after the first page (fetched from DuckDB page by page)"""
+    from agent import RESULT_PAGE_SIZE
+
+    pages = -(-row_count // RESULT_PAGE_SIZE)
+    with st.expander(f"📄 All rows ({row_count}, {pages} pages)", expanded=False):
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1)
+        if page == 1:
+            page_df = first_page
+        else:
+            page_df = results_page(result, page - 1).to_pandas()
+        st.dataframe(page_df, use_container_width=True, hide_index=True)
 
 
 # Restricted execution namespace for agent-generated code
@@ -69,6 +176,54 @@ RESTRICTED_GLOBALS = {
 }
 
 
+# Compiled render functions kept across reruns and sessions (least recently used evicted)
+RENDER_CACHE_MAX_ENTRIES = 64
+
+
+def code_hash(code: str) -> str:
+    """Cache key of generated visualization code"""
+    return hashlib.sha256(code.encode()).hexdigest()
+
+
+@st.cache_resource(max_entries=RENDER_CACHE_MAX_ENTRIES, show_spinner=False)
+def compile_render_function(code_key: str, _generated_code: str):
+    """Validate, compile and exec generated code once per code hash, return render_visualization
+
+    Widget interactions rerun the script: cached functions are only called
+    again, not re-validated, re-parsed or re-executed. Rejected code raises
+    ValueError and is not cached.
+    """
+    from nodes.generate_streamlit_views import validate_generated_code
+
+    is_valid, error = validate_generated_code(_generated_code)
+    if not is_valid:
+        raise ValueError(f"Generated code rejected: {error}")
+
+    # Security: Use RESTRICTED_GLOBALS to limit available builtins and modules
+    # This prevents generated code from accessing dangerous functions like open(), eval(), __import__()
+    code_object = compile(_generated_code, f"<render_visualization {code_key[:12]}>", "exec")
+    local_namespace = {}
+    exec(code_object, RESTRICTED_GLOBALS, local_namespace)
+
+    if "render_visualization" not in local_namespace:
+        raise ValueError("Generated code did not define render_visualization function")
+    return local_namespace["render_visualization"]
+
+
+# Progress labels for graph nodes (streamed while the agent runs)
+NODE_LABELS = {
+    "route_intent": "Checked known intents",
+    "match_question": "Matched against known questions",
+    "generate_sql": "SQL generated",
+    "validate_sql": "SQL validated",
+    "execute_sql": "Query executed",
+    "plan_visualization": "Visualization planned from the query schema",
+    "generate_streamlit_views": "Visualization generated",
+    "max_retries_exceeded": "Could not generate valid SQL",
+    "handle_execution_error": "Query execution failed",
+}
+
+
 def main():
     """Main Streamlit app"""
 
@@ -98,22 +253,40 @@ def main():
         )
         submitted = st.form_submit_button("Analyze")
 
-    # Process question
+    # Process question (progress, SQL tokens and results are streamed as they arrive)
     if submitted and question:
-        with st.spinner("🔄 Analyzing your question..."):
+        with st.status("🔄 Analyzing your question...", expanded=True) as status:
             try:
-                # Get cached agent
-                agent = get_agent()
+                sql_placeholder = st.empty()
+                streamed_sql = ""
+                result = None
 
-                # Run agent
-                result = run_agent(question, agent)
+                for event in ask_agent(question):
+                    if event["type"] == "token" and event["node"] == "generate_sql":
+                        streamed_sql += event["text"]
+                        sql_placeholder.code(streamed_sql, language="sql")
+                    elif event["type"] == "node":
+                        # A retry starts a new SQL stream
+                        streamed_sql = ""
+                        st.write(f"✓ {NODE_LABELS.get(event['node'], event['node'])}")
+                        if event["node"] == "execute_sql":
+                            row_count = event["update"].get("result_row_count", 0)
+                            status.update(label=f"🔄 Query returned {row_count} rows, building visualization...")
+                    elif event["type"] == "result":
+                        result = event["state"]
+
+                sql_placeholder.empty()
 
                 # Store in session state
                 st.session_state.last_result = result
 
-                st.success("✅ Analysis complete!")
+                if result.get("from_cache"):
+                    status.update(label="✅ Analysis complete! (served from cache)", state="complete", expanded=False)
+                else:
+                    status.update(label="✅ Analysis complete!", state="complete", expanded=False)
 
             except Exception as e:
+                status.update(label="❌ Analysis failed", state="error")
                 st.error(f"❌ Error: {e}")
                 st.session_state.last_result = None
 
@@ -128,35 +301,37 @@ def main():
         # Display visualization
         st.subheader("📊 Results")
 
-        rows = result.get("query_results", [])
         columns = result.get("result_columns", [])
         generated_code = result.get("streamlit_code", "")
+        row_count = result.get("result_row_count") or 0
 
-        if rows and columns:
+        if row_count and columns:
+            df = results_dataframe(result)
             try:
-                # Execute the agent-generated code dynamically
+                # Execute the agent-generated code (compiled once per code, reused across reruns)
                 if generated_code:
-                    # Create a local namespace for execution
-                    local_namespace = {}
-
-                    # Execute the generated code to define render_visualization function
-                    # Security: Use RESTRICTED_GLOBALS to limit available builtins and modules
-                    # This prevents generated code from accessing dangerous functions like open(), eval(), __import__()
-                    exec(generated_code, RESTRICTED_GLOBALS, local_namespace)
-
-                    # Call the generated render_visualization function
-                    if 'render_visualization' in local_namespace:
-                        local_namespace['render_visualization']("auto", columns, rows)
-                    else:
-                        raise ValueError("Generated code did not define render_visualization function")
+                    render_visualization = compile_render_function(code_hash(generated_code), generated_code)
+                    render_visualization("auto", columns, df)
                 else:
                     raise ValueError("No visualization code generated")
 
             except Exception as e:
                 st.error(f"⚠️ Chart rendering failed: {e}")
                 st.warning("Showing table as fallback...")
-                df = pd.DataFrame(rows, columns=columns)
                 st.dataframe(df, use_container_width=True, hide_index=True)
+
+            if row_count > len(df):
+                st.caption(f"Visualization built from the first {len(df)} of {row_count} rows")
+                render_result_pages(result, df, row_count)
+        elif result.get("query_error", {}).get("kind") == "timeout":
+            st.error(
+                f"⏱️ The query was cancelled after {result['query_error']['timeout_seconds']:g}s. "
+                "Try a narrower question (a shorter period, one business unit...)."
+            )
+        elif result.get("query_error", {}).get("kind") == "out_of_memory":
+            st.error("💾 The query needed more memory than allowed. Try aggregating or filtering more.")
+        elif result.get("validation_error"):
+            st.error(f"❌ {result['validation_error']}")
         else:
             st.warning("No results returned from query")
 